@@ -22,22 +22,97 @@ import json
 import re
 import os
 import sys
+import io
+import gzip
+import lzma
 import itertools
+import functools
 import getopt
+import time
+import hashlib
+import threading
+import difflib
+import importlib
+import types
+import contextlib
+import atexit
+import heapq
+import asyncio
+import cProfile
+import tracemalloc
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from socket import getservbyname, inet_aton, inet_ntoa
+import ipaddress
 
-import meraki
+try:
+    import fcntl
+except ImportError:
+    # Windows, the bucket can't be shared through a file (--rate-limit-file)
+    fcntl = None
 
-from config import *
 
-from socket import getservbyname
-import ipaddress
+class Lazy:
+    """
+    Stand-in for a module, class or object that is only imported / built on first use (attribute access or call), so
+    importing this script stays cheap for parse-only tools and compile mode.
+    """
+    __slots__ = ('_factory', '_target')
+
+    def __init__(self, factory):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_target', None)
+
+    def _resolve(self):
+        target = object.__getattribute__(self, '_target')
+        if target is None:
+            target = object.__getattribute__(self, '_factory')()
+            object.__setattr__(self, '_target', target)
+        return target
+
+    def __getattr__(self, name):
+        target = self._resolve()
+        try:
+            return getattr(target, name)
+        except AttributeError:
+            # Sub modules (ex: meraki.aio) are imported on first use too
+            if isinstance(target, types.ModuleType):
+                return importlib.import_module(f'{target.__name__}.{name}')
+            raise
+
+    def __setattr__(self, name, value):
+        setattr(self._resolve(), name, value)
 
-from ciscoconfparse import CiscoConfParse
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
 
-from rich.console import Console
-from rich.progress import Progress
-from rich.panel import Panel
-from rich.prompt import Confirm
+
+def lazy_import(module, name=None):
+    """
+    Import a module (or one of its attributes) on first use.
+    :param module: module name
+    :param name: attribute of the module (ex: a class), None for the module itself
+    :return: Lazy stand-in
+    """
+    if name is None:
+        return Lazy(lambda: importlib.import_module(module))
+
+    return Lazy(lambda: getattr(importlib.import_module(module), name))
+
+
+# Heavy third party imports (Meraki SDK and its aiohttp, rich) are deferred until a command needs them
+meraki = lazy_import('meraki')
+Console = lazy_import('rich.console', 'Console')
+Progress = lazy_import('rich.progress', 'Progress')
+Panel = lazy_import('rich.panel', 'Panel')
+Confirm = lazy_import('rich.prompt', 'Confirm')
+
+# config.py settings, loaded by load_config() when the script runs (tools using the parsing helpers don't need one)
+MERAKI_API_KEY = ""
+ORG_NAME = ""
+NETWORK_NAME = ""
+ACL_TYPES = {"nat_set": [], "outbound_set": []}
 
 # Subnet / wildcard mask to CIDR prefix length lookup table
 SUBNET_MASKS = {
@@ -148,19 +223,84 @@ regex_patterns = [
 
 ]
 
+# Token patterns used by the single pass ACE parser (same building blocks as the regex patterns above)
+IPV4_TOKEN = re.compile(r'\d+.\d+.\d+.\d+')
+
+# Whitespace other than a space (ex: tab), ACE lines containing it are matched with the regex patterns
+ODD_WHITESPACE = re.compile(r'[^\S ]')
+
+# ASA port name keywords (tcp and udp), independent of the host's /etc/services
+ASA_PORT_NAMES = {
+    'aol': 5190, 'bgp': 179, 'biff': 512, 'bootpc': 68, 'bootps': 67, 'chargen': 19, 'cifs': 3020,
+    'citrix-ica': 1494, 'cmd': 514, 'ctiqbe': 2748, 'daytime': 13, 'discard': 9, 'dnsix': 195, 'domain': 53,
+    'echo': 7, 'exec': 512, 'finger': 79, 'ftp': 21, 'ftp-data': 20, 'gopher': 70, 'h323': 1720, 'hostname': 101,
+    'http': 80, 'https': 443, 'ident': 113, 'imap4': 143, 'irc': 194, 'isakmp': 500, 'kerberos': 750,
+    'klogin': 543, 'kshell': 544, 'ldap': 389, 'ldaps': 636, 'login': 513, 'lotusnotes': 1352, 'lpd': 515,
+    'mobile-ip': 434, 'nameserver': 42, 'netbios-dgm': 138, 'netbios-ns': 137, 'netbios-ssn': 139, 'nfs': 2049,
+    'nntp': 119, 'ntp': 123, 'pcanywhere-data': 5631, 'pcanywhere-status': 5632, 'pim-auto-rp': 496, 'pop2': 109,
+    'pop3': 110, 'pptp': 1723, 'radius': 1645, 'radius-acct': 1646, 'rip': 520, 'rsh': 514, 'rtsp': 554,
+    'secureid-udp': 5510, 'sip': 5060, 'smtp': 25, 'snmp': 161, 'snmptrap': 162, 'sqlnet': 1521, 'ssh': 22,
+    'sunrpc': 111, 'syslog': 514, 'tacacs': 49, 'talk': 517, 'telnet': 23, 'tftp': 69, 'time': 37, 'uucp': 540,
+    'vxlan': 4789, 'who': 513, 'whois': 43, 'www': 80, 'xdmcp': 177,
+}
+
+# IPv4 address with an optional prefix length (CIDR summarization)
+CIDR_TOKEN = re.compile(r'(\d{1,3}(?:\.\d{1,3}){3})(?:/(\d{1,2}))?')
+PORT_TOKEN = re.compile(r'[\w-]+')
+WORD_TOKEN = re.compile(r'\w+')
+
+# Sub icmp flows which may follow an 'any any' source/destination pair
+ICMP_TYPES = ('echo', 'echo-reply', 'time-exceeded', 'unreachable')
+
+# Lines per chunk handed to each parse_rules worker process
+PARSE_CHUNK_SIZE = 2000
+
+# show run blocks used by create_objects, keyed by their leading keyword(s) (exact tokens, 'route' doesn't match
+# 'router' or 'route-map')
+SHOW_RUN_BLOCKS = {
+    ('object', 'network'): 'object',
+    ('object-group', 'network'): 'group',
+    ('object-group', 'service'): 'service',
+    ('object-group', 'protocol'): 'protocol',
+    ('interface',): 'interface',
+    ('route',): 'route',
+    ('access-group',): 'access-group'
+}
+
+# Magic bytes of compressed show access-list captures
+GZIP_MAGIC = b'\x1f\x8b'
+XZ_MAGIC = b'\xfd7zXZ\x00'
+
+# Cross-check every token parser result against the original regex patterns (slow, debugging only)
+VERIFY_PARSER = False
+
 # Global remark object, shared across line's where appropriate
 CURRENT_REMARK = ""
 
-# Rich Console Instance
-console = Console()
 
-# Meraki Dashboard instance
-dashboard = meraki.DashboardAPI(MERAKI_API_KEY, suppress_logging=True)
+def load_config():
+    """
+    Load the config.py settings (API key, org and network names, ACL types) into the module globals.
+    :return:
+    """
+    config = importlib.import_module('config')
+    globals().update((name, value) for name, value in vars(config).items() if not name.startswith('_'))
+
+
+# Rich Console Instance (built on first use)
+console = Lazy(Console)
+
+# Meraki Dashboard instance (built on first API call, compile mode and parse-only use never need an API key), every
+# call is counted and timed
+dashboard = Lazy(lambda: InstrumentedDashboard(meraki.DashboardAPI(MERAKI_API_KEY, suppress_logging=True)))
 
 # Maintain list of Policy Objects and Policy Object Groups (initialized with existing groups)
 object_groups = {}
 objects = {}
 
+# Policy Object values (name -> id, cidr/fqdn), built from the objects listed or created
+object_values = {}
+
 # Custom objects
 port_groups = {}
 group_of_groups = {}
@@ -179,6 +319,264 @@ NAT_FLAG = False
 # Triggers Any translation if needed by rules
 ANY_FLAG = False
 
+# Print every processed object and ACL line (--verbose), otherwise they're collapsed into progress counters
+VERBOSE = False
+
+# Progress counter refreshes per second (quiet mode)
+CONSOLE_REFRESH_RATE = 4
+
+# Create Policy Objects and Policy Object Groups through action batches instead of one call per object
+BATCH_MODE = False
+
+# Create Policy Objects, Policy Object Groups, VLANs and static routes concurrently through the asyncio Dashboard API,
+# with at most this many requests in flight (0 uses one blocking call at a time)
+ASYNC_CONCURRENCY = 0
+
+# Retries for asyncio Dashboard calls answered with 429 (after the SDK's own retries)
+ASYNC_MAX_RETRIES = 5
+
+# Remove duplicate (and equivalent) L3 rules before they're pushed, on unless --no-dedupe
+DEDUPE_RULES = True
+
+# Merge neighbouring L3 rules differing in one field into multi-value rules (--merge)
+MERGE_RULES = False
+MERGE_FIELDS = ('srcCidr', 'destCidr', 'destPort')
+
+# Outbound Rules an MX network takes before the Dashboard rejects (or chokes on) the rule set
+MX_L3_RULE_LIMIT = 1000
+
+# Projected L3 rule count (after expansion) that triggers a warning, or aborts with --budget-abort (--rule-budget 0
+# turns the check off)
+RULE_BUDGET = MX_L3_RULE_LIMIT
+RULE_BUDGET_ABORT = False
+
+# Skip rule set PUTs whose content already matches the network (--force-push always pushes)
+FORCE_PUSH = False
+DIFF_MAX_LINES = 20
+
+# Target networks rule sets are pushed to concurrently (--networks), at most NETWORK_WORKERS at a time
+NETWORK_WORKERS = 8
+
+# Policy Objects (or Policy Object Groups) of one dependency level created at a time with blocking calls
+OBJECT_WORKERS = 8
+
+# Rule set names, Dashboard fetch and update operations
+RULE_SETS = {
+    'l3': ('Outbound Rules', 'getNetworkApplianceFirewallL3FirewallRules',
+           'updateNetworkApplianceFirewallL3FirewallRules'),
+    'one_to_one_nat': ('NAT Rules', 'getNetworkApplianceFirewallOneToOneNatRules',
+                       'updateNetworkApplianceFirewallOneToOneNatRules'),
+    'l7': ('L7 Deny NAT Rules', 'getNetworkApplianceFirewallL7FirewallRules',
+           'updateNetworkApplianceFirewallL7FirewallRules'),
+}
+
+# Compile mode artifacts (object creation plan and MX rule sets), applied later with apply mode
+PLAN_FILE = 'plan.json'
+L3_RULES_FILE = 'l3_rules.ndjson'
+NAT_RULES_FILE = 'one_to_one_nat_rules.json'
+L7_RULES_FILE = 'l7_rules.json'
+
+# Compile mode stand-in org/network ids, and the placeholder ids given to objects until apply mode creates them
+OFFLINE_ORG_ID = 'offline'
+OFFLINE_NETWORK_ID = 'offline'
+PLACEHOLDER_PATTERN = re.compile(r'\{\{(?:obj|grp):[^}]*\}\}')
+
+# Org/network ids and Policy Object state cached across runs, cached objects are re-listed once older than max age
+CACHE_FILE = '.asa_to_mx_cache.json'
+CACHE_MAX_AGE = 24 * 60 * 60
+
+# Policy Objects (and Groups) listed to check the cached ones against the Dashboard before they're trusted
+CACHE_CHECK_PAGE_SIZE = 1000
+
+# Append-only checkpoint journal of completed steps (--resume continues an interrupted run from it)
+JOURNAL_FILE = '.asa_to_mx_journal.ndjson'
+JOURNAL_FP = None
+JOURNAL_PUSHED = set()
+JOURNAL_LOCK = threading.Lock()
+
+# Run metrics (phase timings and Dashboard calls per operation), written with --metrics / --metrics-textfile
+METRICS = None
+METRICS_PREFIX = 'asa_to_mx'
+API_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Dashboard operation running on the current thread (HTTP responses are attributed to it)
+API_CONTEXT = threading.local()
+
+# Dashboard request budget shared by every API call of the run (Meraki allows 10 requests per second per org, with a
+# burst of 10), 429 answers without Retry-After pause it for API_RETRY_AFTER seconds. --rate-limit-file shares it with
+# other runs against the same org
+API_SCHEDULER = None
+API_RATE = 10
+API_BURST = 10
+API_RETRY_AFTER = 2
+
+# --profile DIR: steps profiled with cProfile and tracemalloc (phases that never run inside each other), one pstats
+# file and one top allocations report per step
+PROFILE_DIR = None
+PROFILE_STEPS = ('show_run_index', 'create_objects', 'create_objects.planned', 'parse_rules', 'build_rules')
+PROFILE_TOP = 25
+PROFILE_FILES = set()
+
+# Asynchronous action batch limits (actions per batch, running batches per org) and status poll interval (seconds)
+ACTION_BATCH_SIZE = 100
+ACTION_BATCH_CONCURRENCY = 5
+ACTION_BATCH_POLL_INTERVAL = 2
+
+
+@functools.lru_cache(maxsize=None)
+def lookup_port(port):
+    """
+    Translate an ASA port name to its number (ASA keyword table first, then the host's services database).
+    :param port: port name or number
+    :return: port number (string)
+    :raises OSError: if the name isn't known
+    """
+    if port.isdigit():
+        return port
+    if port in ASA_PORT_NAMES:
+        return str(ASA_PORT_NAMES[port])
+
+    return str(getservbyname(port))
+
+
+def range_to_cidrs(start, end):
+    """
+    Minimal list of CIDR blocks exactly covering an IPv4 address range.
+    :param start: first address (integer)
+    :param end: last address (integer)
+    :return: list of CIDR strings
+    """
+    cidrs = []
+    while start <= end:
+        # Largest block aligned on start that doesn't run past end
+        alignment = (start & -start).bit_length() - 1 if start else 32
+        host_bits = min(alignment, (end - start + 1).bit_length() - 1)
+
+        cidrs.append(f"{inet_ntoa(start.to_bytes(4, 'big'))}/{32 - host_bits}")
+        start += 1 << host_bits
+
+    return cidrs
+
+
+def summarize_cidrs(values):
+    """
+    Collapse adjacent and overlapping IPv4 prefixes into the minimal covering set (sort then merge address ranges,
+    like ipaddress.collapse_addresses). Values that aren't IPv4 addresses/prefixes (objects, fqdns) are kept as is,
+    after the summarized prefixes. 'any' covers everything.
+    :param values: iterable of address, CIDR or other values (comma separated strings are split)
+    :return: list of summarized values
+    """
+    ranges = []
+    others = []
+
+    for value in values:
+        for item in str(value).split(','):
+            item = item.strip()
+
+            if item in ('any', 'any4'):
+                return ['any']
+
+            match = CIDR_TOKEN.fullmatch(item)
+            prefix = int(match.group(2) or 32) if match else None
+
+            if prefix is None or prefix > 32 or max(int(octet) for octet in match.group(1).split('.')) > 255:
+                if item and item not in others:
+                    others.append(item)
+                continue
+
+            # Address range of the prefix (host bits cleared, like a non strict ipaddress.IPv4Network)
+            host_mask = (1 << (32 - prefix)) - 1
+            start = int.from_bytes(inet_aton(match.group(1)), 'big') & ~host_mask
+            ranges.append((start, start | host_mask))
+
+    ranges.sort()
+
+    # Merge overlapping and adjacent ranges
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    cidrs = []
+    for start, end in merged:
+        cidrs += range_to_cidrs(start, end)
+
+    return cidrs + others
+
+
+class ShowRunElement:
+    """
+    A show run line and its direct child lines (same .text / .children as a CiscoConfParse object).
+    """
+    __slots__ = ('text', 'children')
+
+    def __init__(self, text):
+        self.text = text
+        self.children = []
+
+
+class ShowRunIndex:
+    """
+    Single pass index of the show run blocks create_objects needs (SHOW_RUN_BLOCKS), in file order. Every other
+    block is skipped while reading, so only the indexed lines are held in memory.
+    """
+
+    def __init__(self, show_run_file):
+        self.blocks = {kind: [] for kind in SHOW_RUN_BLOCKS.values()}
+        self.lines = 0
+
+        # The show run may be compressed like the show access-list capture
+        raw, fp = open_acl_file(show_run_file)
+        try:
+            self.read(fp)
+        finally:
+            if raw is not sys.stdin.buffer:
+                fp.close()
+
+    def read(self, fp):
+        """
+        Bucket the parent lines of SHOW_RUN_BLOCKS with their direct children.
+        :param fp: show run text stream
+        :return:
+        """
+        parent = None
+        child_indent = None
+
+        for line in fp:
+            self.lines += 1
+            text = line.rstrip()
+
+            if not text or text[0] in '!:':
+                continue
+
+            indent = len(text) - len(text.lstrip())
+            if indent:
+                # Child line, only direct children of an indexed parent are kept
+                if parent is not None:
+                    child_indent = child_indent or indent
+                    if indent == child_indent:
+                        parent.children.append(ShowRunElement(text))
+                continue
+
+            tokens = text.split(None, 2)
+            kind = SHOW_RUN_BLOCKS.get(tuple(tokens[:2])) or SHOW_RUN_BLOCKS.get(tuple(tokens[:1]))
+            parent = ShowRunElement(text) if kind else None
+            child_indent = None
+
+            if parent is not None:
+                self.blocks[kind].append(parent)
+
+    def find(self, kind):
+        """
+        Indexed blocks of a kind.
+        :param kind: block kind (SHOW_RUN_BLOCKS value, ex: 'object', 'route')
+        :return: list of ShowRunElement, in file order
+        """
+        return self.blocks[kind]
+
 
 def build_mx_object(org_id, print_console, object_type, element):
     """
@@ -189,7 +587,7 @@ def build_mx_object(org_id, print_console, object_type, element):
     :param element: object we are processing
     :return:
     """
-    global objects, object_groups, port_groups, group_of_groups, protocol_objects, interfaces, any_translation, routes, nat_table
+    global objects, object_values, object_groups, port_groups, group_of_groups, protocol_objects, interfaces, any_translation, routes, nat_table
 
     mx_object = {}
 
@@ -216,15 +614,11 @@ def build_mx_object(org_id, print_console, object_type, element):
                 # objects table)
                 # Dynamic entries ignored, this is default behavior in Meraki
                 if content[2] == 'static' and name not in nat_table:
-                    # Translate objects to IPs
-                    cidr = dashboard.organizations.getOrganizationPolicyObject(organizationId=org_id,
-                                                                               policyObjectId=objects[name])['cidr']
+                    # Translate objects to IPs (local index of listed/created objects, no API calls)
+                    cidr = object_values[name]['cidr']
                     internal_ip = cidr.split('/')[0]
 
-                    cidr = dashboard.organizations.getOrganizationPolicyObject(organizationId=org_id,
-                                                                               policyObjectId=objects[
-                                                                                   content[3].replace('.', '_')])[
-                        'cidr']
+                    cidr = object_values[content[3].replace('.', '_')]['cidr']
                     external_ip = cidr.split('/')[0]
 
                     nat_table[internal_ip] = external_ip
@@ -285,12 +679,20 @@ def build_mx_object(org_id, print_console, object_type, element):
 
                 # nested group object case
                 elif content[0] == 'group-object':
-
-                    if content[1] not in object_groups:
+                    # Sanitize
+                    content[1] = content[1].replace('.', '_')
+
+                    # Nested groups are flattened to the Policy Object Groups they contain (groups are built in
+                    # dependency order, see dependency_levels)
+                    if content[1] in object_groups:
+                        group_ids = [object_groups[content[1]]]
+                    elif content[1] in group_of_groups:
+                        group_ids = group_of_groups[content[1]]
+                    else:
                         return None
 
-                    group_id = object_groups[content[1]]
-                    mx_object['group_of_groups'].append(group_id)
+                    mx_object['group_of_groups'] += [group_id for group_id in group_ids
+                                                     if group_id not in mx_object['group_of_groups']]
         else:
             return None
 
@@ -319,17 +721,9 @@ def build_mx_object(org_id, print_console, object_type, element):
                     if content[0] == 'port-object':
                         # eq case (only eq supported)
                         if content[1] == 'eq':
-                            if not content[2].isdigit():
-                                mx_object['ports'].append(str(getservbyname(content[2])))
-                            else:
-                                mx_object['ports'].append(content[2])
+                            mx_object['ports'].append(lookup_port(content[2]))
                         elif content[1] == 'range':
-                            if not content[2].isdigit():
-                                content[2] = str(getservbyname(content[2]))
-                            if not content[3].isdigit():
-                                content[3] = str(getservbyname(content[3]))
-
-                            mx_object['ports'].append(content[2] + '-' + content[3])
+                            mx_object['ports'].append(lookup_port(content[2]) + '-' + lookup_port(content[3]))
             else:
                 return None
         else:
@@ -371,6 +765,8 @@ def build_mx_object(org_id, print_console, object_type, element):
             # add other routes for any translation
             if nameif in routes:
                 mx_object['cidr'] += routes[nameif]
+
+            mx_object['cidr'] = summarize_cidrs(mx_object['cidr'])
         else:
             return None
     # Build interfaces object (not a native Meraki object, custom object)
@@ -413,125 +809,537 @@ def build_mx_object(org_id, print_console, object_type, element):
     return mx_object
 
 
-def create_objects(org_id, parse):
+def index_policy_object(policy_object):
+    """
+    Add a listed or newly created Policy Object to the local name -> id and name -> value maps.
+    :param policy_object: Policy Object (name, id and cidr or fqdn)
+    :return:
+    """
+    objects[policy_object['name']] = policy_object['id']
+    object_values[policy_object['name']] = {
+        'id': policy_object['id'],
+        'cidr': policy_object.get('cidr'),
+        'fqdn': policy_object.get('fqdn')
+    }
+
+
+def list_policy_objects(org_id):
+    """
+    List the org's existing Policy Objects and Policy Object Groups into the local name -> id maps.
+    :param org_id: meraki org id
+    :return:
+    """
+    policy_objects = dashboard.organizations.getOrganizationPolicyObjects(organizationId=org_id)
+
+    for obj in policy_objects:
+        index_policy_object(obj)
+
+    policy_object_groups = dashboard.organizations.getOrganizationPolicyObjectsGroups(organizationId=org_id)
+
+    for obj in policy_object_groups:
+        object_groups[obj['name']] = obj['id']
+
+
+def create_policy_object(org_id, mx_object):
+    """
+    Create a single Policy Object or Policy Object Group.
+    :param org_id: meraki org id
+    :param mx_object: object built by build_mx_object
+    :return: response of API call
+    """
+    return create_from_action(org_id, policy_object_action(org_id, mx_object))
+
+
+def create_from_action(org_id, action):
+    """
+    Create the Policy Object or Policy Object Group of an action batch action with a single call.
+    :param org_id: meraki org id
+    :param action: action batch action (see policy_object_action)
+    :return: response of API call
+    """
+    body = action['body']
+
+    if 'objectIds' in body:
+        return dashboard.organizations.createOrganizationPolicyObjectsGroup(organizationId=org_id, **body)
+
+    return dashboard.organizations.createOrganizationPolicyObject(organizationId=org_id, **body)
+
+
+def has_child(element, keyword):
+    """
+    Check if a show run element has a child line starting with keyword.
+    :param element: show run element (parent line and children)
+    :param keyword: first word of the child line
+    :return: True if a matching child line exists
+    """
+    return any(line.text.split()[:1] == [keyword] for line in element.children)
+
+
+def policy_object_action(org_id, mx_object):
+    """
+    Build the action batch action creating a Policy Object or Policy Object Group.
+    :param org_id: meraki org id
+    :param mx_object: object built by build_mx_object
+    :return: action batch action
+    """
+    if 'objectIds' in mx_object:
+        return {
+            'resource': f'/organizations/{org_id}/policyObjects/groups',
+            'operation': 'create',
+            'body': {'name': mx_object['name'], 'category': mx_object['category'],
+                     'objectIds': mx_object['objectIds']}
+        }
+
+    return {
+        'resource': f'/organizations/{org_id}/policyObjects',
+        'operation': 'create',
+        'body': {'name': mx_object['name'], 'category': mx_object['category'], 'type': mx_object['type'],
+                 mx_object['type']: mx_object[mx_object['type']]}
+    }
+
+
+def run_action_batches(org_id, actions, print_console):
+    """
+    Submit create actions as asynchronous organization action batches (ACTION_BATCH_SIZE actions per batch, at most
+    ACTION_BATCH_CONCURRENCY batches running at once) and wait for them to complete. Batches are atomic, the objects
+    of a failed batch are created one by one instead, so one bad object doesn't skip the whole batch.
+    :param org_id: meraki org id
+    :param actions: action batch actions (see policy_object_action)
+    :param print_console: print status messages to console
+    :return: list of created resources (action body with the new id)
+    """
+    batches = [actions[i:i + ACTION_BATCH_SIZE] for i in range(0, len(actions), ACTION_BATCH_SIZE)]
+    running = {}
+    created = []
+
+    while batches or running:
+        # Keep the org's action batch queue full
+        while batches and len(running) < ACTION_BATCH_CONCURRENCY:
+            batch_actions = batches.pop(0)
+            batch = dashboard.organizations.createOrganizationActionBatch(organizationId=org_id,
+                                                                          actions=batch_actions, confirmed=True,
+                                                                          synchronous=False)
+            running[batch['id']] = batch_actions
+
+        time.sleep(ACTION_BATCH_POLL_INTERVAL)
+
+        for batch_id in list(running):
+            status = dashboard.organizations.getOrganizationActionBatch(organizationId=org_id,
+                                                                        actionBatchId=batch_id)['status']
+
+            if status['failed']:
+                batch_actions = running.pop(batch_id)
+                print_console.print(f"[red]Action batch {batch_id} failed: {', '.join(status['errors'])}[/], creating "
+                                    f"its {len(batch_actions)} objects one by one")
+
+                for action in batch_actions:
+                    try:
+                        response = create_from_action(org_id, action)
+                    except meraki.APIError as e:
+                        print_console.print(f"[red]Error:[/] Creating '{action['body']['name']}' failed: {e}")
+                        continue
+
+                    created.append(dict(action['body'], id=response['id']))
+            elif status['completed']:
+                batch_actions = running.pop(batch_id)
+
+                # Batches are atomic, created resources are listed in action order
+                for action, resource in zip(batch_actions, status['createdResources']):
+                    created.append(dict(action['body'], id=resource['id']))
+
+                print_console.print(f"Action batch [blue]{batch_id}[/] completed ({len(batch_actions)} objects)")
+
+    return created
+
+
+class AsyncThrottle:
+    """
+    Bounded concurrency for asyncio Dashboard calls. A 429 answer pauses every call (honoring Retry-After) instead of
+    letting the other in-flight calls keep hitting the rate limit.
+    """
+
+    def __init__(self, limit):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.resume_at = 0
+
+    async def call(self, function, **kwargs):
+        """
+        Run a Dashboard call once a slot is free, retrying on 429.
+        :param function: asyncio Dashboard API method
+        :param kwargs: method arguments
+        :return: response of API call
+        """
+        start = time.perf_counter()
+        rate_limited = 0
+
+        def record(attempt, error=False):
+            if METRICS is not None:
+                METRICS.record_call(function.__name__, time.perf_counter() - start,
+                                    bytes_sent=len(json.dumps(kwargs, default=str)) * (attempt + 1), retries=attempt,
+                                    rate_limited=rate_limited, error=error)
+
+        for attempt in range(ASYNC_MAX_RETRIES + 1):
+            async with self.semaphore:
+                delay = self.resume_at - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                # Shared request budget (blocking, waited for in a thread)
+                if API_SCHEDULER is not None:
+                    await asyncio.get_running_loop().run_in_executor(None, API_SCHEDULER.acquire,
+                                                                     api_priority(function.__name__))
+
+                try:
+                    response = await function(**kwargs)
+                    record(attempt)
+                    return response
+                except meraki.exceptions.AsyncAPIError as e:
+                    rate_limited += int(e.status == 429)
+                    if e.status != 429 or attempt == ASYNC_MAX_RETRIES:
+                        record(attempt, error=True)
+                        raise
+
+                    # Retry-After if provided, exponential backoff otherwise
+                    headers = e.response.headers if e.response is not None else {}
+                    wait = int(headers.get('Retry-After', 2 ** attempt))
+                    self.resume_at = max(self.resume_at, time.monotonic() + wait)
+                    if API_SCHEDULER is not None:
+                        API_SCHEDULER.pause(wait)
+
+
+async def run_async_calls(calls, print_console):
+    """
+    Run independent Dashboard calls concurrently through the asyncio Dashboard API (ASYNC_CONCURRENCY in flight).
+    :param calls: list of (label, API section, operation, arguments)
+    :param print_console: print status messages to console
+    :return: list of responses in call order (None for failed calls)
+    """
+    async with meraki.aio.AsyncDashboardAPI(MERAKI_API_KEY, suppress_logging=True,
+                                            maximum_concurrent_requests=ASYNC_CONCURRENCY) as aiodashboard:
+        throttle = AsyncThrottle(ASYNC_CONCURRENCY)
+
+        async def run(label, section, operation, kwargs):
+            try:
+                return await throttle.call(getattr(getattr(aiodashboard, section), operation), **kwargs)
+            except meraki.exceptions.AsyncAPIError as e:
+                print_console.print(f"[red]Error:[/] {label} failed: {e}")
+                return None
+
+        return await asyncio.gather(*(run(*call) for call in calls))
+
+
+def create_deferred_objects(org_id, mx_objects, print_console):
+    """
+    Create queued Policy Objects or Policy Object Groups, through action batches (BATCH_MODE) or concurrently through
+    the asyncio Dashboard API.
+    :param org_id: meraki org id
+    :param mx_objects: objects built by build_mx_object
+    :param print_console: print status messages to console
+    :return: list of created objects (name, id and values)
+    """
+    actions = [policy_object_action(org_id, mx_object) for mx_object in mx_objects]
+
+    if BATCH_MODE:
+        print_console.print(f"Creating [green]{len(actions)}[/] objects through action batches...")
+        return run_action_batches(org_id, actions, print_console)
+
+    print_console.print(f"Creating [green]{len(actions)}[/] objects ({ASYNC_CONCURRENCY} at a time)...")
+    calls = []
+    for action in actions:
+        operation = 'createOrganizationPolicyObjectsGroup' if 'objectIds' in action['body'] else \
+            'createOrganizationPolicyObject'
+        calls.append((f"Creating '{action['body']['name']}'", 'organizations', operation,
+                      dict(organizationId=org_id, **action['body'])))
+
+    responses = asyncio.run(run_async_calls(calls, print_console))
+
+    return [response for response in responses if response]
+
+
+def create_object_level(org_id, mx_objects, print_console):
+    """
+    Create Policy Objects or Policy Object Groups that don't depend on each other (one dependency level): through
+    action batches or asyncio (see create_deferred_objects), otherwise OBJECT_WORKERS blocking calls at a time.
+    :param org_id: meraki org id
+    :param mx_objects: objects built by build_mx_object
+    :param print_console: print status messages to console
+    :return: created objects (name, id and values), yielded as they're created
+    """
+    if BATCH_MODE or ASYNC_CONCURRENCY > 0:
+        yield from create_deferred_objects(org_id, mx_objects, print_console)
+        return
+
+    # Dashboards that aren't thread safe (the offline plan keeps show run order) create one at a time
+    workers = OBJECT_WORKERS if getattr(dashboard, 'thread_safe', False) else 1
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        yield from executor.map(functools.partial(create_policy_object, org_id), mx_objects)
+
+
+def group_dependencies(group_elements):
+    """
+    Dependency graph of the network object groups of a show run: each group depends on the groups it nests
+    (group-object) that are defined in the show run. Members already on the Dashboard or never defined add no edge.
+    :param group_elements: 'object-group network' show run elements
+    :return: dictionary of group name -> (element, set of nested group names), in show run order
+    """
+    graph = {}
+    for element in group_elements:
+        name = element.text.replace('object-group network ', '').replace('.', '_')
+
+        # First definition wins
+        if name in graph:
+            continue
+
+        members = set()
+        for line in element.children:
+            content = line.text.split()
+            if content[0] == 'group-object':
+                members.add(content[1].replace('.', '_'))
+
+        graph[name] = (element, members)
+
+    for element, members in graph.values():
+        members.intersection_update(graph)
+
+    return graph
+
+
+def dependency_levels(graph):
+    """
+    Sort a dependency graph into levels (Kahn's algorithm): level 0 depends on nothing, every other level only
+    depends on lower levels, so each level can be built at once and forward references resolve.
+    :param graph: dictionary of name -> (element, set of dependency names), see group_dependencies
+    :return: tuple of (list of levels, each a list of names in graph order; names left in a dependency cycle)
+    """
+    order = {name: index for index, name in enumerate(graph)}
+    pending = {name: len(members) for name, (_, members) in graph.items()}
+    dependents = {name: [] for name in graph}
+    for name, (_, members) in graph.items():
+        for member in members:
+            dependents[member].append(name)
+
+    levels = []
+    level = [name for name, count in pending.items() if count == 0]
+    while level:
+        levels.append(level)
+        next_level = []
+        for name in level:
+            del pending[name]
+            for dependent in dependents[name]:
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    next_level.append(dependent)
+
+        level = sorted(next_level, key=order.get)
+
+    return levels, list(pending)
+
+
+class ProgressLog:
+    """
+    Per item messages of a Progress task. Verbose mode prints every message, otherwise messages are only counted and
+    the counters are shown in the task description, refreshed at most CONSOLE_REFRESH_RATE times a second.
+    """
+
+    def __init__(self, progress, task, description="Overall Progress"):
+        self.progress = progress
+        self.task = task
+        self.description = description
+        self.counts = {}
+        self.advanced = 0
+        self.completed = None
+        self.refreshed = 0.0
+
+    def log(self, kind, message, *args):
+        """
+        Count a message (formatted and printed in verbose mode only).
+        :param kind: counter name (ex: 'outbound', 'errors')
+        :param message: message format string
+        :param args: message format arguments
+        :return:
+        """
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+
+        if VERBOSE:
+            self.progress.console.print(message.format(*args))
+
+    def count(self, kind, amount=1):
+        """
+        Add to a counter without a message.
+        :param kind: counter name
+        :param amount: amount added
+        :return:
+        """
+        self.counts[kind] = self.counts.get(kind, 0) + amount
+
+    def update(self, advance=0, completed=None):
+        """
+        Advance the task, the progress bar is only refreshed at the refresh rate in quiet mode.
+        :param advance: units completed since the last update
+        :param completed: total units completed (ex: bytes read)
+        :return:
+        """
+        self.advanced += advance
+        if completed is not None:
+            self.completed = completed
+
+        if VERBOSE or time.monotonic() - self.refreshed >= 1 / CONSOLE_REFRESH_RATE:
+            self.flush()
+
+    def flush(self):
+        """
+        Push pending progress and counters to the progress bar.
+        :return:
+        """
+        description = self.description if VERBOSE or not self.counts else f'{self.description} ({self.summary()})'
+        self.progress.update(self.task, advance=self.advanced, completed=self.completed, description=description)
+
+        self.advanced = 0
+        self.refreshed = time.monotonic()
+
+    def summary(self):
+        """
+        Counters as text.
+        :return: ex: '120 outbound, 4 nat, 2 errors'
+        """
+        return ', '.join(f'{count:,} {kind}' for kind, count in self.counts.items())
+
+    def close(self, label='Processed'):
+        """
+        Flush the task and print the counters (quiet mode, the transient progress bar disappears).
+        :param label: summary line label
+        :return:
+        """
+        self.flush()
+
+        if not VERBOSE and self.counts:
+            self.progress.console.print(f'{label}: {self.summary()}')
+
+
+def create_objects(org_id, parse, list_existing=True):
     """
     Build out objects and constructs from ASA Show Run and ACL for the MX. Objects include network objects, network object groups, port groups, protocol groups, and nat table.
     :param org_id: meraki org id
-    :param parse: CiscoConfParse object representing parsed form of show run file
+    :param parse: ShowRunIndex of the show run file
+    :param list_existing: list the org's existing Policy Objects and Groups (False when loaded from the cache)
     :return:
     """
     global objects, object_groups, port_groups, group_of_groups, protocol_objects, interfaces, any_translation, routes, nat_table
 
     # Parse network objects
-    # Grab existing list of policy objects, create new dictionary mapping name to id
-    policy_objects = dashboard.organizations.getOrganizationPolicyObjects(organizationId=org_id)
-
-    for obj in policy_objects:
-        objects[obj['name']] = obj['id']
+    # Grab existing list of policy objects and groups, create new dictionaries mapping name to id
+    if list_existing:
+        with timed_phase('create_objects.list_existing'):
+            list_policy_objects(org_id)
 
-    solo_objects = parse.find_objects(r'object network')
-    solo_objects = [elem for elem in solo_objects if elem.text.startswith('object network')]
+    solo_objects = parse.find('object')
 
     solo_object_count = len(solo_objects)
 
     console.print("[blue]Creating Network Objects (and NAT Table) [/]")
-    with Progress() as progress:
+    with timed_phase('create_objects.network_objects'), Progress() as progress:
         overall_progress = progress.add_task("Overall Progress", total=solo_object_count, transient=True)
+        log = ProgressLog(progress, overall_progress)
         counter = 1
 
+        # Network objects don't depend on each other (one level, created together), NAT entries need the created
+        # objects
+        new_objects = []
+        queued_names = set()
+        nat_elements = []
+
         for element in solo_objects:
-            progress.console.print(
-                "Processing object: [blue]'{}'[/] ({} of {})".format(element.text.replace('object network ', ''),
-                                                                     str(counter), solo_object_count))
+            log.log('objects', "Processing object: [blue]'{}'[/] ({} of {})",
+                    element.text.replace('object network ', ''), counter, solo_object_count)
+            counter += 1
+
+            if has_child(element, 'nat'):
+                nat_elements.append(element)
+                continue
 
             # Construct post body
             mx_object = build_mx_object(org_id, progress.console, 'object', element)
 
-            # Error building object (likely not supported) if this skips
-            if mx_object:
-                if mx_object["type"] == 'cidr':
-                    # Create MX Object (cidr)
-                    new_object = dashboard.organizations.createOrganizationPolicyObject(organizationId=org_id,
-                                                                                        name=mx_object['name'],
-                                                                                        category=mx_object['category'],
-                                                                                        type=mx_object["type"],
-                                                                                        cidr=mx_object["cidr"])
-                else:
-                    # Create MX Object (fqdn)
-                    new_object = dashboard.organizations.createOrganizationPolicyObject(organizationId=org_id,
-                                                                                        name=mx_object['name'],
-                                                                                        category=mx_object['category'],
-                                                                                        type=mx_object["type"],
-                                                                                        fqdn=mx_object["fqdn"])
-
-                # Add new object to list
-                objects[new_object['name']] = new_object['id']
-
-            counter += 1
-            progress.update(overall_progress, advance=1)
+            # Error building object (likely not supported) if this skips, queue each new object once
+            if mx_object and mx_object['name'] not in queued_names:
+                queued_names.add(mx_object['name'])
+                new_objects.append(mx_object)
+            else:
+                log.update(advance=1)
 
-    # Parse group network objects
-    # Grab existing list of policy object groups, create new dictionary mapping name to id
-    policy_object_groups = dashboard.organizations.getOrganizationPolicyObjectsGroups(organizationId=org_id)
+        for new_object in create_object_level(org_id, new_objects, progress.console):
+            # Add new object to list
+            index_policy_object(new_object)
+            journal('object', object=new_object)
+            log.update(advance=1)
 
-    for obj in policy_object_groups:
-        object_groups[obj['name']] = obj['id']
+        for element in nat_elements:
+            build_mx_object(org_id, progress.console, 'object', element)
+            log.update(advance=1)
+        log.close()
 
-    group_objects = parse.find_objects(r'object-group network')
-    group_objects = [elem for elem in group_objects if elem.text.startswith('object-group network')]
+    # Parse group network objects, built by dependency level (nested groups after the groups they contain)
+    group_objects = parse.find('group')
+    group_graph = group_dependencies(group_objects)
+    group_levels, cyclic_groups = dependency_levels(group_graph)
 
-    group_objects_count = len(group_objects)
+    group_objects_count = len(group_graph)
 
     console.print("[blue]Creating Network Objects Groups[/]")
-    with Progress() as progress:
+    with timed_phase('create_objects.network_groups'), Progress() as progress:
         overall_progress = progress.add_task("Overall Progress", total=group_objects_count, transient=True)
+        log = ProgressLog(progress, overall_progress)
         counter = 1
 
-        for element in group_objects:
-            progress.console.print(
-                "Processing object: [blue]'{}'[/] ({} of {})".format(
-                    element.text.replace('object-group network ', ''),
-                    str(counter), group_objects_count))
+        if cyclic_groups:
+            progress.console.print(f"[red]Groups nested in a cycle... skipping:[/] {', '.join(cyclic_groups)}")
+            log.update(advance=len(cyclic_groups))
 
-            # Construct post body
-            mx_object = build_mx_object(org_id, progress.console, 'group', element)
+        for level in group_levels:
+            new_groups = []
 
-            # Error building object (likely not supported) if this skips
-            if mx_object:
-                # nested group case
-                if len(mx_object['group_of_groups']) > 0 and mx_object['name'] not in group_of_groups:
-                    group_of_groups[mx_object['name']] = mx_object['group_of_groups']
-                else:
-                    # Create new object network group
-                    new_group = dashboard.organizations.createOrganizationPolicyObjectsGroup(organizationId=org_id,
-                                                                                             name=mx_object['name'],
-                                                                                             category=mx_object[
-                                                                                                 'category'],
-                                                                                             objectIds=mx_object[
-                                                                                                 'objectIds'])
+            for name in level:
+                element = group_graph[name][0]
+                log.log('groups', "Processing object: [blue]'{}'[/] ({} of {})",
+                        element.text.replace('object-group network ', ''), counter, group_objects_count)
+                counter += 1
 
-                    # Add new object to list
-                    object_groups[new_group['name']] = new_group['id']
+                # Construct post body
+                mx_object = build_mx_object(org_id, progress.console, 'group', element)
+
+                # Error building object (likely not supported) if this skips
+                if mx_object and len(mx_object['group_of_groups']) > 0:
+                    # nested group case (not supported in Meraki), rules use the flattened member groups
+                    if mx_object['name'] not in group_of_groups:
+                        group_of_groups[mx_object['name']] = mx_object['group_of_groups']
+                    log.update(advance=1)
+                elif mx_object:
+                    new_groups.append(mx_object)
+                else:
+                    log.update(advance=1)
 
-            counter += 1
-            progress.update(overall_progress, advance=1)
+            # Create new object network groups of this level together
+            for new_group in create_object_level(org_id, new_groups, progress.console):
+                # Add new object to list
+                object_groups[new_group['name']] = new_group['id']
+                journal('group', name=new_group['name'], id=new_group['id'])
+                log.update(advance=1)
+        log.close()
 
     # Parse network service-object groups (port-object, service-object)
-    service_groups = parse.find_objects(r'object-group service')
-    service_groups = [elem for elem in service_groups if elem.text.startswith('object-group service')]
+    service_groups = parse.find('service')
 
     service_groups_count = len(service_groups)
 
     console.print("[blue]Creating Service Groups (Port Objects)[/]")
-    with Progress() as progress:
+    with timed_phase('create_objects.service_groups'), Progress() as progress:
         overall_progress = progress.add_task("Overall Progress", total=service_groups_count, transient=True)
+        log = ProgressLog(progress, overall_progress)
         counter = 1
 
         for element in service_groups:
-            progress.console.print(
-                "Processing object: [blue]'{}'[/] ({} of {})".format(
-                    element.text.replace('object-group service ', ''),
-                    str(counter), service_groups_count))
+            log.log('service groups', "Processing object: [blue]'{}'[/] ({} of {})",
+                    element.text.replace('object-group service ', ''), counter, service_groups_count)
 
             service_object = build_mx_object(org_id, progress.console, 'service', element)
 
@@ -541,24 +1349,23 @@ def create_objects(org_id, parse):
                     port_groups[service_object['name']] = service_object['ports']
 
             counter += 1
-            progress.update(overall_progress, advance=1)
+            log.update(advance=1)
+        log.close()
 
     # Parse protocol-objects
-    objects_protocols = parse.find_objects(r'object-group protocol')
-    objects_protocols = [elem for elem in objects_protocols if elem.text.startswith('object-group protocol')]
+    objects_protocols = parse.find('protocol')
 
     objects_protocols_count = len(objects_protocols)
 
     console.print("[blue]Creating Service Groups (Protocol) [/]")
-    with Progress() as progress:
+    with timed_phase('create_objects.protocol_groups'), Progress() as progress:
         overall_progress = progress.add_task("Overall Progress", total=objects_protocols_count, transient=True)
+        log = ProgressLog(progress, overall_progress)
         counter = 1
 
         for element in objects_protocols:
-            progress.console.print(
-                "Processing object: [blue]'{}'[/] ({} of {})".format(
-                    element.text.replace('object-group protocol ', ''),
-                    str(counter), objects_protocols_count))
+            log.log('protocol groups', "Processing object: [blue]'{}'[/] ({} of {})",
+                    element.text.replace('object-group protocol ', ''), counter, objects_protocols_count)
 
             protocol_object = build_mx_object(org_id, progress.console, 'protocol', element)
 
@@ -567,23 +1374,23 @@ def create_objects(org_id, parse):
                 protocol_objects[protocol_object['name']] = protocol_object['protocols']
 
             counter += 1
-            progress.update(overall_progress, advance=1)
+            log.update(advance=1)
+        log.close()
 
     # Parse Interfaces (any translation)
-    interface_groups = parse.find_objects(r'interface')
-    interface_groups = [elem for elem in interface_groups if elem.text.startswith('interface')]
+    interface_groups = parse.find('interface')
 
     interface_groups_count = len(interface_groups)
 
     console.print("[blue]Creating Interface Table[/]")
-    with Progress() as progress:
+    with timed_phase('create_objects.interfaces'), Progress() as progress:
         overall_progress = progress.add_task("Overall Progress", total=interface_groups_count, transient=True)
+        log = ProgressLog(progress, overall_progress)
         counter = 1
 
         for element in interface_groups:
-            progress.console.print(
-                "Processing interface: [blue]'{}'[/] ({} of {})".format(element.text.replace('interface ', ''),
-                                                                        str(counter), interface_groups_count))
+            log.log('interfaces', "Processing interface: [blue]'{}'[/] ({} of {})",
+                    element.text.replace('interface ', ''), counter, interface_groups_count)
 
             interface_object = build_mx_object(org_id, progress.console, 'interface', element)
 
@@ -592,23 +1399,23 @@ def create_objects(org_id, parse):
                 interfaces[interface_object['name']] = interface_object['cidr']
 
             counter += 1
-            progress.update(overall_progress, advance=1)
+            log.update(advance=1)
+        log.close()
 
     # Parse Routes (any translation)
-    routes_objects = parse.find_objects(r'route')
-    routes_objects = [elem for elem in routes_objects if elem.text.startswith('route')]
+    routes_objects = parse.find('route')
 
     routes_count = len(routes_objects)
 
     console.print("[blue]Creating Route Table[/]")
-    with Progress() as progress:
+    with timed_phase('create_objects.routes'), Progress() as progress:
         overall_progress = progress.add_task("Overall Progress", total=routes_count, transient=True)
+        log = ProgressLog(progress, overall_progress)
         counter = 1
 
         for element in routes_objects:
-            progress.console.print(
-                "Processing object: [blue]'{}'[/] ({} of {})".format(element.text.replace('route ', ''),
-                                                                     str(counter), routes_count))
+            log.log('routes', "Processing object: [blue]'{}'[/] ({} of {})",
+                    element.text.replace('route ', ''), counter, routes_count)
 
             routes_object = build_mx_object(org_id, progress.console, 'route', element)
 
@@ -619,23 +1426,23 @@ def create_objects(org_id, parse):
                     routes[routes_object['name']] = [routes_object['cidr']]
 
             counter += 1
-            progress.update(overall_progress, advance=1)
+            log.update(advance=1)
+        log.close()
 
     # Parse Access-Groups (any translation)
-    access_groups = parse.find_objects(r'access-group')
-    access_groups = [elem for elem in access_groups if elem.text.startswith('access-group')]
+    access_groups = parse.find('access-group')
 
     access_groups_count = len(access_groups)
 
     console.print("[blue]Creating Access Groups Table[/]")
-    with Progress() as progress:
+    with timed_phase('create_objects.access_groups'), Progress() as progress:
         overall_progress = progress.add_task("Overall Progress", total=access_groups_count, transient=True)
+        log = ProgressLog(progress, overall_progress)
         counter = 1
 
         for element in access_groups:
-            progress.console.print(
-                "Processing object: [blue]'{}'[/] ({} of {})".format(element.text.replace('access-group ', ''),
-                                                                     str(counter), access_groups_count))
+            log.log('access groups', "Processing object: [blue]'{}'[/] ({} of {})",
+                    element.text.replace('access-group ', ''), counter, access_groups_count)
 
             access_object = build_mx_object(org_id, progress.console, 'access-group', element)
 
@@ -644,541 +1451,2544 @@ def create_objects(org_id, parse):
                 any_translation[access_object['name']] = access_object['cidr']
 
             counter += 1
-            progress.update(overall_progress, advance=1)
+            log.update(advance=1)
+        log.close()
 
     return
 
 
-def parse_line(line):
+def parse_ace_src(tokens, index):
     """
-    Parse each ASA ACL line. Match lines to regex pattern, process individual pieces utilizing object constructs created previously.
-    :param line: ACL line
-    :return: Meraki compatible rule pieces in the form of a dictionary
+    Parse the source of an ACE (host, any, object, object group, subnet). A source is always followed by a
+    destination, so the whole token must match.
+    :param tokens: ACL line tokens
+    :param index: index of the first source token
+    :return: tuple of (source fields, index of the next token), None if the source isn't supported
     """
-    global CURRENT_REMARK, ANY_FLAG, NAT_FLAG
-
-    # Strip leading spaces and newlines
-    line = line.strip()
+    if index + 1 >= len(tokens):
+        return None
+
+    token = tokens[index]
+    next_token = tokens[index + 1]
+
+    if token == 'host':
+        if IPV4_TOKEN.fullmatch(next_token):
+            return {'src_ip': next_token}, index + 2
+    elif token == 'any4' or token == 'any':
+        return {'src_ip': token}, index + 1
+    elif token == 'object' and next_token:
+        return {'src_obj': next_token}, index + 2
+    elif token == 'object-group' and next_token:
+        return {'src_obj_group': next_token}, index + 2
+    elif IPV4_TOKEN.fullmatch(token) and IPV4_TOKEN.fullmatch(next_token):
+        return {'src_subnet': token, 'src_mask': next_token}, index + 2
+
+    # Note: FQDN in the src not support by Meraki... rules ignored
+    return None
 
-    # Skip Inactive Lines!
-    if "inactive" in line:
-        return 'Inactive rules not allowed in Meraki'
 
-    # Remark functionality
-    if "remark" in line:
-        search = re.search(r'remark (.*)', line)
+def parse_ace_dst(tokens, index, src_any):
+    """
+    Parse the destination of an ACE (subnet, host, any, fqdn, object, object group). The destination ends the
+    required part of the line, so (like the regex patterns) a prefix of the last token is enough.
+    :param tokens: ACL line tokens
+    :param index: index of the first destination token
+    :param src_any: source of the ACE is any/any4 (sub icmp flows are only matched for 'any any')
+    :return: tuple of (destination fields, index of the next token, port spec may follow), None if not supported
+    """
+    if index >= len(tokens):
+        return None
 
-        if search:
-            remark = search.group()
+    token = tokens[index]
+    next_token = tokens[index + 1] if index + 1 < len(tokens) else None
 
-            content = remark[len("remark"):]
+    if token.startswith('any'):
+        dst_ip = 'any4' if token.startswith('any4') else 'any'
 
-            if content not in CURRENT_REMARK:
-                CURRENT_REMARK += content if CURRENT_REMARK == "" else " + " + content
+        # Special case of sub icmp flows (port spec may only follow the exact icmp type)
+        if src_any and token == dst_ip and next_token and next_token.startswith(ICMP_TYPES):
+            return {'dst_ip': dst_ip}, index + 2, next_token in ICMP_TYPES and next_token != 'echo-reply'
 
-            return 'Adding remark to ACL Rule'
+        return {'dst_ip': dst_ip}, index + 1, token == dst_ip
 
-    for pattern in regex_patterns:
-        match = re.search(pattern, line)
+    if not next_token:
+        return None
 
+    if token == 'host':
+        match = IPV4_TOKEN.match(next_token)
         if match:
-            acl = match.groupdict()
-
-            # Set NAT flag if acl name is in nat list
-            if acl['acl_name'] in ACL_TYPES['nat_set']:
-                NAT_FLAG = True
-            else:
-                NAT_FLAG = False
+            return {'dst_ip': match.group()}, index + 2, match.end() == len(next_token)
+    elif token == 'fqdn':
+        return {'dst_fqdn': next_token}, index + 2, True
+    elif token == 'object':
+        return {'dst_obj': next_token}, index + 2, True
+    elif token == 'object-group':
+        return {'dst_obj_group': next_token}, index + 2, True
+    elif IPV4_TOKEN.fullmatch(token):
+        match = IPV4_TOKEN.match(next_token)
+        if match:
+            return {'dst_subnet': token, 'dst_mask': match.group()}, index + 2, match.end() == len(next_token)
 
-            # add remark
-            acl['comment'] = CURRENT_REMARK
+    return None
 
-            # Process protocol groups
-            if 'protocol_group' in acl and acl['protocol_group']:
-                # NAT rules don't support protocol groups
-                if NAT_FLAG:
-                    return "NAT Rules don't support protocol groups"
 
-                if acl['protocol_group'] in protocol_objects:
-                    protocols = protocol_objects[acl['protocol_group']]
-                    acl["protocol"] = protocols
-                else:
-                    return "Protocol group not found in local list"
+def parse_ace_port(tokens, index):
+    """
+    Parse the optional destination port spec of an ACE (port group, eq, range).
+    :param tokens: ACL line tokens
+    :param index: index of the token following the destination
+    :return: dictionary of port fields (unmatched fields set to None)
+    """
+    port = {'dst_port_group': None, 'dst_port': None, 'dst_port_range': None}
 
-            # src ip processing (host, any, object, object group, group-of-groups)
-            if "src_ip" in acl:
+    if index + 1 >= len(tokens):
+        return port
 
-                # Convert any4 to any or special translation (using 'any' table)
-                if acl["src_ip"] == "any4" or acl["src_ip"] == "any":
-                    if acl["acl_name"] in any_translation and ANY_FLAG:
-                        acl["src"] = ','.join(any_translation[acl['acl_name']])
-                    else:
-                        acl["src"] = "any"
-                else:
-                    # host case
-                    acl["src"] = acl["src_ip"] + "/32"
-            # subnet case
-            elif "src_subnet" in acl:
-                acl["src"] = acl["src_subnet"] + '/' + SUBNET_MASKS[acl["src_mask"]]
-
-            # Note: FQDN in the src not support by Meraki... rules ignored
-
-            # Object case
-            elif "src_obj" in acl:
-                # NAT rules don't support objects
-                if NAT_FLAG:
-                    return "NAT Rules don't support objects"
-
-                acl["src_obj"] = acl["src_obj"].replace('.', '_')
-
-                # If object found, use ID as source
-                if acl["src_obj"] in objects:
-                    obj_id = objects[acl["src_obj"]]
-                    acl["src"] = f"OBJ[{obj_id}]"
-                else:
-                    return "Object not found in local list"
-
-            # Object group case
-            elif "src_obj_group" in acl:
-                # NAT rules don't support object groups
-                if NAT_FLAG:
-                    return "NAT Rules don't support object groups."
-
-                acl["src_obj_group"] = acl["src_obj_group"].replace('.', '_')
-
-                # If object found, use ID as source
-                if acl["src_obj_group"] in object_groups:
-                    obj_id = object_groups[acl["src_obj_group"]]
-                    acl["src"] = f"GRP[{obj_id}]"
-                # Group of Groups Case
-                elif acl["src_obj_group"] in group_of_groups:
-                    obj_list = group_of_groups[acl["src_obj_group"]]
-                    acl["src"] = [f"GRP[{obj}]" for obj in obj_list]
-                else:
-                    return "Object group not found in local list"
-
-            # dst ip processing (host, fqdn, any, object, object group)
-            if "dst_ip" in acl:
-                # Convert any4 to any
-                if acl["dst_ip"] == "any4" or acl["dst_ip"] == "any":
-                    acl["dst"] = "any"
-                # Special case of sub icmp flows (Meraki only supports allow or deny, can't specify sub flows)
-                elif "echo" in acl["dst_ip"] or "echo-reply" in acl["dst_ip"] or "time-exceeded" in acl[
-                    "dst_ip"] or "unreachable" in acl["dst_ip"]:
-                    return "Meraki doesn't support specifying specific ICMP flows"
-                else:
-                    # host case
-                    acl["dst"] = acl["dst_ip"] + "/32"
-
-            elif "dst_subnet" in acl:
-                acl["dst"] = acl["dst_subnet"] + '/' + SUBNET_MASKS[acl["dst_mask"]]
-            # fqdn case
-            elif "dst_fqdn" in acl:
-                # NAT rules don't support fqdn
-                if NAT_FLAG:
-                    return "NAT rules don't support FQDN"
-                acl["dst"] = acl["dst_fqdn"]
-            # Object case
-            elif "dst_obj" in acl:
-                # NAT rules don't support objects
-                if NAT_FLAG:
-                    return "NAT Rules don't support objects"
-
-                acl["dst_obj"] = acl["dst_obj"].replace('.', '_')
-
-                # If object found, use ID as destination
-                if acl["dst_obj"] in objects:
-                    obj_id = objects[acl["dst_obj"]]
-                    acl["dst"] = f"OBJ[{obj_id}]"
-                else:
-                    return "Object not found in local list"
-
-            elif "dst_obj_group" in acl:
-                # NAT rules don't support object groups
-                if NAT_FLAG:
-                    return "NAT rules don't support object groups"
-
-                acl["dst_obj_group"] = acl["dst_obj_group"].replace('.', '_')
-
-                # If object found, use ID as source
-                if acl["dst_obj_group"] in object_groups:
-                    obj_id = object_groups[acl["dst_obj_group"]]
-                    acl["dst"] = f"GRP[{obj_id}]"
-                # Group of Groups Case
-                elif acl["dst_obj_group"] in group_of_groups:
-                    obj_list = group_of_groups[acl["dst_obj_group"]]
-                    acl["dst"] = obj_list
-                else:
-                    return "Object group not found in local list"
+    keyword = tokens[index]
+    value = tokens[index + 1]
 
-            # dst port processing
-            # ranges case
-            if "dst_port_range" in acl and acl["dst_port_range"]:
-                split = acl["dst_port_range"].split()
+    if keyword == 'object-group' and value:
+        port['dst_port_group'] = value
+    elif keyword == 'eq':
+        match = PORT_TOKEN.match(value)
+        if match:
+            port['dst_port'] = match.group()
+    elif keyword == 'range' and index + 2 < len(tokens) and PORT_TOKEN.fullmatch(value):
+        match = PORT_TOKEN.match(tokens[index + 2])
+        if match:
+            port['dst_port_range'] = value + ' ' + match.group()
 
-                # translate port names
-                if not split[0].isdigit():
-                    split[0] = str(getservbyname(split[0]))
-                elif not split[1].isdigit():
-                    split[1] = str(getservbyname(split[1]))
+    return port
 
-                # Build Meraki valid port range
-                acl["dst_port"] = split[0] + '-' + split[1]
 
-            elif "dst_port" in acl and acl['dst_port']:
-                # translate port names
-                if not acl["dst_port"].isdigit():
+def match_ace_tokens(line):
+    """
+    Single pass ACE parser. Reads 'access-list <name> line <n> extended <action> <proto> <src> <dst> <port>' once,
+    dispatching on keywords instead of trying every regex pattern. Like the regex patterns, fields must be separated by
+    exactly one space (a double space leaves an empty token that no field accepts).
+    :param line: ACL line
+    :return: dictionary with the same fields as the matching regex pattern, None if the line isn't supported
+    """
+    # The regex patterns accept a tab in a few places only (\s before a port keyword, inside names), show
+    # access-list captures never contain one: leave such lines to them rather than reproducing their exact rules
+    if ODD_WHITESPACE.search(line):
+        return match_ace_regex(line)
+
+    tokens = line.split(' ')
+
+    if 'access-list' not in tokens:
+        return None
+    start = tokens.index('access-list')
+
+    # ACL names are matched greedily by the regex patterns, so prefer the right most 'line <n> extended'
+    for index in range(len(tokens) - 3, start + 1, -1):
+        if tokens[index] != 'line' or tokens[index + 2] != 'extended' or not tokens[index + 1].isdigit():
+            continue
+
+        position = index + 3
+        if position + 2 >= len(tokens) or not WORD_TOKEN.fullmatch(tokens[position]):
+            continue
+
+        acl = {'acl_name': ' '.join(tokens[start + 1:index]), 'line_number': tokens[index + 1],
+               'action': tokens[position], 'protocol_group': None, 'protocol': None}
+        position += 1
+
+        # Protocol group or single protocol
+        if tokens[position] == 'object-group' and tokens[position + 1]:
+            acl['protocol_group'] = tokens[position + 1]
+            position += 2
+        elif WORD_TOKEN.fullmatch(tokens[position]):
+            acl['protocol'] = tokens[position]
+            position += 1
+        else:
+            continue
 
-                    # If service not defined on system, method call fails
-                    try:
-                        acl["dst_port"] = str(getservbyname(acl["dst_port"]))
-                    except OSError:
-                        return f'{acl["dst_port"]} port not defined on system!'
+        src = parse_ace_src(tokens, position)
+        if src is None:
+            continue
+        acl.update(src[0])
 
-            # Port group case
-            elif "dst_port_group" in acl and acl['dst_port_group']:
-                # NAT rules don't support port groups
-                if NAT_FLAG:
-                    return "NAT rules don't support port groups"
+        dst = parse_ace_dst(tokens, src[1], acl.get('src_ip') in ('any4', 'any'))
+        if dst is None:
+            continue
+        acl.update(dst[0])
 
-                if acl['dst_port_group'] in port_groups:
-                    ports = port_groups[acl['dst_port_group']]
+        if dst[2]:
+            acl.update(parse_ace_port(tokens, dst[1]))
+        else:
+            acl.update(dst_port_group=None, dst_port=None, dst_port_range=None)
 
-                    comma_list = ','.join([port for port in ports if '-' not in port])
-                    range_list = ','.join([port for port in ports if '-' in port])
+        return acl
 
-                    acl["dst_port"] = [comma_list, range_list]
-                else:
-                    return "Port group not found in local list"
+    return None
 
-            # Found Match, applied current remark, reset remark variable
-            CURRENT_REMARK = ""
 
-            # Ignore default any, any, any, any rules (if not doing any translation)
-            if not ANY_FLAG and acl['protocol'] == 'ip' and acl["src"] == "any" and acl["dst"] == "any":
-                return "Default any any rules ignored. Please recreate manually in Meraki dashboard"
+def match_ace_regex(line):
+    """
+    Original ACE matcher, the first of the regex patterns to match wins. Kept as a reference for the token parser.
+    :param line: ACL line
+    :return: dictionary of named regex groups, None if no pattern matches
+    """
+    for pattern in regex_patterns:
+        match = re.search(pattern, line)
+
+        if match:
+            return match.groupdict()
+
+    return None
+
+
+def match_ace(line):
+    """
+    Match an ACL line to its ACE fields using the token parser (optionally cross-checked against the regex patterns).
+    :param line: ACL line
+    :return: dictionary of ACE fields, None if the line isn't supported
+    """
+    acl = match_ace_tokens(line)
+
+    if VERIFY_PARSER:
+        expected = match_ace_regex(line)
+
+        # Trust the regex patterns on disagreement, flag the line so the token parser can be fixed
+        if acl != expected:
+            console.print(f"[red]Parser mismatch:[/] '{line}' -> {acl} (regex: {expected})")
+            return expected
+
+    return acl
+
+
+def remark_content(line):
+    """
+    Extract the remark text from an ACL remark line.
+    :param line: ACL line
+    :return: remark content (with leading space), None if the line isn't a remark
+    """
+    search = re.search(r'remark (.*)', line)
+
+    if search:
+        remark = search.group()
+
+        return remark[len("remark"):]
+
+    return None
+
+
+def append_remark(current_remark, content):
+    """
+    Add a remark line to the running remark (duplicate remarks are only added once).
+    :param current_remark: remark accumulated so far
+    :param content: remark content to add
+    :return: updated remark
+    """
+    if content not in current_remark:
+        current_remark += content if current_remark == "" else " + " + content
+
+    return current_remark
+
+
+def parse_line(line):
+    """
+    Parse each ASA ACL line. Match lines to regex pattern, process individual pieces utilizing object constructs created previously.
+    :param line: ACL line
+    :return: Meraki compatible rule pieces in the form of a dictionary
+    """
+    global CURRENT_REMARK, ANY_FLAG, NAT_FLAG
+
+    # Strip leading spaces and newlines
+    line = line.strip()
+
+    # Skip Inactive Lines!
+    if "inactive" in line:
+        return 'Inactive rules not allowed in Meraki'
+
+    # Remark functionality
+    if "remark" in line:
+        content = remark_content(line)
+
+        if content is not None:
+            CURRENT_REMARK = append_remark(CURRENT_REMARK, content)
+
+            return 'Adding remark to ACL Rule'
+
+    acl = match_ace(line)
+
+    if acl is None:
+        return "Invalid line"
+
+    # Set NAT flag if acl name is in nat list
+    if acl['acl_name'] in ACL_TYPES['nat_set']:
+        NAT_FLAG = True
+    else:
+        NAT_FLAG = False
+
+    # add remark
+    acl['comment'] = CURRENT_REMARK
+
+    # Process protocol groups
+    if 'protocol_group' in acl and acl['protocol_group']:
+        # NAT rules don't support protocol groups
+        if NAT_FLAG:
+            return "NAT Rules don't support protocol groups"
+
+        if acl['protocol_group'] in protocol_objects:
+            protocols = protocol_objects[acl['protocol_group']]
+            acl["protocol"] = protocols
+        else:
+            return "Protocol group not found in local list"
+
+    # src ip processing (host, any, object, object group, group-of-groups)
+    if "src_ip" in acl:
+
+        # Convert any4 to any or special translation (using 'any' table)
+        if acl["src_ip"] == "any4" or acl["src_ip"] == "any":
+            if acl["acl_name"] in any_translation and ANY_FLAG:
+                acl["src"] = ','.join(any_translation[acl['acl_name']])
+            else:
+                acl["src"] = "any"
+        else:
+            # host case
+            acl["src"] = acl["src_ip"] + "/32"
+    # subnet case
+    elif "src_subnet" in acl:
+        acl["src"] = acl["src_subnet"] + '/' + SUBNET_MASKS[acl["src_mask"]]
+
+    # Note: FQDN in the src not support by Meraki... rules ignored
+
+    # Object case
+    elif "src_obj" in acl:
+        # NAT rules don't support objects
+        if NAT_FLAG:
+            return "NAT Rules don't support objects"
+
+        acl["src_obj"] = acl["src_obj"].replace('.', '_')
+
+        # If object found, use ID as source
+        if acl["src_obj"] in objects:
+            obj_id = objects[acl["src_obj"]]
+            acl["src"] = f"OBJ[{obj_id}]"
+        else:
+            return "Object not found in local list"
+
+    # Object group case
+    elif "src_obj_group" in acl:
+        # NAT rules don't support object groups
+        if NAT_FLAG:
+            return "NAT Rules don't support object groups."
+
+        acl["src_obj_group"] = acl["src_obj_group"].replace('.', '_')
+
+        # If object found, use ID as source
+        if acl["src_obj_group"] in object_groups:
+            obj_id = object_groups[acl["src_obj_group"]]
+            acl["src"] = f"GRP[{obj_id}]"
+        # Group of Groups Case
+        elif acl["src_obj_group"] in group_of_groups:
+            obj_list = group_of_groups[acl["src_obj_group"]]
+            acl["src"] = [f"GRP[{obj}]" for obj in obj_list]
+        else:
+            return "Object group not found in local list"
+
+    # dst ip processing (host, fqdn, any, object, object group)
+    if "dst_ip" in acl:
+        # Convert any4 to any
+        if acl["dst_ip"] == "any4" or acl["dst_ip"] == "any":
+            acl["dst"] = "any"
+        # Special case of sub icmp flows (Meraki only supports allow or deny, can't specify sub flows)
+        elif "echo" in acl["dst_ip"] or "echo-reply" in acl["dst_ip"] or "time-exceeded" in acl[
+            "dst_ip"] or "unreachable" in acl["dst_ip"]:
+            return "Meraki doesn't support specifying specific ICMP flows"
+        else:
+            # host case
+            acl["dst"] = acl["dst_ip"] + "/32"
+
+    elif "dst_subnet" in acl:
+        acl["dst"] = acl["dst_subnet"] + '/' + SUBNET_MASKS[acl["dst_mask"]]
+    # fqdn case
+    elif "dst_fqdn" in acl:
+        # NAT rules don't support fqdn
+        if NAT_FLAG:
+            return "NAT rules don't support FQDN"
+        acl["dst"] = acl["dst_fqdn"]
+    # Object case
+    elif "dst_obj" in acl:
+        # NAT rules don't support objects
+        if NAT_FLAG:
+            return "NAT Rules don't support objects"
+
+        acl["dst_obj"] = acl["dst_obj"].replace('.', '_')
+
+        # If object found, use ID as destination
+        if acl["dst_obj"] in objects:
+            obj_id = objects[acl["dst_obj"]]
+            acl["dst"] = f"OBJ[{obj_id}]"
+        else:
+            return "Object not found in local list"
+
+    elif "dst_obj_group" in acl:
+        # NAT rules don't support object groups
+        if NAT_FLAG:
+            return "NAT rules don't support object groups"
+
+        acl["dst_obj_group"] = acl["dst_obj_group"].replace('.', '_')
+
+        # If object found, use ID as source
+        if acl["dst_obj_group"] in object_groups:
+            obj_id = object_groups[acl["dst_obj_group"]]
+            acl["dst"] = f"GRP[{obj_id}]"
+        # Group of Groups Case
+        elif acl["dst_obj_group"] in group_of_groups:
+            obj_list = group_of_groups[acl["dst_obj_group"]]
+            acl["dst"] = [f"GRP[{obj}]" for obj in obj_list]
+        else:
+            return "Object group not found in local list"
+
+    # dst port processing
+    # ranges case
+    if "dst_port_range" in acl and acl["dst_port_range"]:
+        split = acl["dst_port_range"].split()
+
+        # translate port names
+        try:
+            split = [lookup_port(port) for port in split]
+        except OSError:
+            return f'{acl["dst_port_range"]} port not defined on system!'
+
+        # Build Meraki valid port range
+        acl["dst_port"] = split[0] + '-' + split[1]
+
+    elif "dst_port" in acl and acl['dst_port']:
+        # translate port names
+        if not acl["dst_port"].isdigit():
+
+            # If service not defined in the ASA table or on system, method call fails
+            try:
+                acl["dst_port"] = lookup_port(acl["dst_port"])
+            except OSError:
+                return f'{acl["dst_port"]} port not defined on system!'
+
+    # Port group case
+    elif "dst_port_group" in acl and acl['dst_port_group']:
+        # NAT rules don't support port groups
+        if NAT_FLAG:
+            return "NAT rules don't support port groups"
+
+        if acl['dst_port_group'] in port_groups:
+            ports = port_groups[acl['dst_port_group']]
+
+            comma_list = ','.join([port for port in ports if '-' not in port])
+            range_list = ','.join([port for port in ports if '-' in port])
+
+            acl["dst_port"] = [comma_list, range_list]
+        else:
+            return "Port group not found in local list"
+
+    # Found Match, applied current remark, reset remark variable
+    CURRENT_REMARK = ""
+
+    # Ignore default any, any, any, any rules (if not doing any translation)
+    if not ANY_FLAG and acl['protocol'] == 'ip' and acl["src"] == "any" and acl["dst"] == "any":
+        return "Default any any rules ignored. Please recreate manually in Meraki dashboard"
+
+    return acl
+
+
+def parse_acl_lines(lines):
+    """
+    Parse show access-list lines in order. Child (expanded) lines are only processed if their parent line failed.
+    :param lines: iterable of show access-list lines
+    :return: generator of (line, parse_line result), result is None for skipped child lines
+    """
+    global CHILD_FLAG
+
+    for line in lines:
+        # If line doesn't start with spaces and CHILD_FLAG is set already, we are at a new parent element -> reset flag
+        if not line.startswith(' ') and CHILD_FLAG:
+            CHILD_FLAG = False
+
+        if not line.startswith(' ') or CHILD_FLAG:
+            # Parse each line, returning dictionary with ASA ACL Entry mapped to key fields for MX L3 Rule (or nat rule)
+            acl_line = parse_line(line)
+
+            # Process any children elements under the failed line (remarks aren't failures)
+            if not type(acl_line) is dict and 'remark' not in acl_line:
+                CHILD_FLAG = True
+
+            yield line, acl_line
+        else:
+            yield line, None
+
+
+def open_acl_file(config_file_name):
+    """
+    Open a show access-list capture for reading. Plain text, gzip and xz captures are detected by their magic bytes,
+    '-' reads from stdin.
+    :param config_file_name: file containing show access-list from ASA ('-' for stdin)
+    :return: tuple of (raw byte stream, text stream)
+    """
+    if config_file_name == '-':
+        raw = sys.stdin.buffer
+    else:
+        raw = open(config_file_name, 'rb')
+
+    magic = raw.peek(6)[:6]
+    if magic.startswith(GZIP_MAGIC):
+        stream = gzip.GzipFile(fileobj=raw)
+    elif magic.startswith(XZ_MAGIC):
+        stream = lzma.LZMAFile(raw)
+    else:
+        stream = raw
+
+    return raw, io.TextIOWrapper(stream)
+
+
+def read_acl_lines(config_file_name):
+    """
+    Stream lines from a show access-list capture, one line in memory at a time.
+    :param config_file_name: file containing show access-list from ASA ('-' for stdin)
+    :return: generator of (line, bytes read from the source so far)
+    """
+    raw, fp = open_acl_file(config_file_name)
+    seekable = raw.seekable()
+    position = 0
+
+    try:
+        for line in fp:
+            # Pipes can't report their position, count characters instead
+            if seekable:
+                position = raw.tell()
+            else:
+                position += len(line)
+
+            yield line, position
+    finally:
+        if raw is not sys.stdin.buffer:
+            fp.close()
+
+
+def stream_rules(config_file_name, broken_fp):
+    """
+    Parse show access-list file rules as they are read, process each individual line, extract pieces for MX rules.
+    :param config_file_name: file containing show access-list from ASA ('-' for stdin)
+    :param broken_fp: file receiving un-processable lines
+    :return: generator of (rule set, acl) where rule set is 'outbound' or 'nat'
+    """
+    size = None if config_file_name == '-' else os.path.getsize(config_file_name)
+    position = 0
+
+    def track_position(lines):
+        # Hand plain lines to the parser, remembering how far into the source we are
+        nonlocal position
+        for line, position in lines:
+            yield line
+
+    with Progress() as progress:
+        # Progress measured in bytes read from the (possibly compressed) source
+        overall_progress = progress.add_task("Overall Progress", total=size, transient=True)
+        log = ProgressLog(progress, overall_progress)
+        counter = 1
+
+        for line, acl_line in parse_acl_lines(track_position(read_acl_lines(config_file_name))):
+            if acl_line is None:
+                log.log('child lines skipped', "Skipping Child line: [blue]'{}'[/] (line {})", line.strip(), counter)
+
+            # If returned type is not a dict, then something failed during line processing
+            elif not type(acl_line) is dict:
+
+                # Remark case
+                if 'remark' in acl_line:
+                    log.log('remarks', "Processing Remark line: [green]'{}'[/] (line {}) -> {}", line.strip(), counter,
+                            acl_line)
+                else:
+                    # Write un-processable rules to file, with the reason
+                    broken_fp.write(unprocessed_line(line, acl_line))
+
+                    log.log('unprocessed', "Error Processing line: [red]'{}'[/] (line {}) -> {}", line.strip(), counter,
+                            acl_line)
+
+            # Add to outbound acl rule set
+            elif acl_line['acl_name'] in ACL_TYPES['outbound_set']:
+                log.log('outbound', "Processing Outbound line: [green]'{}'[/] (line {})", line.strip(), counter)
+                yield 'outbound', acl_line
+
+            # Add to nat acl rule set
+            elif acl_line['acl_name'] in ACL_TYPES['nat_set']:
+                log.log('nat', "Processing NAT line: [green]'{}'[/] (line {})", line.strip(), counter)
+                yield 'nat', acl_line
+
+            counter += 1
+            log.update(completed=position)
+
+        log.close(f'Parsed {counter - 1:,} lines')
+        print_unprocessed(log.counts.get('unprocessed', 0))
+
+
+def unprocessed_line(line, reason):
+    """
+    Format a line that couldn't be translated for unprocessed_rules.txt.
+    :param line: show access-list line
+    :param reason: why the line couldn't be translated
+    :return: line with the reason as a trailing comment
+    """
+    return f'{line.rstrip()} # {reason}\n'
+
+
+def print_unprocessed(count):
+    """
+    Point to the unprocessed rules file if some lines couldn't be translated.
+    :param count: number of unprocessed lines
+    :return:
+    """
+    if count:
+        hint = '' if VERBOSE else ' (use --verbose to see why)'
+        console.print(f'[red]{count:,}[/] lines could not be translated, see [blue]unprocessed_rules.txt[/]{hint}')
+
+
+def iter_acl_rules(config_file_name, jobs=1):
+    """
+    Parse show access-list file rules as they are read, on the current process or across worker processes. Lines that
+    can't be translated are written to unprocessed_rules.txt.
+    :param config_file_name: file containing show access-list from ASA ('-' for stdin)
+    :param jobs: number of worker processes (1 parses on the current process)
+    :return: generator of (rule set, acl) where rule set is 'outbound' or 'nat'
+    """
+    with open('unprocessed_rules.txt', 'w') as broken_fp:
+        if jobs > 1:
+            yield from stream_rules_parallel(config_file_name, jobs, broken_fp)
+        else:
+            yield from stream_rules(config_file_name, broken_fp)
+
+
+def outbound_rules(rules, nat_acl_list):
+    """
+    Pass the outbound rules of a parsed rule stream on, setting the nat rules (a handful) aside.
+    :param rules: generator of (rule set, acl) from iter_acl_rules
+    :param nat_acl_list: list receiving the nat rules, complete once the outbound rules are exhausted
+    :return: generator of outbound acls
+    """
+    for rule_set, acl_line in rules:
+        if rule_set == 'outbound':
+            yield acl_line
+        else:
+            nat_acl_list.append(acl_line)
+
+
+def parse_rules(config_file_name, jobs=1):
+    """
+    Parse show access-list file rules, collecting the outbound and nat rule sets.
+    :param config_file_name: file containing show access-list from ASA ('-' for stdin)
+    :param jobs: number of worker processes (1 parses on the current process)
+    :return:
+    """
+    # List that holds on to nat ACL Rules
+    nat_acl_list = []
+
+    # List that holds on to ACL Rules
+    acl_list = list(outbound_rules(iter_acl_rules(config_file_name, jobs), nat_acl_list))
+
+    return acl_list, nat_acl_list
+
+
+def split_acl_chunks(lines, chunk_size):
+    """
+    Group show access-list lines into chunks for the worker processes. Chunks only end before a top level
+    access-list line, so expanded child lines (and remarks) stay with their parent.
+    :param lines: iterable of (line, bytes read so far) from read_acl_lines
+    :param chunk_size: minimum number of lines per chunk
+    :return: generator of (line list, bytes read up to the end of the chunk)
+    """
+    chunk = []
+    end = 0
+    for line, position in lines:
+        if len(chunk) >= chunk_size and not line.startswith(' ') and 'remark' not in chunk[-1]:
+            yield chunk, end
+            chunk = []
+
+        chunk.append(line)
+        end = position
+
+    if chunk:
+        yield chunk, end
+
+
+def parser_state():
+    """
+    Snapshot the object constructs and flags parse_line depends on (sent to each worker process).
+    :return: dictionary of parser globals
+    """
+    return {
+        'objects': objects, 'object_groups': object_groups, 'port_groups': port_groups,
+        'group_of_groups': group_of_groups, 'protocol_objects': protocol_objects, 'any_translation': any_translation,
+        'ACL_TYPES': ACL_TYPES, 'ANY_FLAG': ANY_FLAG, 'VERIFY_PARSER': VERIFY_PARSER
+    }
+
+
+def init_parse_worker(state):
+    """
+    Worker process initializer, load the parser globals from the main process.
+    :param state: dictionary of parser globals (see parser_state)
+    :return:
+    """
+    globals().update(state)
+
+
+def parse_acl_chunk(lines):
+    """
+    Parse a chunk of show access-list lines in a worker process. Every chunk starts with an empty remark, so the
+    remarks seen before the chunk's first rule are returned to let the main process carry over earlier remarks.
+    :param lines: chunk of show access-list lines
+    :return: dictionary of parsed rules, unprocessed lines and remark carry over details
+    """
+    global CURRENT_REMARK, CHILD_FLAG
+
+    CURRENT_REMARK = ""
+    CHILD_FLAG = False
+
+    result = {'acl_list': [], 'nat_acl_list': [], 'broken': [], 'errors': [], 'line_count': len(lines),
+              'leading_remarks': [], 'first_rule': None, 'remark_reset': False}
+
+    for line, acl_line in parse_acl_lines(lines):
+        if acl_line is None:
+            continue
+
+        if not type(acl_line) is dict:
+            if 'remark' in acl_line:
+                if not result['remark_reset']:
+                    result['leading_remarks'].append(remark_content(line.strip()))
+            else:
+                # Default any any rules also consume the current remark
+                if acl_line.startswith('Default any any'):
+                    result['remark_reset'] = True
+
+                result['broken'].append(unprocessed_line(line, acl_line))
+                result['errors'].append((line.strip(), acl_line))
+            continue
+
+        if acl_line['acl_name'] in ACL_TYPES['outbound_set']:
+            rule_set = 'acl_list'
+        elif acl_line['acl_name'] in ACL_TYPES['nat_set']:
+            rule_set = 'nat_acl_list'
+        else:
+            rule_set = None
+
+        if rule_set:
+            result[rule_set].append(acl_line)
+
+        # First rule of the chunk picks up any remark carried over from the previous chunk
+        if not result['remark_reset']:
+            result['remark_reset'] = True
+            if rule_set:
+                result['first_rule'] = (rule_set, len(result[rule_set]) - 1)
+
+    result['remark'] = CURRENT_REMARK
+
+    return result
+
+
+def stream_rules_parallel(config_file_name, jobs, broken_fp):
+    """
+    Parse show access-list file rules across a pool of worker processes. Output matches stream_rules exactly.
+    :param config_file_name: file containing show access-list from ASA ('-' for stdin)
+    :param jobs: number of worker processes
+    :param broken_fp: file receiving un-processable lines
+    :return: generator of (rule set, acl) where rule set is 'outbound' or 'nat'
+    """
+    size = None if config_file_name == '-' else os.path.getsize(config_file_name)
+    line_count = 0
+
+    carried_remark = ""
+
+    with Progress() as progress, ProcessPoolExecutor(max_workers=jobs, initializer=init_parse_worker,
+                                                     initargs=(parser_state(),)) as pool:
+        # Progress measured in bytes read from the (possibly compressed) source
+        overall_progress = progress.add_task("Overall Progress", total=size, transient=True)
+        log = ProgressLog(progress, overall_progress)
+
+        # Bounded number of chunks in flight, so memory stays flat regardless of the file size
+        pending = deque()
+
+        chunks = split_acl_chunks(read_acl_lines(config_file_name), PARSE_CHUNK_SIZE)
+        for chunk in itertools.chain(chunks, [None]):
+            if chunk is not None:
+                lines, end = chunk
+                pending.append((pool.submit(parse_acl_chunk, lines), end))
+
+                if len(pending) < jobs * 2:
+                    continue
+
+            # Merge finished chunks in file order
+            while pending and (chunk is None or len(pending) >= jobs * 2):
+                future, end = pending.popleft()
+                result = future.result()
+
+                # Replay the remark left over from the previous chunk
+                remark = carried_remark
+                for content in result['leading_remarks']:
+                    remark = append_remark(remark, content)
+
+                if result['first_rule'] and carried_remark:
+                    rule_set, index = result['first_rule']
+                    result[rule_set][index]['comment'] = remark
+
+                carried_remark = result['remark'] if result['remark_reset'] else remark
+
+                broken_fp.writelines(result['broken'])
+
+                log.count('outbound', len(result['acl_list']))
+                log.count('nat', len(result['nat_acl_list']))
+                for line, error in result['errors']:
+                    log.log('unprocessed', "Error Processing line: [red]'{}'[/] -> {}", line, error)
+
+                line_count += result['line_count']
+                log.update(completed=end)
+
+                for acl_line in result['acl_list']:
+                    yield 'outbound', acl_line
+                for acl_line in result['nat_acl_list']:
+                    yield 'nat', acl_line
+
+        log.flush()
+
+    console.print(f"Parsed [green]{line_count}[/] lines with {jobs} workers: [green]{log.counts.get('outbound', 0)}[/] "
+                  f"Outbound, [green]{log.counts.get('nat', 0)}[/] NAT rules")
+    print_unprocessed(log.counts.get('unprocessed', 0))
+
+
+def create_static_rules(static_file_name, network_id, routes=None):
+    """
+    Create static routes on MX Network if file provided.
+    :param static_file_name: static file name that contains static routes
+    :param network_id: meraki network id
+    :param routes: static routes to create instead of the file's (ex: from a compiled plan)
+    :return:
+    """
+    if routes is None:
+        with open(static_file_name, 'r') as fp:
+            # load routes
+            routes = json.load(fp)
+
+    # Get list of currently defined vlans
+    existing_routes = dashboard.appliance.getNetworkApplianceStaticRoutes(networkId=network_id)
+    existing_routes = [d['name'] for d in existing_routes]
+
+    # Get Count of Rules
+    route_count = len(routes)
+
+    with Progress() as progress:
+        overall_progress = progress.add_task("Overall Progress", total=route_count, transient=True)
+        log = ProgressLog(progress, overall_progress)
+        counter = 1
+
+        # Routes created concurrently once the loop finishes (asyncio mode)
+        calls = []
+
+        for route in routes:
+            log.log('routes', "Processing route: [yellow]'{}'[/] ({} of {})", route['name'], counter, route_count)
+
+            # If vlan doesn't exist create it
+            if route['name'] not in existing_routes and ASYNC_CONCURRENCY > 0:
+                calls.append((f"Creating route '{route['name']}'", 'appliance', 'createNetworkApplianceStaticRoute',
+                              dict(networkId=network_id, name=route['name'], subnet=route['subnet'],
+                                   gatewayIp=route['gatewayIp'])))
+            elif route['name'] not in existing_routes:
+                dashboard.appliance.createNetworkApplianceStaticRoute(networkId=network_id, name=route['name'],
+                                                                      subnet=route['subnet'],
+                                                                      gatewayIp=route['gatewayIp'])
+                journal('route', name=route['name'])
+
+            counter += 1
+            log.update(advance=1)
+
+        log.close()
+
+        if calls:
+            progress.console.print(f"Creating [green]{len(calls)}[/] routes ({ASYNC_CONCURRENCY} at a time)...")
+            for response in asyncio.run(run_async_calls(calls, progress.console)):
+                if response:
+                    journal('route', name=response['name'])
+
+
+def create_vlans(vlan_file_name, network_id, vlans=None):
+    """
+    Create vlans on target MX network if provided.
+    :param vlan_file_name: vlan file name that contains vlans
+    :param network_id: meraki network id
+    :param vlans: vlans to create instead of the file's (ex: from a compiled plan)
+    :return:
+    """
+    if vlans is None:
+        with open(vlan_file_name, 'r') as fp:
+            # load vlans
+            vlans = json.load(fp)
+
+    # Get list of currently defined vlans
+    existing_vlans = dashboard.appliance.getNetworkApplianceVlans(networkId=network_id)
+    existing_vlans = [d['name'] for d in existing_vlans]
+
+    # Get Count of Rules
+    vlan_count = len(vlans)
+
+    with Progress() as progress:
+        overall_progress = progress.add_task("Overall Progress", total=vlan_count, transient=True)
+        log = ProgressLog(progress, overall_progress)
+        counter = 1
+
+        # VLANs created concurrently once the loop finishes (asyncio mode)
+        calls = []
+
+        for vlan in vlans:
+            log.log('vlans', "Processing vlan: [blue]'{}'[/] ({} of {})", vlan['id'], counter, vlan_count)
+
+            # If vlan doesn't exist create it
+            if vlan['name'] not in existing_vlans and ASYNC_CONCURRENCY > 0:
+                calls.append((f"Creating vlan '{vlan['id']}'", 'appliance', 'createNetworkApplianceVlan',
+                              dict(networkId=network_id, id=vlan['id'], name=vlan['name'], subnet=vlan['subnet'],
+                                   applianceIp=vlan['applianceIp'], groupPolicyId=vlan['groupPolicyId'])))
+            elif vlan['name'] not in existing_vlans:
+                dashboard.appliance.createNetworkApplianceVlan(networkId=network_id, id=vlan['id'],
+                                                               name=vlan['name'], subnet=vlan['subnet'],
+                                                               applianceIp=vlan['applianceIp'],
+                                                               groupPolicyId=vlan['groupPolicyId'])
+                journal('vlan', name=vlan['name'])
+
+            counter += 1
+            log.update(advance=1)
+
+        log.close()
+
+        if calls:
+            progress.console.print(f"Creating [green]{len(calls)}[/] vlans ({ASYNC_CONCURRENCY} at a time)...")
+            for response in asyncio.run(run_async_calls(calls, progress.console)):
+                if response:
+                    journal('vlan', name=response['name'])
+
+
+def normalize_value(value):
+    """
+    Normalize a rule field value as the Dashboard may return it ('Any', spaces after commas).
+    :param value: rule field value
+    :return: normalized string
+    """
+    value = str(value).replace(' ', '')
+    return 'any' if value.lower() == 'any' else value
+
+
+def normalize_rule_set(kind, rules):
+    """
+    Normalize a rule set (fetched or compiled) to the fields the tool sets, so equal rule sets compare equal.
+    :param kind: rule set ('l3', 'one_to_one_nat' or 'l7')
+    :param rules: list of rules
+    :return: list of normalized rules
+    """
+    normalized = []
+
+    for rule in rules:
+        if kind == 'l3':
+            # The Dashboard appends its own default rule to the L3 rule set
+            if rule.get('comment') == 'Default rule':
+                continue
+
+            comment = rule.get('comment', '')
+            rule = {field: normalize_value(rule.get(field, 'any'))
+                    for field in ('policy', 'protocol', 'srcPort', 'srcCidr', 'destCidr', 'destPort')}
+            rule['protocol'] = rule['protocol'].lower()
+            rule['comment'] = comment
+        elif kind == 'one_to_one_nat':
+            rule = {
+                'name': rule.get('name'),
+                'lanIp': rule.get('lanIp'),
+                'publicIp': rule.get('publicIp'),
+                'uplink': rule.get('uplink'),
+                'allowedInbound': [
+                    {
+                        'protocol': normalize_value(inbound.get('protocol', 'any')).lower(),
+                        'destinationPorts': [normalize_value(port) for port in inbound.get('destinationPorts', [])],
+                        'allowedIps': [normalize_value(ip) for ip in inbound.get('allowedIps', [])]
+                    } for inbound in rule.get('allowedInbound', [])
+                ]
+            }
+        else:
+            rule = {field: normalize_value(rule.get(field)) for field in ('policy', 'type', 'value')}
+
+        normalized.append(rule)
+
+    return normalized
+
+
+def rule_set_hash(rules):
+    """
+    Content hash of a normalized rule set.
+    :param rules: list of normalized rules
+    :return: sha256 hex digest
+    """
+    return hashlib.sha256(json.dumps(rules, sort_keys=True).encode()).hexdigest()
+
+
+def fetch_rule_sets(network_id):
+    """
+    Fetch the network's current L3, 1:1 NAT and L7 rule sets concurrently.
+    :param network_id: meraki network id
+    :return: dictionary of rule set -> list of rules (rule sets that couldn't be fetched are left out)
+    """
+    def fetch(kind):
+        try:
+            return kind, getattr(dashboard.appliance, RULE_SETS[kind][1])(network_id)['rules']
+        except meraki.APIError as e:
+            console.print(f"[yellow]Warning:[/] couldn't fetch current {RULE_SETS[kind][0]}, they'll be pushed: {e}")
+            return kind, None
+
+    with timed_phase('fetch_rule_sets', network_id=network_id), ThreadPoolExecutor(max_workers=len(RULE_SETS)) as executor:
+        current_rules = dict(executor.map(fetch, RULE_SETS))
+
+    return {kind: rules for kind, rules in current_rules.items() if rules is not None}
+
+
+def print_rule_diff(kind, current, compiled, network_name=None):
+    """
+    Print a concise per-rule diff between the current and compiled rule sets.
+    :param kind: rule set ('l3', 'one_to_one_nat' or 'l7')
+    :param current: normalized current rules
+    :param compiled: normalized compiled rules
+    :param network_name: network name used in messages (NETWORK_NAME by default)
+    :return:
+    """
+    current_lines = [json.dumps(rule, sort_keys=True) for rule in current]
+    compiled_lines = [json.dumps(rule, sort_keys=True) for rule in compiled]
+
+    diff = [line for line in difflib.unified_diff(current_lines, compiled_lines, lineterm='', n=0)
+            if line[:1] in ('+', '-') and line[:3] not in ('+++', '---')]
+    added = sum(1 for line in diff if line.startswith('+'))
+
+    console.print(f"{RULE_SETS[kind][0]} changed on [blue]{network_name or NETWORK_NAME}[/]: [green]+{added}[/] "
+                  f"[red]-{len(diff) - added}[/] rules")
+    for line in diff[:DIFF_MAX_LINES]:
+        console.print(line, style='green' if line.startswith('+') else 'red', markup=False, highlight=False)
+    if len(diff) > DIFF_MAX_LINES:
+        console.print(f"... {len(diff) - DIFF_MAX_LINES} more changed rules")
+
+
+def push_rule_set(kind, network_id, rules, current_rules=None, network_name=None, summary=None):
+    """
+    Update a rule set on the network, unless it already matches the network's current rule set.
+    :param kind: rule set ('l3', 'one_to_one_nat' or 'l7')
+    :param network_id: meraki network id
+    :param rules: compiled rules
+    :param current_rules: current rule sets from fetch_rule_sets (None always pushes)
+    :param network_name: network name used in messages (NETWORK_NAME by default)
+    :param summary: optional dictionary receiving the outcome ('pushed', 'unchanged' or 'journal') per rule set
+    :return: response of API call (the current rule set if the push was skipped)
+    """
+    name, _, update = RULE_SETS[kind]
+    network_name = network_name or NETWORK_NAME
+    summary = {} if summary is None else summary
+
+    # Pushed before an interrupted run (--resume)
+    if (network_id, kind) in JOURNAL_PUSHED:
+        console.print(f"{name} already pushed to [blue]{network_name}[/] (journal), skipping")
+        summary[kind] = 'journal'
+        return {'rules': rules}
+
+    if current_rules is not None and kind in current_rules:
+        current = normalize_rule_set(kind, current_rules[kind])
+        compiled = normalize_rule_set(kind, rules)
+
+        if rule_set_hash(current) == rule_set_hash(compiled):
+            console.print(f"{name} unchanged on [blue]{network_name}[/], skipping")
+            summary[kind] = 'unchanged'
+            return {'rules': current_rules[kind]}
+
+        print_rule_diff(kind, current, compiled, network_name)
+
+    console.print(
+        f"Adding [green]{len(rules)}[/] {name} to [blue]{network_name}[/]. Please wait, this may take a few minutes...")
+    with timed_phase('push', kind=kind, network=network_name):
+        response = getattr(dashboard.appliance, update)(network_id, rules=rules)
+
+    journal('push', kind=kind, network_id=network_id)
+    summary[kind] = 'pushed'
+    return response
+
+
+def resolve_networks(org_id, targets):
+    """
+    Resolve target networks given by name, tag ('tag:<tag>') or id ('id:<network id>'), listing the org's networks
+    once.
+    :param org_id: meraki org id
+    :param targets: list of targets
+    :return: list of (network id, network name), in target order without duplicates
+    """
+    networks = dashboard.organizations.getOrganizationNetworks(org_id)
+
+    resolved = {}
+    for target in targets:
+        if target.startswith('tag:'):
+            matches = [network for network in networks if target[4:] in network.get('tags', [])]
+        elif target.startswith('id:'):
+            matches = [network for network in networks if network['id'] == target[3:]]
+        else:
+            matches = [network for network in networks if network['name'] == target]
+
+        if not matches:
+            console.print(f'[yellow]Warning:[/] no network matches target [blue]{target}[/]')
+
+        for network in matches:
+            resolved[network['id']] = network['name']
+
+    return list(resolved.items())
+
+
+def deploy_rule_sets(rule_sets, networks):
+    """
+    Apply compiled rule sets to several networks concurrently (NETWORK_WORKERS at a time), then print a per network
+    summary.
+    :param rule_sets: dictionary of rule set ('l3', 'one_to_one_nat', 'l7') -> compiled rules
+    :param networks: list of (network id, network name)
+    :return: dictionary of network id -> outcome per rule set (or error), networks may share a name
+    """
+    def deploy(network):
+        network_id, network_name = network
+        summary = {}
+
+        try:
+            current_rules = None if FORCE_PUSH else fetch_rule_sets(network_id)
+            for kind, rules in rule_sets.items():
+                push_rule_set(kind, network_id, rules, current_rules, network_name, summary)
+        except Exception as e:
+            # Any failure (ex: connection errors once the SDK gave up retrying) only fails this network
+            console.print(f'[red]Error:[/] pushing rules to [blue]{network_name}[/] ({network_id}) failed: {e!r}')
+            summary['error'] = repr(e)
+
+        return network_id, summary
+
+    console.print(f"Applying rules to [green]{len(networks)}[/] networks ({NETWORK_WORKERS} at a time)...")
+    with ThreadPoolExecutor(max_workers=NETWORK_WORKERS) as executor:
+        results = dict(executor.map(deploy, networks))
+
+    console.print(Panel.fit("Network Summary"))
+    for network_id, network_name in networks:
+        summary = results[network_id]
+        if 'error' in summary:
+            console.print(f"[blue]{network_name}[/] ({network_id}): [red]failed[/] ({summary['error']})")
+        else:
+            outcomes = ', '.join(f"{RULE_SETS[kind][0]} {outcome}" for kind, outcome in summary.items())
+            console.print(f"[blue]{network_name}[/] ({network_id}): [green]ok[/] ({outcomes})")
+
+    return results
+
+
+def rule_combos(acl):
+    """
+    Value lists of an ACL rule's protocol, src, dst and dst port. Their cartesian product gives the MX L3 rules.
+    :param acl: MX L3 acl object (containing pieces of MX rules)
+    :return: list of [protocols, srcs, dsts, dst ports]
+    """
+    combos = [[], [], [], []]
+
+    # Handle special case for protocol
+    if isinstance(acl['protocol'], list):
+        combos[0] += acl['protocol']
+    # Normal Defined Protocol
+    elif acl['protocol'] == 'ip':
+        combos[0].append('any')
+    # Everything else
+    else:
+        combos[0].append(acl['protocol'])
+
+    # Handle Special Object Cases for Src
+    if isinstance(acl['src'], list):
+        combos[1] += acl['src']
+    else:
+        combos[1].append(acl['src'])
+
+    # Handle Special Object Cases for Dst
+    if isinstance(acl['dst'], list):
+        combos[2] += acl['dst']
+    else:
+        combos[2].append(acl['dst'])
+
+    # Handle Port Group
+    if isinstance(acl['dst_port'], list):
+        comma_string, range_string = acl['dst_port']
+        if len(comma_string) > 0:
+            combos[3].append(comma_string)
+
+        if len(range_string) > 0:
+            ranges = range_string.split(',')
+            combos[3] += ranges
+    # Normal Defined Port
+    elif acl['dst_port']:
+        combos[3].append(acl['dst_port'])
+    # Everything else
+    else:
+        combos[3].append('any')
+
+    return combos
+
+
+def expansion_factor(acl):
+    """
+    Number of MX L3 rules an ACL rule expands to, without expanding it.
+    :param acl: MX L3 acl object (containing pieces of MX rules)
+    :return: expansion factor
+    """
+    factor = 1
+    for values in rule_combos(acl):
+        factor *= len(values)
+
+    return factor
+
+
+def expansion_report(total, acl_count, largest, print_console):
+    """
+    Report of the L3 rule expansion: the projected rule total and the ACL rules expanding the most.
+    :param total: projected number of MX L3 rules
+    :param acl_count: number of ACL rules
+    :param largest: (factor, index, acl name, line number) of the ACL rules expanding the most
+    :param print_console: console the report is printed to
+    :return:
+    """
+    print_console.print(f"Projected [green]{total}[/] Outbound Rules from [green]{acl_count}[/] ACL rules "
+                        f"(expansion factor {total / max(acl_count, 1):.1f})")
+
+    for factor, _, acl_name, line_number in sorted(largest, reverse=True):
+        if factor > 1:
+            print_console.print(f"  [yellow]x{factor}[/] {acl_name} line {line_number}")
+
+
+def expand_mx_rules(acl_list):
+    """
+    Convert the Cisco ASA ACL list into Meraki MX L3 firewall rules, lazily (one ACL rule expanded at a time).
+    :param acl_list: list of MX L3 acl objects (containing pieces of MX rules)
+    :return: generator of MX L3 firewall rules
+    """
+    for acl in acl_list:
+        policy = 'allow' if acl['action'] == 'permit' else 'deny'
+
+        # Every possible combo of protocol, src, dst, and dst port (cartesian product of lists)
+        for result in itertools.product(*rule_combos(acl)):
+            yield {
+                'comment': acl['comment'],
+                'policy': policy,
+                'protocol': result[0],
+                'srcPort': 'any',
+                'srcCidr': result[1],
+                'destCidr': result[2],
+                'destPort': result[3]
+            }
+
+
+def check_rule_budget(acl_list, top=5):
+    """
+    Print the expansion pre-flight report and enforce the rule budget (warn, or abort with --budget-abort) before any
+    rule is expanded. Expansion factors are computed from the parsed ACL rules, nothing is expanded.
+    :param acl_list: list of MX L3 acl objects (containing pieces of MX rules)
+    :param top: number of largest expansions listed
+    :return:
+    """
+    factors = [(expansion_factor(acl), index) for index, acl in enumerate(acl_list)]
+    total = sum(factor for factor, _ in factors)
+
+    largest = [(factor, index, acl_list[index].get('acl_name', ''), acl_list[index].get('line_number', '?'))
+               for factor, index in heapq.nlargest(top, factors)]
+    expansion_report(total, len(acl_list), largest, console)
+
+    if 0 < RULE_BUDGET < total:
+        if RULE_BUDGET_ABORT:
+            console.print(f'[red]Error:[/] projected {total} Outbound Rules exceed the rule budget ({RULE_BUDGET})!')
+            sys.exit(-1)
+
+        console.print(f'[yellow]Warning:[/] projected {total} Outbound Rules exceed the rule budget ({RULE_BUDGET})')
+
+
+def build_mx_rules(acl_list):
+    """
+    Convert the Cisco ASA ACL list into Meraki MX L3 firewall rules.
+    :param acl_list: list of MX L3 acl objects (containing pieces of MX rules)
+    :return: list of MX L3 firewall rules
+    """
+    return list(expand_mx_rules(acl_list))
+
+
+def rule_key(firewall_rule):
+    """
+    Normalized form of an MX L3 rule's match fields, equivalent rules (ex: case or comma separated value order
+    differences) share the same key. The comment isn't part of the match.
+    :param firewall_rule: MX L3 firewall rule
+    :return: hashable rule key
+    """
+    key = [firewall_rule['policy'].lower(), firewall_rule['protocol'].lower()]
+
+    for field in ('srcPort', 'srcCidr', 'destCidr', 'destPort'):
+        values = str(firewall_rule[field]).replace(' ', '').lower().split(',')
+        key.append(','.join(sorted(values)))
+
+    return tuple(key)
+
+
+def dedupe_rules(firewall_rules):
+    """
+    Remove exact duplicate and equivalent MX L3 rules. Only the first occurrence is kept, later copies can never match
+    (first match wins), so the rule set behaves the same.
+    :param firewall_rules: iterable of MX L3 firewall rules
+    :return: tuple of (deduplicated rules, number of rules removed)
+    """
+    seen = set()
+    unique_rules = []
+    count = 0
+
+    for firewall_rule in firewall_rules:
+        count += 1
+        key = rule_key(firewall_rule)
+
+        if key not in seen:
+            seen.add(key)
+            unique_rules.append(firewall_rule)
+
+    return unique_rules, count - len(unique_rules)
+
+
+def mergeable_value(value):
+    """
+    Check if a field value can be part of a comma separated multi-value field ('any' and port ranges can't).
+    :param value: srcCidr, destCidr or destPort value
+    :return: True if the value can be merged
+    """
+    return all(item != 'any' and '-' not in item for item in value.split(','))
+
+
+def merge_rules(firewall_rules):
+    """
+    Fold consecutive MX L3 rules with the same policy, protocol, source port and comment, differing in only one of
+    srcCidr, destCidr or destPort, into a single multi-value rule. Only neighbours are merged (never across a rule with
+    a different action), so first match evaluation gives the same result.
+    :param firewall_rules: iterable of MX L3 firewall rules
+    :return: tuple of (merged rules, number of rules folded into a previous rule)
+    """
+    merged_rules = []
+    count = 0
+
+    # Field the last merged rule varies in (None until a second rule is folded into it)
+    varying = None
+
+    for firewall_rule in firewall_rules:
+        count += 1
+
+        if merged_rules:
+            current = merged_rules[-1]
+            same = all(current[field] == firewall_rule[field] for field in ('policy', 'protocol', 'srcPort', 'comment'))
+            different = [field for field in MERGE_FIELDS if current[field] != firewall_rule[field]]
+
+            if same and len(different) == 1 and varying in (None, different[0]):
+                field = different[0]
+
+                if mergeable_value(current[field]) and mergeable_value(firewall_rule[field]):
+                    values = current[field].split(',')
+                    values += [value for value in firewall_rule[field].split(',') if value not in values]
+
+                    current[field] = ','.join(values)
+                    varying = field
+                    continue
+
+        merged_rules.append(dict(firewall_rule))
+        varying = None
+
+    return merged_rules, count - len(merged_rules)
+
+
+def compile_mx_rules(acl_list):
+    """
+    Convert the Cisco ASA ACL list into the final Meraki MX L3 rule set: expanded lazily, then deduplicated and
+    merged (the rule list is only materialized once, by the last pass).
+    :param acl_list: list of MX L3 acl objects (containing pieces of MX rules)
+    :return: list of MX L3 firewall rules
+    """
+    firewall_rules = expand_mx_rules(acl_list)
+
+    # Drop duplicates, ASA's own object-group expansions often repeat earlier rules
+    if DEDUPE_RULES:
+        firewall_rules, removed = dedupe_rules(firewall_rules)
+        console.print(f"Removed [green]{removed}[/] duplicate rules")
+
+    # Fold neighbouring rules into multi-value rules
+    if MERGE_RULES:
+        firewall_rules, merged = merge_rules(firewall_rules)
+        console.print(f"Merged [green]{merged}[/] rules into neighbouring rules")
+
+    return list(firewall_rules)
+
+
+def compile_rule_sets(acl_list, nat_acl_list):
+    """
+    Build the L3, 1:1 NAT and L7 rule sets once, to be applied to any number of networks.
+    :param acl_list: list of MX L3 acl objects (containing pieces of MX rules)
+    :param nat_acl_list: list of MX NAT acl objects (containing pieces of MX NAT rules)
+    :return: dictionary of rule set ('l3', 'one_to_one_nat', 'l7') -> rules
+    """
+    with timed_phase('build_rules', kind='l3'):
+        firewall_rules = compile_mx_rules(acl_list)
+
+    with timed_phase('build_rules', kind='one_to_one_nat'):
+        nat_rules, deny_rules = build_nat_rules(nat_acl_list)
+
+    with timed_phase('build_rules', kind='l7'):
+        l7_rules = build_l7_rules(deny_rules)
+
+    return {'l3': firewall_rules, 'one_to_one_nat': nat_rules, 'l7': l7_rules}
+
+
+def create_mx_rules(org_id, network_id, acl_list, current_rules=None):
+    """
+    Create L3 rules on Meraki MX, using pieces obtaining from object constructs and parsing ACL lines.
+    :param org_id: meraki org id
+    :param network_id: meraki network id
+    :param acl_list: list of MX L3 acl objects (containing pieces of MX rules)
+    :param current_rules: current rule sets of the network (the PUT is skipped if unchanged), None always pushes
+    :return: response of API call
+    """
+    # If the network was found, add the firewall rules to it
+    if org_id is not None and network_id is not None:
+        # Convert the Cisco ASA ACL list into Meraki MX firewall rules
+        with timed_phase('build_rules', kind='l3'):
+            firewall_rules = compile_mx_rules(acl_list)
+
+        # Update the firewall rules in the Meraki MX network
+        response = push_rule_set('l3', network_id, firewall_rules, current_rules)
+
+        return response
+    return None
+
+
+def build_nat_rules(nat_acl_list):
+    """
+    Convert the Cisco ASA NAT ACL list into Meraki MX 1:1 NAT rules (deny rules are returned for L7 translation).
+    :param nat_acl_list: list of MX NAT acl objects (containing pieces of MX NAT rules)
+    :return: tuple of (list of MX 1:1 NAT rules, list of deny acl objects)
+    """
+    nat_rules = {}
+    deny_rules = []
+    for acl in nat_acl_list:
+
+        # If action is deny, create l7 deny rule
+        if acl['action'] == 'deny':
+            deny_rules.append(acl)
+
+        # Skip dst == any (Meraki doesn't support specifying 'any' destination for NAT rule)
+        if acl['dst_ip'] == 'any4' or acl["dst_ip"] == "any":
+            continue
+
+        # Determine nat rule name
+        name = acl['dst_ip'].replace('.', '_')
+
+        # If this is a new nat rule, create the nat rule object and add it to the rules list, else grab existing
+        # nat rule
+        if name in nat_rules:
+            nat_rule = nat_rules[name]
+        else:
+            nat_rule = {
+                "name": name,
+                "lanIp": acl['dst_ip'],
+                "publicIp": nat_table[acl['dst_ip']],
+                "uplink": "internet1",
+                "allowedInbound": []
+            }
+
+        # Build inbound rule
+        inboundRule = {
+            "protocol": 'any' if acl['protocol'] == 'ip' else acl['protocol'],
+            "destinationPorts": ['any'] if acl['dst_port'] == 'any' else [acl['dst_port']],
+            "allowedIps": [acl['src']]
+        }
+        nat_rule['allowedInbound'].append(inboundRule)
+
+        # Add new nat rule
+        if name not in nat_rules:
+            nat_rules[name] = nat_rule
+
+    # One inbound rule per protocol and ports, with summarized allowed ips (inbound rules are a set of allows, so
+    # their order doesn't matter)
+    for nat_rule in nat_rules.values():
+        inbound_rules = {}
+        for inboundRule in nat_rule['allowedInbound']:
+            key = (inboundRule['protocol'], tuple(inboundRule['destinationPorts']))
+
+            if key in inbound_rules:
+                inbound_rules[key]['allowedIps'] += inboundRule['allowedIps']
+            else:
+                inbound_rules[key] = inboundRule
+
+        for inboundRule in inbound_rules.values():
+            inboundRule['allowedIps'] = summarize_cidrs(inboundRule['allowedIps'])
+
+        nat_rule['allowedInbound'] = list(inbound_rules.values())
+
+    return list(nat_rules.values()), deny_rules
+
+
+def create_nat_rules(org_id, network_id, nat_acl_list, current_rules=None):
+    """
+    Create NAT 1:1 rules on Meraki MX, using pieces obtaining from object constructs and parsing ACL lines.
+    :param org_id: meraki org id
+    :param network_id: meraki network id
+    :param nat_acl_list: list of MX NAT acl objects (containing pieces of MX NAT rules)
+    :param current_rules: current rule sets of the network (PUTs are skipped if unchanged), None always pushes
+    :return:
+    """
+    # If the network was found, add the firewall rules to it
+    if org_id is not None and network_id is not None:
+        # Convert the Cisco ASA ACL list into Meraki MX nat rules
+        with timed_phase('build_rules', kind='one_to_one_nat'):
+            nat_rules, deny_rules = build_nat_rules(nat_acl_list)
+
+        # Update the firewall rules in the Meraki MX network
+        response = push_rule_set('one_to_one_nat', network_id, nat_rules, current_rules)
+
+        # Add L7 Deny Rules
+        create_l7_rules(network_id, deny_rules, current_rules)
+
+        return response
+    return None
+
+
+def build_l7_rules(deny_rules):
+    """
+    Convert NAT ACL deny rules into Meraki MX L7 deny rules.
+    :param deny_rules: MX Deny Rules identified in NAT set
+    :return: list of MX L7 firewall rules
+    """
+    sources = []
+    for rule in deny_rules:
+        # No support for src == 'any' or a specific destination
+        if rule['src'] != 'any' and rule['dst'] == 'any':
+            sources.append(rule['src'])
+
+    # Every L7 rule is a deny, one rule per summarized prefix covers the same addresses
+    rules = []
+    for value in summarize_cidrs(sources):
+        rules.append(
+            {
+                "policy": "deny",
+                "type": "ipRange",
+                "value": value
+            }
+        )
+
+    return rules
+
+
+def create_l7_rules(network_id, deny_rules, current_rules=None):
+    """
+    Create L7 deny rules for NAT ACL rules (NAT only supports permit)
+    :param network_id: meraki network id
+    :param deny_rules: MX Deny Rules identified in NAT set
+    :param current_rules: current rule sets of the network (the PUT is skipped if unchanged), None always pushes
+    :return:
+    """
+    with timed_phase('build_rules', kind='l7'):
+        rules = build_l7_rules(deny_rules)
+
+    push_rule_set('l7', network_id, rules, current_rules)
+
+
+def placeholder_id(kind, name):
+    """
+    Placeholder id standing in for a Policy Object ('obj') or Policy Object Group ('grp') until it's created.
+    :param kind: 'obj' or 'grp'
+    :param name: object name
+    :return: placeholder id
+    """
+    return '{{' + kind + ':' + name + '}}'
+
+
+def substitute_placeholders(value, ids):
+    """
+    Replace placeholder ids with Dashboard ids in a compiled payload.
+    :param value: payload (str, list or dict, nested)
+    :param ids: placeholder id -> Dashboard id map
+    :return: payload with Dashboard ids (unknown placeholders are left in place)
+    """
+    if isinstance(value, str):
+        return PLACEHOLDER_PATTERN.sub(lambda match: ids.get(match.group(), match.group()), value)
+    if isinstance(value, list):
+        return [substitute_placeholders(item, ids) for item in value]
+    if isinstance(value, dict):
+        return {key: substitute_placeholders(item, ids) for key, item in value.items()}
+
+    return value
+
+
+class OfflineDashboard:
+    """
+    Stand-in for meraki.DashboardAPI used by compile mode, no API calls are made. Created objects, vlans and routes
+    are recorded in a plan (objects answered with placeholder ids), rule set updates are recorded as the final payloads.
+    """
+
+    # Placeholder ids and the plan follow call order, calls are made one at a time
+    thread_safe = False
+
+    def __init__(self):
+        self.plan = {'org_name': ORG_NAME, 'network_name': NETWORK_NAME, 'policy_objects': [],
+                     'policy_object_groups': [], 'vlans': [], 'static_routes': []}
+        self.rules = {'l3': [], 'one_to_one_nat': [], 'l7': []}
+        self.organizations = OfflineOrganizations(self)
+        self.networks = OfflineNetworks()
+        self.appliance = OfflineAppliance(self)
+
+
+class OfflineOrganizations:
+    """
+    Organization calls of the offline dashboard.
+    """
+
+    def __init__(self, offline):
+        self.offline = offline
+
+    def getOrganizations(self):
+        return [{'id': OFFLINE_ORG_ID, 'name': ORG_NAME}]
 
-            return acl
+    def getOrganization(self, organizationId):
+        return {'id': organizationId, 'name': ORG_NAME}
 
-    return "Invalid line"
+    def getOrganizationNetworks(self, organizationId, **kwargs):
+        return [{'id': OFFLINE_NETWORK_ID, 'name': NETWORK_NAME}]
 
+    def getOrganizationPolicyObjects(self, organizationId, **kwargs):
+        return list(self.offline.plan['policy_objects'])
 
-def parse_rules(config_file_name):
+    def getOrganizationPolicyObjectsGroups(self, organizationId, **kwargs):
+        return list(self.offline.plan['policy_object_groups'])
+
+    def createOrganizationPolicyObject(self, organizationId, name, category, type, **kwargs):
+        policy_object = dict(name=name, category=category, type=type, id=placeholder_id('obj', name), **kwargs)
+        self.offline.plan['policy_objects'].append(policy_object)
+        return policy_object
+
+    def createOrganizationPolicyObjectsGroup(self, organizationId, name, category, objectIds):
+        group = dict(name=name, category=category, objectIds=objectIds, id=placeholder_id('grp', name))
+        self.offline.plan['policy_object_groups'].append(group)
+        return group
+
+
+class OfflineNetworks:
+    """
+    Network calls of the offline dashboard.
+    """
+
+    def getNetwork(self, networkId):
+        return {'id': networkId, 'name': NETWORK_NAME}
+
+
+class OfflineAppliance:
+    """
+    Appliance calls of the offline dashboard.
+    """
+
+    def __init__(self, offline):
+        self.offline = offline
+
+    def getNetworkApplianceVlans(self, networkId):
+        return list(self.offline.plan['vlans'])
+
+    def getNetworkApplianceStaticRoutes(self, networkId):
+        return list(self.offline.plan['static_routes'])
+
+    def createNetworkApplianceVlan(self, networkId, **kwargs):
+        self.offline.plan['vlans'].append(kwargs)
+        return kwargs
+
+    def createNetworkApplianceStaticRoute(self, networkId, **kwargs):
+        self.offline.plan['static_routes'].append(kwargs)
+        return kwargs
+
+    def getNetworkApplianceFirewallL3FirewallRules(self, networkId):
+        return {'rules': self.offline.rules['l3']}
+
+    def getNetworkApplianceFirewallOneToOneNatRules(self, networkId):
+        return {'rules': self.offline.rules['one_to_one_nat']}
+
+    def getNetworkApplianceFirewallL7FirewallRules(self, networkId):
+        return {'rules': self.offline.rules['l7']}
+
+    def updateNetworkApplianceFirewallL3FirewallRules(self, networkId, rules):
+        self.offline.rules['l3'] = rules
+        return {'rules': rules}
+
+    def updateNetworkApplianceFirewallOneToOneNatRules(self, networkId, rules):
+        self.offline.rules['one_to_one_nat'] = rules
+        return {'rules': rules}
+
+    def updateNetworkApplianceFirewallL7FirewallRules(self, networkId, rules):
+        self.offline.rules['l7'] = rules
+        return {'rules': rules}
+
+
+def write_artifacts(output_dir, offline):
     """
-    Parse show access-list file rules, process each individual line, extract pieces for MX rules.
-    :param config_file_name: file containing show access-list from ASA
+    Write the compiled object creation plan and MX rule sets (compile mode).
+    :param output_dir: artifact directory
+    :param offline: OfflineDashboard the conversion ran against
     :return:
     """
-    global CHILD_FLAG
+    os.makedirs(output_dir, exist_ok=True)
 
-    # List that holds on to ACL Rules
-    acl_list = []
+    with open(os.path.join(output_dir, PLAN_FILE), 'w') as fp:
+        json.dump(offline.plan, fp, indent=2)
 
-    # List that holds on to nat ACL Rules
-    nat_acl_list = []
-    with open(config_file_name, 'r') as fp, open('unprocessed_rules.txt', 'w') as broken_fp:
-
-        # Get Count of Rules
-        rule_count = sum(1 for _ in fp)
-        fp.seek(0)
-
-        with Progress() as progress:
-            overall_progress = progress.add_task("Overall Progress", total=rule_count, transient=True)
-            counter = 1
-
-            for line in fp:
-                # If line doesn't start with spaces and CHILD_FLAG is set already, we are at a new parent element ->
-                # reset flag
-                if not line.startswith(' ') and CHILD_FLAG:
-                    CHILD_FLAG = False
-
-                if not line.startswith(' ') or CHILD_FLAG:
-                    # Parse each line, returning dictionary with ASA ACL Entry mapped to key fields for MX L3 Rule (
-                    # or nat rule)
-                    acl_line = parse_line(line)
-
-                    # If returned type is not a dict, then something failed during line processing
-                    if not type(acl_line) is dict:
-
-                        # Remark case
-                        if 'remark' in acl_line:
-                            progress.console.print(
-                                "Processing Remark line: [green]'{}'[/] ({} of {}) -> {}".format(line.strip(),
-                                                                                              str(counter),
-                                                                                              rule_count, acl_line))
-                        else:
-                            # Write un-processable rules to file
-                            broken_fp.write(line)
-
-                            # Process any children elements under the failed line
-                            CHILD_FLAG = True
-
-                            progress.console.print(
-                                "Error Processing line: [red]'{}'[/] ({} of {}) -> {}".format(line.strip(), str(counter),
-                                                                                        rule_count, acl_line))
-
-                    # Add to outbound acl rule set
-                    elif acl_line['acl_name'] in ACL_TYPES['outbound_set']:
-                        acl_list.append(acl_line)
-                        progress.console.print(
-                            "Processing Outbound line: [green]'{}'[/] ({} of {})".format(line.strip(), str(counter),
-                                                                                         rule_count))
-                    # Add to nat acl rule set
-                    elif acl_line['acl_name'] in ACL_TYPES['nat_set']:
-                        nat_acl_list.append(acl_line)
-                        progress.console.print(
-                            "Processing NAT line: [green]'{}'[/] ({} of {})".format(line.strip(), str(counter),
-                                                                                    rule_count))
-                else:
-                    progress.console.print(
-                        "Skipping Child line: [blue]'{}'[/] ({} of {})".format(line.strip(), str(counter), rule_count))
+    # One L3 rule per line, rule sets can be very large
+    with open(os.path.join(output_dir, L3_RULES_FILE), 'w') as fp:
+        for rule in offline.rules['l3']:
+            fp.write(json.dumps(rule) + '\n')
 
-                counter += 1
-                progress.update(overall_progress, advance=1)
+    with open(os.path.join(output_dir, NAT_RULES_FILE), 'w') as fp:
+        json.dump(offline.rules['one_to_one_nat'], fp, indent=2)
 
-    return acl_list, nat_acl_list
+    with open(os.path.join(output_dir, L7_RULES_FILE), 'w') as fp:
+        json.dump(offline.rules['l7'], fp, indent=2)
+
+    console.print(f"Compiled [green]{len(offline.plan['policy_objects'])}[/] Policy Objects, "
+                  f"[green]{len(offline.plan['policy_object_groups'])}[/] Policy Object Groups, "
+                  f"[green]{len(offline.rules['l3'])}[/] L3 rules, [green]{len(offline.rules['one_to_one_nat'])}[/] "
+                  f"1:1 NAT rules and [green]{len(offline.rules['l7'])}[/] L7 rules to [blue]{output_dir}[/]")
 
 
-def create_static_rules(static_file_name, network_id):
+def read_artifacts(artifact_dir):
     """
-    Create static routes on MX Network if file provided.
-    :param static_file_name: static file name that contains static routes
-    :param network_id: meraki network id
+    Read the compiled object creation plan and MX rule sets.
+    :param artifact_dir: artifact directory (written by compile mode)
+    :return: tuple of (plan, L3 rules, 1:1 NAT rules, L7 rules)
+    """
+    with open(os.path.join(artifact_dir, PLAN_FILE), 'r') as fp:
+        plan = json.load(fp)
+
+    with open(os.path.join(artifact_dir, L3_RULES_FILE), 'r') as fp:
+        l3_rules = [json.loads(line) for line in fp if line.strip()]
+
+    with open(os.path.join(artifact_dir, NAT_RULES_FILE), 'r') as fp:
+        nat_rules = json.load(fp)
+
+    with open(os.path.join(artifact_dir, L7_RULES_FILE), 'r') as fp:
+        l7_rules = json.load(fp)
+
+    return plan, l3_rules, nat_rules, l7_rules
+
+
+def create_planned_objects(org_id, planned, ids):
+    """
+    Create the planned Policy Objects (or Policy Object Groups) missing from the org, mapping each placeholder id to
+    its Dashboard id.
+    :param org_id: meraki org id
+    :param planned: planned objects (compile mode plan, with placeholder ids)
+    :param ids: placeholder id -> Dashboard id map, updated in place
     :return:
     """
-    with open(static_file_name, 'r') as fp:
+    to_create = []
+    for mx_object in planned:
+        existing = object_groups if 'objectIds' in mx_object else objects
 
-        # load vlans
-        routes = json.load(fp)
+        if mx_object['name'] in existing:
+            ids[mx_object['id']] = existing[mx_object['name']]
+        else:
+            to_create.append(substitute_placeholders(mx_object, ids))
 
-        # Get list of currently defined vlans
-        existing_routes = dashboard.appliance.getNetworkApplianceStaticRoutes(networkId=network_id)
-        existing_routes = [d['name'] for d in existing_routes]
+    # Planned objects (or groups) don't depend on each other, they're created as one level
+    created = []
+    with Progress() as progress:
+        overall_progress = progress.add_task("Overall Progress", total=len(to_create), transient=True)
+        log = ProgressLog(progress, overall_progress)
 
-        # Get Count of Rules
-        route_count = len(routes)
+        for new_object in create_object_level(org_id, to_create, progress.console):
+            log.log('created', "Created object: [blue]'{}'[/]", new_object['name'])
+            created.append(new_object)
+            log.update(advance=1)
 
-        with Progress() as progress:
-            overall_progress = progress.add_task("Overall Progress", total=route_count, transient=True)
-            counter = 1
+        log.close()
 
-            for route in routes:
-                progress.console.print(
-                    "Processing route: [yellow]'{}'[/] ({} of {})".format(route['name'], str(counter), route_count))
+    placeholders = {mx_object['name']: mx_object['id'] for mx_object in to_create}
+    for new_object in created:
+        ids[placeholders[new_object['name']]] = new_object['id']
 
-                # If vlan doesn't exist create it
-                if route['name'] not in existing_routes:
-                    dashboard.appliance.createNetworkApplianceStaticRoute(networkId=network_id, name=route['name'],
-                                                                          subnet=route['subnet'],
-                                                                          gatewayIp=route['gatewayIp'])
+        if 'objectIds' in new_object:
+            object_groups[new_object['name']] = new_object['id']
+        else:
+            index_policy_object(new_object)
 
-                counter += 1
-                progress.update(overall_progress, advance=1)
 
+def apply_artifacts(artifact_dir, use_cache=True, refresh_cache=False, targets=None):
+    """
+    Push compiled artifacts to the Dashboard (apply mode): create the planned objects, vlans and static routes, then
+    update the L3, 1:1 NAT and L7 rule sets with the placeholder ids replaced.
+    :param artifact_dir: artifact directory (written by compile mode)
+    :param use_cache: use the org state cache
+    :param refresh_cache: re-list the org's Policy Objects and Groups instead of using the cache
+    :param targets: target networks (names, 'tag:<tag>' or 'id:<network id>'), the plan's targets (batch
+    conversion) or NETWORK_NAME if None
+    :return:
+    """
+    plan, l3_rules, nat_rules, l7_rules = read_artifacts(artifact_dir)
+    targets = targets or plan.get('targets')
+
+    cache = load_cache() if use_cache else {}
+    org_id = find_org_id(cache)
+    networks = resolve_target_networks(cache, org_id, targets)
+
+    if org_id is None or not networks:
+        console.print(f'[red]Error:[/] org [blue]{ORG_NAME}[/] or target network not found!')
+        sys.exit(-1)
+
+    console.print(Panel.fit("Creating Network Objects and Network Group Objects", title="Step 1"))
+    cached = use_cache and not refresh_cache and load_cached_objects(cache, org_id)
+    if not cached:
+        list_policy_objects(org_id)
+
+    ids = {}
+    with timed_phase('create_objects.planned'):
+        create_planned_objects(org_id, plan['policy_objects'], ids)
+        create_planned_objects(org_id, plan['policy_object_groups'], ids)
+
+    if use_cache:
+        save_cache(cache, org_id, listed=not cached)
+
+    console.print(Panel.fit("Creating VLAN's and Static Rules", title="Step 2"))
+    for network_id, network_name in networks:
+        if plan['vlans']:
+            with timed_phase('vlans', network=network_name):
+                create_vlans(None, network_id, vlans=plan['vlans'])
+        if plan['static_routes']:
+            with timed_phase('static_routes', network=network_name):
+                create_static_rules(None, network_id, routes=plan['static_routes'])
+
+    # Every placeholder must resolve before anything is pushed
+    l3_rules, nat_rules, l7_rules = substitute_placeholders([l3_rules, nat_rules, l7_rules], ids)
+    unresolved = PLACEHOLDER_PATTERN.findall(json.dumps([l3_rules, nat_rules, l7_rules]))
+    if unresolved:
+        console.print(f'[red]Error:[/] objects missing from the org, rules not pushed: {", ".join(set(unresolved))}')
+        sys.exit(-1)
 
-def create_vlans(vlan_file_name, network_id):
+    console.print(Panel.fit("Creating MX Rules", title="Step 3"))
+    deploy_rule_sets({'l3': l3_rules, 'one_to_one_nat': nat_rules, 'l7': l7_rules}, networks)
+
+
+def confirm(question, default, stdin_capture=False):
     """
-    Create vlans on target MX network if provided.
-    :param vlan_file_name: vlan file name that contains vlans
-    :param network_id: meraki network id
+    Ask a yes/no question. When stdin carries the show access-list capture, the question is asked on the terminal.
+    :param question: question to ask
+    :param default: default answer
+    :param stdin_capture: stdin is being used for the show access-list capture
+    :return: answer
+    """
+    if not stdin_capture:
+        return Confirm.ask(question, default=default)
+
+    try:
+        with open('/dev/tty') as tty:
+            return Confirm.ask(question, default=default, stream=tty)
+    except OSError:
+        # No terminal available (ex: running from a pipeline), use the default
+        console.print(f"{question} [cyan]({'y' if default else 'n'})[/]")
+        return default
+
+
+def journal(step, **fields):
+    """
+    Append a completed step to the checkpoint journal (no-op if no journal is open). Each record is flushed to disk
+    before the run moves on.
+    :param step: step name ('object', 'group', 'vlan', 'vlans', 'route', 'routes', 'push', 'done')
+    :param fields: step details (ex: created object and its id)
     :return:
     """
-    with open(vlan_file_name, 'r') as fp:
+    if JOURNAL_FP is None:
+        return
+
+    # Rule sets are pushed to several networks from worker threads
+    with JOURNAL_LOCK:
+        JOURNAL_FP.write(json.dumps(dict(step=step, **fields)) + '\n')
+        JOURNAL_FP.flush()
+        os.fsync(JOURNAL_FP.fileno())
 
-        # load vlans
-        vlans = json.load(fp)
 
-        # Get list of currently defined vlans
-        existing_vlans = dashboard.appliance.getNetworkApplianceVlans(networkId=network_id)
-        existing_vlans = [d['name'] for d in existing_vlans]
+def journal_signature(file_names, targets=None):
+    """
+    Identify the run inputs a journal belongs to (a journal is only resumed with the same inputs).
+    :param file_names: input file names (show run, show access-list, vlan, static routes)
+    :param targets: target networks (--networks), None for NETWORK_NAME
+    :return: signature dictionary
+    """
+    files = []
+    for file_name in file_names:
+        if file_name in ('', '-'):
+            files.append(file_name)
+        else:
+            stat = os.stat(file_name)
+            files.append([os.path.abspath(file_name), stat.st_size, stat.st_mtime])
+
+    return {'files': files, 'org': ORG_NAME, 'network': targets or NETWORK_NAME, 'acl_types': ACL_TYPES,
+            'any_flag': ANY_FLAG}
 
-        # Get Count of Rules
-        vlan_count = len(vlans)
 
-        with Progress() as progress:
-            overall_progress = progress.add_task("Overall Progress", total=vlan_count, transient=True)
-            counter = 1
+def replay_journal(records):
+    """
+    Restore the created Policy Object and Group ids from journal records (the other constructs are rebuilt from the
+    show run, already created objects are skipped).
+    :param records: journal records (after the start record)
+    :return: dictionary of completed steps ('vlans', 'routes': True)
+    """
+    completed = {}
 
-            for vlan in vlans:
-                progress.console.print(
-                    "Processing vlan: [blue]'{}'[/] ({} of {})".format(vlan['id'], str(counter), vlan_count))
+    for record in records:
+        step = record['step']
 
-                # If vlan doesn't exist create it
-                if vlan['name'] not in existing_vlans:
-                    dashboard.appliance.createNetworkApplianceVlan(networkId=network_id, id=vlan['id'],
-                                                                   name=vlan['name'], subnet=vlan['subnet'],
-                                                                   applianceIp=vlan['applianceIp'],
-                                                                   groupPolicyId=vlan['groupPolicyId'])
+        if step == 'object':
+            index_policy_object(record['object'])
+        elif step == 'group':
+            object_groups[record['name']] = record['id']
+        elif step in ('vlans', 'routes'):
+            completed[step] = True
+        elif step == 'push':
+            JOURNAL_PUSHED.add((record['network_id'], record['kind']))
 
-                counter += 1
-                progress.update(overall_progress, advance=1)
+    return completed
 
 
-def create_mx_rules(org_id, network_id, acl_list):
+def open_journal(signature, resume=False):
     """
-    Create L3 rules on Meraki MX, using pieces obtaining from object constructs and parsing ACL lines.
-    :param org_id: meraki org id
-    :param network_id: meraki network id
-    :param acl_list: list of MX L3 acl objects (containing pieces of MX rules)
-    :return: response of API call
+    Start a new checkpoint journal, or (resume) replay the previous run's journal and continue appending to it.
+    :param signature: run inputs (see journal_signature)
+    :param resume: resume the previous run
+    :return: dictionary of completed steps (see replay_journal)
     """
-    # If the network was found, add the firewall rules to it
-    if org_id is not None and network_id is not None:
-        # Convert the Cisco ASA ACL list into Meraki MX firewall rules
-        firewall_rules = []
-        for acl in acl_list:
-
-            # Build every possible combo of protocol, src, dst, and dst port (cartesian product of lists to create
-            # larger list of tuples representing all possible combinations)
-            combos = [[], [], [], []]
-
-            # Handle special case for protocol
-            if isinstance(acl['protocol'], list):
-                combos[0] += acl['protocol']
-            # Normal Defined Protocol
-            elif acl['protocol'] == 'ip':
-                combos[0].append('any')
-            # Everything else
-            else:
-                combos[0].append(acl['protocol'])
+    global JOURNAL_FP
 
-            # Handle Special Object Cases for Src
-            if isinstance(acl['src'], list):
-                combos[1] += acl['src']
-            else:
-                combos[1].append(acl['src'])
+    completed = {}
+    records = []
 
-            # Handle Special Object Cases for Dst
-            if isinstance(acl['dst'], list):
-                combos[2] += acl['dst']
-            else:
-                combos[2].append(acl['dst'])
-
-            # Handle Port Group
-            if isinstance(acl['dst_port'], list):
-                comma_string, range_string = acl['dst_port']
-                if len(comma_string) > 0:
-                    combos[3].append(comma_string)
-
-                if len(range_string) > 0:
-                    ranges = range_string.split(',')
-                    combos[3] += ranges
-            # Normal Defined Port
-            elif acl['dst_port']:
-                combos[3].append(acl['dst_port'])
-            # Everything else
-            else:
-                combos[3].append('any')
-
-            results = list(itertools.product(*combos))
-
-            for result in results:
-                firewall_rule = {
-                    'comment': acl['comment'],
-                    'policy': 'allow' if acl['action'] == 'permit' else 'deny',
-                    'protocol': result[0],
-                    'srcPort': 'any',
-                    'srcCidr': result[1],
-                    'destCidr': result[2],
-                    'destPort': result[3]
-                }
-                firewall_rules.append(firewall_rule)
+    if resume:
+        try:
+            with open(JOURNAL_FILE, 'r') as fp:
+                for line in fp:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # Partially written last record (run killed mid write)
+                        break
+        except OSError:
+            pass
+
+        if not records or records[0].get('step') != 'start':
+            console.print('[yellow]No journal to resume, starting from the beginning.[/]')
+            records = []
+        elif records[-1]['step'] == 'done':
+            console.print('[yellow]Previous run completed, starting from the beginning.[/]')
+            records = []
+        elif json.loads(json.dumps(signature)) != records[0]['signature']:
+            console.print('[red]Error:[/] the journal belongs to a run with different inputs, rerun without --resume!')
+            sys.exit(-1)
+        else:
+            completed = replay_journal(records[1:])
+            console.print(f"Resuming from journal: [green]{len(records) - 1}[/] completed steps replayed")
 
-        # Update the firewall rules in the Meraki MX network
-        console.print(
-            f"Adding [green]{len(firewall_rules)}[/] Outbound Rules to [blue]{NETWORK_NAME}[/]. Please wait, this may take a few minutes...")
-        response = dashboard.appliance.updateNetworkApplianceFirewallL3FirewallRules(network_id, rules=firewall_rules)
+    # Rewrite the readable records (drops a partially written last record), then append
+    with open(JOURNAL_FILE + '.tmp', 'w') as fp:
+        for record in records or [{'step': 'start', 'signature': signature}]:
+            fp.write(json.dumps(record) + '\n')
+    os.replace(JOURNAL_FILE + '.tmp', JOURNAL_FILE)
 
-        return response
-    return None
+    JOURNAL_FP = open(JOURNAL_FILE, 'a')
+    return completed
 
 
-def create_nat_rules(org_id, network_id, nat_acl_list):
+def close_journal():
     """
-    Create NAT 1:1 rules on Meraki MX, using pieces obtaining from object constructs and parsing ACL lines.
-    :param org_id: meraki org id
-    :param network_id: meraki network id
-    :param nat_acl_list: list of MX NAT acl objects (containing pieces of MX NAT rules)
+    Mark the run complete in the journal and close it.
     :return:
     """
-    # If the network was found, add the firewall rules to it
-    if org_id is not None and network_id is not None:
-        # Convert the Cisco ASA ACL list into Meraki MX nat rules
-        nat_rules = {}
-        deny_rules = []
-        for acl in nat_acl_list:
+    global JOURNAL_FP
 
-            # If action is deny, create l7 deny rule
-            if acl['action'] == 'deny':
-                deny_rules.append(acl)
+    if JOURNAL_FP is not None:
+        journal('done')
+        JOURNAL_FP.close()
+        JOURNAL_FP = None
 
-            # Skip dst == any (Meraki doesn't support specifying 'any' destination for NAT rule)
-            if acl['dst_ip'] == 'any4' or acl["dst_ip"] == "any":
-                continue
 
-            # Determine nat rule name
-            name = acl['dst_ip'].replace('.', '_')
+class Metrics:
+    """
+    Phase timings and per operation Dashboard call statistics (calls, errors, retries, 429s, bytes sent and a latency
+    histogram) of a run. Calls may be recorded from worker threads.
+    """
 
-            # If this is a new nat rule, create the nat rule object and add it to the rules list, else grab existing
-            # nat rule
-            if name in nat_rules:
-                nat_rule = nat_rules[name]
-            else:
-                nat_rule = {
-                    "name": name,
-                    "lanIp": acl['dst_ip'],
-                    "publicIp": nat_table[acl['dst_ip']],
-                    "uplink": "internet1",
-                    "allowedInbound": []
-                }
-
-            # Build inbound rule
-            inboundRule = {
-                "protocol": 'any' if acl['protocol'] == 'ip' else acl['protocol'],
-                "destinationPorts": ['any'] if acl['dst_port'] == 'any' else [acl['dst_port']],
-                "allowedIps": [acl['src']]
-            }
-            nat_rule['allowedInbound'].append(inboundRule)
+    def __init__(self):
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.phases = {}
+        self.operations = {}
+
+    def record_phase(self, name, seconds, **labels):
+        """
+        Add time spent in a phase (a phase entered several times accumulates).
+        :param name: phase name (ex: 'create_objects.network_objects', 'push')
+        :param seconds: time spent
+        :param labels: extra labels (ex: kind, network)
+        :return:
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            phase = self.phases.setdefault(key, {'phase': name, 'labels': labels, 'seconds': 0.0, 'count': 0})
+            phase['seconds'] += seconds
+            phase['count'] += 1
+
+    def record_call(self, operation, seconds, bytes_sent=0, retries=0, rate_limited=0, error=False):
+        """
+        Add a Dashboard call.
+        :param operation: SDK operation (ex: 'createOrganizationPolicyObject')
+        :param seconds: call latency, retries and rate limit waits included
+        :param bytes_sent: request body bytes, retries included
+        :param retries: attempts after the first one
+        :param rate_limited: 429 answers
+        :param error: the call failed
+        :return:
+        """
+        with self.lock:
+            stats = self.operations.get(operation)
+            if stats is None:
+                stats = self.operations[operation] = {'calls': 0, 'errors': 0, 'retries': 0, 'rate_limited': 0,
+                                                      'bytes_sent': 0, 'latency_sum': 0.0, 'latency_max': 0.0,
+                                                      'buckets': [0] * (len(API_LATENCY_BUCKETS) + 1)}
+            stats['calls'] += 1
+            stats['errors'] += int(error)
+            stats['retries'] += retries
+            stats['rate_limited'] += rate_limited
+            stats['bytes_sent'] += bytes_sent
+            stats['latency_sum'] += seconds
+            stats['latency_max'] = max(stats['latency_max'], seconds)
+
+            # Last bucket is +Inf
+            bucket = next((i for i, bound in enumerate(API_LATENCY_BUCKETS) if seconds <= bound),
+                          len(API_LATENCY_BUCKETS))
+            stats['buckets'][bucket] += 1
+
+    def summary(self):
+        """
+        Metrics as a JSON serializable dictionary.
+        :return: summary dictionary
+        """
+        with self.lock:
+            api = {}
+            for operation, stats in sorted(self.operations.items()):
+                bounds = [str(bound) for bound in API_LATENCY_BUCKETS] + ['+Inf']
+                api[operation] = dict(stats, buckets=dict(zip(bounds, itertools.accumulate(stats['buckets']))))
+
+            return {'started': self.started, 'seconds': time.time() - self.started,
+                    'phases': list(self.phases.values()), 'api': api}
+
+
+@contextlib.contextmanager
+def timed_phase(name, **labels):
+    """
+    Time a phase of the run into METRICS (no-op without --metrics / --metrics-textfile), and profile it with --profile
+    if it's one of PROFILE_STEPS.
+    :param name: phase name
+    :param labels: extra labels (ex: kind, network)
+    :return:
+    """
+    profiler = None
+    if PROFILE_DIR is not None and name in PROFILE_STEPS:
+        tracemalloc.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
 
-            # Add new nat rule
-            if name not in nat_rules:
-                nat_rules[name] = nat_rule
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
 
-        # Update the firewall rules in the Meraki MX network
-        console.print(
-            f"Adding [green]{len(nat_rules)}[/] NAT Rules to [blue]{NETWORK_NAME}[/]. Please wait, this may take a few minutes...")
-        response = dashboard.appliance.updateNetworkApplianceFirewallOneToOneNatRules(network_id,
-                                                                                      rules=list(nat_rules.values()))
+        if profiler is not None:
+            profiler.disable()
+            write_profile(profiler, '.'.join([name] + [str(value) for value in labels.values()]), seconds)
 
-        # Add L7 Deny Rules
-        console.print(
-            f"Adding [green]{len(deny_rules)}[/] L7 Deny NAT Rules to [blue]{NETWORK_NAME}[/]. Please wait, this may take a few minutes...")
-        create_l7_rules(network_id, deny_rules)
+        if METRICS is not None:
+            METRICS.record_phase(name, seconds, **labels)
 
-        return response
-    return None
 
+def write_profile(profiler, step, seconds):
+    """
+    Write a profiled step to PROFILE_DIR: cProfile stats (<step>.pstats, open with 'python3 -m pstats') and the
+    PROFILE_TOP source lines holding the most memory at the end of the step (<step>.allocations.txt).
+    :param profiler: stopped cProfile.Profile of the step
+    :param step: step name (a step profiled again gets a numbered file)
+    :param seconds: step duration
+    :return:
+    """
+    _, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+        tracemalloc.Filter(False, '<unknown>')
+    ])
+    tracemalloc.stop()
+
+    base = re.sub(r'[^\w.-]', '_', step)
+    name, copy = base, 1
+    while name in PROFILE_FILES:
+        copy += 1
+        name = f'{base}-{copy}'
+    PROFILE_FILES.add(name)
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profiler.dump_stats(os.path.join(PROFILE_DIR, name + '.pstats'))
+
+    statistics = snapshot.statistics('lineno')
+    with open(os.path.join(PROFILE_DIR, name + '.allocations.txt'), 'w') as fp:
+        fp.write(f'{step}: {seconds:.3f}s, peak traced memory {peak / 2 ** 20:.1f} MiB, '
+                 f'{sum(stat.size for stat in statistics) / 2 ** 20:.1f} MiB held at the end of the step\n\n')
+        for stat in statistics[:PROFILE_TOP]:
+            fp.write(f'{stat}\n')
+
+    console.print(f'Profiled [blue]{step}[/]: {seconds:.2f}s, peak [green]{peak / 2 ** 20:.1f}[/] MiB -> '
+                  f'[blue]{os.path.join(PROFILE_DIR, name)}.pstats[/]')
+
+
+def count_response(response, *args, **kwargs):
+    """
+    requests response hook of the Dashboard SDK session, counts every HTTP attempt (SDK retries included) of the
+    operation running on this thread.
+    :param response: requests response
+    :return:
+    """
+    attempts = getattr(API_CONTEXT, 'attempts', None)
+    if attempts is not None:
+        # The scheduler granted the first attempt, SDK retries and extra pages are charged to the bucket afterwards
+        if attempts['count'] and API_SCHEDULER is not None:
+            API_SCHEDULER.charge()
+
+        attempts['count'] += 1
+        attempts['bytes'] += len(response.request.body or b'')
+        attempts['rate_limited'] += int(response.status_code == 429)
 
-def create_l7_rules(network_id, deny_rules):
+    # The SDK sleeps before retrying a 429 itself, every other call (and run sharing the bucket) waits as long
+    if response.status_code == 429 and API_SCHEDULER is not None:
+        API_SCHEDULER.pause(int(response.headers.get('Retry-After', API_RETRY_AFTER)))
+
+
+def api_priority(operation):
     """
-    Create L7 deny rules for NAT ACL rules (NAT only supports permit)
-    :param network_id: meraki network id
-    :param deny_rules: MX Deny Rules identified in NAT set
+    Scheduling priority of a Dashboard operation, lookups go before creates and updates (lower is served first).
+    :param operation: SDK operation (ex: 'getOrganizationPolicyObjects')
+    :return: priority
+    """
+    return 0 if operation.startswith('get') else 1
+
+
+class ApiScheduler:
+    """
+    Token bucket every Dashboard call goes through, refilled at rate requests per second up to burst tokens. Calls
+    waiting for a token are served by priority (then in arrival order), and a 429 pauses the whole bucket for its
+    Retry-After. With a bucket file the tokens and pause live in that file (locked on every update), so concurrent runs
+    against the same org share one budget.
+    """
+
+    def __init__(self, rate, burst, bucket_file=''):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.bucket_file = bucket_file
+        self.lock = threading.Lock()
+        self.condition = threading.Condition()
+        self.waiting = []
+        self.sequence = itertools.count()
+        self.state = {'tokens': self.burst, 'updated': time.time(), 'resume_at': 0}
+
+    @contextlib.contextmanager
+    def bucket(self):
+        """
+        Bucket state, refilled up to now. Read from and written back to the bucket file (exclusively locked) if any.
+        :return: state dictionary (tokens, updated, resume_at)
+        """
+        with self.lock:
+            if not self.bucket_file:
+                self.refill(self.state)
+                yield self.state
+                return
+
+            with open(self.bucket_file, 'a+') as fp:
+                fcntl.flock(fp, fcntl.LOCK_EX)
+                fp.seek(0)
+                try:
+                    state = json.loads(fp.read())
+                except ValueError:
+                    # New (or truncated) bucket file
+                    state = {'tokens': self.burst, 'updated': time.time(), 'resume_at': 0}
+
+                self.refill(state)
+                yield state
+
+                fp.seek(0)
+                fp.truncate()
+                json.dump(state, fp)
+
+    def refill(self, state):
+        """
+        Add the tokens earned since the last update (up to burst).
+        :param state: bucket state
+        :return:
+        """
+        now = time.time()
+        state['tokens'] = min(self.burst, state['tokens'] + (now - state['updated']) * self.rate)
+        state['updated'] = now
+
+    def take(self):
+        """
+        Take a token if one is available and the bucket isn't paused.
+        :return: 0 if a token was taken, seconds to wait otherwise
+        """
+        with self.bucket() as state:
+            if state['resume_at'] > state['updated']:
+                return state['resume_at'] - state['updated']
+
+            if state['tokens'] >= 1:
+                state['tokens'] -= 1
+                return 0
+
+            return (1 - state['tokens']) / self.rate
+
+    def acquire(self, priority=1):
+        """
+        Block until the call may be sent.
+        :param priority: call priority (see api_priority)
+        :return:
+        """
+        start = time.perf_counter()
+        with self.condition:
+            ticket = (priority, next(self.sequence))
+            heapq.heappush(self.waiting, ticket)
+
+            # A more urgent call may have just become the head of the queue
+            self.condition.notify_all()
+            try:
+                while True:
+                    wait = None
+                    if self.waiting[0] == ticket:
+                        wait = self.take()
+                        if wait == 0:
+                            break
+                    self.condition.wait(wait)
+            finally:
+                self.waiting.remove(ticket)
+                heapq.heapify(self.waiting)
+                self.condition.notify_all()
+
+        if METRICS is not None:
+            METRICS.record_phase('api_scheduler_wait', time.perf_counter() - start)
+
+    def charge(self, count=1):
+        """
+        Take tokens for requests already sent (the bucket may go negative, later calls wait for it to refill).
+        :param count: number of requests
+        :return:
+        """
+        with self.bucket() as state:
+            state['tokens'] -= count
+
+    def pause(self, seconds):
+        """
+        Hold every call for seconds (429 Retry-After).
+        :param seconds: pause duration
+        :return:
+        """
+        with self.bucket() as state:
+            state['resume_at'] = max(state['resume_at'], state['updated'] + seconds)
+
+
+class InstrumentedDashboard:
+    """
+    Dashboard (meraki.DashboardAPI or OfflineDashboard) wrapper recording every API call in METRICS. Calls sent over
+    HTTP are scheduled through API_SCHEDULER. Other attributes (ex: the offline plan) are passed through.
+    """
+    SECTIONS = ('organizations', 'networks', 'appliance', 'devices')
+
+    def __init__(self, target):
+        self.target = target
+
+        # HTTP level hook, sees the retries and 429s the SDK handles internally
+        session = getattr(getattr(target, '_session', None), '_req_session', None)
+        self.scheduled = session is not None
+
+        # The SDK's HTTP session can be shared between threads
+        self.thread_safe = getattr(target, 'thread_safe', session is not None)
+        if session is not None:
+            session.hooks['response'].append(count_response)
+
+    def __getattr__(self, name):
+        attribute = getattr(self.target, name)
+        if name in self.SECTIONS:
+            return InstrumentedSection(attribute, self.scheduled)
+        return attribute
+
+
+class InstrumentedSection:
+    """
+    Dashboard API section (ex: dashboard.organizations) whose calls are recorded in METRICS, and wait for the
+    API_SCHEDULER if scheduled.
+    """
+
+    def __init__(self, section, scheduled=False):
+        self.section = section
+        self.scheduled = scheduled
+
+    def __getattr__(self, operation):
+        function = getattr(self.section, operation)
+        if not callable(function):
+            return function
+
+        def call(*args, **kwargs):
+            scheduler = API_SCHEDULER if self.scheduled else None
+            if scheduler is not None:
+                scheduler.acquire(api_priority(operation))
+
+            if METRICS is None and scheduler is None:
+                return function(*args, **kwargs)
+
+            API_CONTEXT.attempts = attempts = {'count': 0, 'bytes': 0, 'rate_limited': 0}
+            start = time.perf_counter()
+            error = False
+            try:
+                return function(*args, **kwargs)
+            except Exception:
+                error = True
+                raise
+            finally:
+                API_CONTEXT.attempts = None
+
+                if METRICS is not None:
+                    # Offline / stand-in dashboards don't go through HTTP, count the payload instead
+                    bytes_sent = attempts['bytes'] if attempts['count'] else len(json.dumps(kwargs, default=str))
+                    METRICS.record_call(operation, time.perf_counter() - start, bytes_sent=bytes_sent,
+                                        retries=max(attempts['count'] - 1, 0), rate_limited=attempts['rate_limited'],
+                                        error=error)
+
+        return call
+
+
+def write_metrics(json_file='', textfile=''):
+    """
+    Write the run metrics as a JSON summary and/or a Prometheus textfile (node exporter textfile collector format).
+    :param json_file: JSON summary file ('' to skip)
+    :param textfile: Prometheus textfile ('' to skip), written atomically
     :return:
     """
-    rules = []
-    for rule in deny_rules:
-        # No support for src == 'any' or a specific destination
-        if rule['src'] != 'any' and rule['dst'] == 'any':
-            rules.append(
-                {
-                    "policy": "deny",
-                    "type": "ipRange",
-                    "value": rule['src']
-                }
-            )
+    if METRICS is None:
+        return
+
+    summary = METRICS.summary()
+
+    if json_file:
+        with open(json_file, 'w') as fp:
+            json.dump(summary, fp, indent=2)
+
+    if not textfile:
+        return
+
+    def labels(**values):
+        return ','.join('{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                        for key, value in values.items())
+
+    lines = [f'# TYPE {METRICS_PREFIX}_run_start_timestamp_seconds gauge',
+             f"{METRICS_PREFIX}_run_start_timestamp_seconds {summary['started']:.3f}",
+             f'# TYPE {METRICS_PREFIX}_run_seconds gauge',
+             f"{METRICS_PREFIX}_run_seconds {summary['seconds']:.6f}",
+             f'# TYPE {METRICS_PREFIX}_phase_seconds gauge']
+    for phase in summary['phases']:
+        lines.append(f"{METRICS_PREFIX}_phase_seconds{{{labels(phase=phase['phase'], **phase['labels'])}}} "
+                     f"{phase['seconds']:.6f}")
+
+    counters = [('api_calls_total', 'calls'), ('api_errors_total', 'errors'), ('api_retries_total', 'retries'),
+                ('api_rate_limited_total', 'rate_limited'), ('api_request_bytes_total', 'bytes_sent')]
+    for metric, key in counters:
+        lines.append(f'# TYPE {METRICS_PREFIX}_{metric} counter')
+        for operation, stats in summary['api'].items():
+            lines.append(f"{METRICS_PREFIX}_{metric}{{{labels(operation=operation)}}} {stats[key]}")
+
+    lines.append(f'# TYPE {METRICS_PREFIX}_api_latency_seconds histogram')
+    for operation, stats in summary['api'].items():
+        for bound, count in stats['buckets'].items():
+            lines.append(f"{METRICS_PREFIX}_api_latency_seconds_bucket{{{labels(operation=operation, le=bound)}}} "
+                         f"{count}")
+        lines.append(f"{METRICS_PREFIX}_api_latency_seconds_sum{{{labels(operation=operation)}}} "
+                     f"{stats['latency_sum']:.6f}")
+        lines.append(f"{METRICS_PREFIX}_api_latency_seconds_count{{{labels(operation=operation)}}} {stats['calls']}")
+
+    # The textfile collector may read at any time, replace the file in one step
+    with open(textfile + '.tmp', 'w') as fp:
+        fp.write('\n'.join(lines) + '\n')
+    os.replace(textfile + '.tmp', textfile)
+
+
+def load_cache():
+    """
+    Load the org state cache (org and network ids, Policy Objects and Groups per org id).
+    :return: cache dictionary (empty if there is no usable cache)
+    """
+    try:
+        with open(CACHE_FILE, 'r') as fp:
+            cache = json.load(fp)
+    except (OSError, ValueError):
+        return {'org_ids': {}, 'orgs': {}}
+
+    cache.setdefault('org_ids', {})
+    cache.setdefault('orgs', {})
+    return cache
+
+
+def save_cache(cache, org_id, listed):
+    """
+    Store the org's current Policy Objects and Groups in the cache file.
+    :param cache: cache dictionary
+    :param org_id: meraki org id
+    :param listed: objects were listed from the Dashboard this run (restarts the cache max age)
+    :return:
+    """
+    org_cache = cache['orgs'].setdefault(org_id, {'networks': {}})
+    org_cache['objects'] = object_values
+    org_cache['object_groups'] = object_groups
+
+    if listed or 'listed_at' not in org_cache:
+        org_cache['listed_at'] = time.time()
+
+    # Write a temporary file first, an interrupted run never leaves a truncated cache
+    temp_file = CACHE_FILE + '.tmp'
+    with open(temp_file, 'w') as fp:
+        json.dump(cache, fp)
+    os.replace(temp_file, CACHE_FILE)
+
+
+def cache_matches_dashboard(org_cache, org_id):
+    """
+    Cheap check of the cached Policy Objects and Groups against the Dashboard, one page (CACHE_CHECK_PAGE_SIZE) of
+    each: every listed entry must be cached with the same id, and an org listed in full must hold exactly the cached
+    entries. Objects deleted or recreated since the cache was written fail the check.
+    :param org_cache: org's cache dictionary
+    :param org_id: meraki org id
+    :return: True if the cache matches the listed page
+    """
+    cached_objects = {name: value['id'] for name, value in org_cache['objects'].items()}
+    checks = [(dashboard.organizations.getOrganizationPolicyObjects, cached_objects),
+              (dashboard.organizations.getOrganizationPolicyObjectsGroups, org_cache['object_groups'])]
+
+    for list_function, cached in checks:
+        listed = list_function(organizationId=org_id, perPage=CACHE_CHECK_PAGE_SIZE)
+
+        if any(cached.get(item['name']) != item['id'] for item in listed):
+            return False
+
+        if len(listed) < CACHE_CHECK_PAGE_SIZE and len(listed) != len(cached):
+            return False
+
+    return True
+
+
+def load_cached_objects(cache, org_id):
+    """
+    Load the org's cached Policy Objects and Groups into the local maps, if the cache isn't older than CACHE_MAX_AGE
+    and still matches the Dashboard.
+    :param cache: cache dictionary
+    :param org_id: meraki org id
+    :return: True if the cached objects were loaded
+    """
+    org_cache = cache['orgs'].get(org_id, {})
+
+    if 'objects' not in org_cache or time.time() - org_cache.get('listed_at', 0) > CACHE_MAX_AGE:
+        return False
+
+    if not cache_matches_dashboard(org_cache, org_id):
+        console.print(f"Policy Objects or Groups changed on the Dashboard since [blue]{CACHE_FILE}[/] was written, "
+                      f"listing them again")
+        return False
+
+    for name, value in org_cache['objects'].items():
+        index_policy_object(dict(value, name=name))
+    object_groups.update(org_cache['object_groups'])
+
+    console.print(f"Loaded [green]{len(objects)}[/] Policy Objects and [green]{len(object_groups)}[/] Policy Object "
+                  f"Groups from [blue]{CACHE_FILE}[/] (use --refresh-cache to re-list them)")
+    return True
+
+
+def find_org_id(cache):
+    """
+    Find the id of ORG_NAME. A cached id is confirmed with a single lookup, otherwise every org is listed.
+    :param cache: cache dictionary
+    :return: meraki org id (None if not found)
+    """
+    org_id = cache.get('org_ids', {}).get(ORG_NAME)
+
+    if org_id:
+        try:
+            if dashboard.organizations.getOrganization(organizationId=org_id)['name'] == ORG_NAME:
+                return org_id
+        except meraki.APIError:
+            pass
+
+    orgs = dashboard.organizations.getOrganizations()
+
+    org_id = None
+    for org in orgs:
+        if org['name'] == ORG_NAME:
+            org_id = org['id']
+            break
 
-    dashboard.appliance.updateNetworkApplianceFirewallL7FirewallRules(networkId=network_id, rules=rules)
+    if org_id and 'org_ids' in cache:
+        cache['org_ids'][ORG_NAME] = org_id
+
+    return org_id
+
+
+def find_network_id(cache, org_id, network_name=None):
+    """
+    Find the id of a network in the org. A cached id is confirmed with a single lookup, otherwise every network of
+    the org is listed.
+    :param cache: cache dictionary
+    :param org_id: meraki org id
+    :param network_name: network name (NETWORK_NAME by default)
+    :return: meraki network id (None if not found)
+    """
+    network_name = network_name or NETWORK_NAME
+    networks_cache = cache['orgs'].setdefault(org_id, {'networks': {}})['networks'] if 'orgs' in cache else {}
+    network_id = networks_cache.get(network_name)
+
+    if network_id:
+        try:
+            if dashboard.networks.getNetwork(networkId=network_id)['name'] == network_name:
+                return network_id
+        except meraki.APIError:
+            pass
+
+    # Get the list of Meraki MX networks
+    networks = dashboard.organizations.getOrganizationNetworks(org_id)
+
+    network_id = None
+    for network in networks:
+        if network['name'] == network_name:
+            network_id = network['id']
+            break
+
+    if network_id:
+        networks_cache[network_name] = network_id
+
+    return network_id
+
+
+def resolve_target_networks(cache, org_id, targets=None):
+    """
+    Target networks of the run: the --networks targets, or NETWORK_NAME.
+    :param cache: cache dictionary
+    :param org_id: meraki org id
+    :param targets: target networks (names, 'tag:<tag>' or 'id:<network id>'), None for NETWORK_NAME
+    :return: list of (network id, network name)
+    """
+    if org_id is None:
+        return []
+
+    if targets:
+        return resolve_networks(org_id, targets)
+
+    network_id = find_network_id(cache, org_id)
+    return [(network_id, NETWORK_NAME)] if network_id else []
 
 
 def print_help():
@@ -1190,20 +4000,71 @@ def print_help():
     console.print(
         'To run the script, enter: python3 asa_to_mx.py -r [yellow]<ASA Show Run file>[/] -a [yellow]<ASA Show ACL>[/] -v [yellow]<optional vlan '
         'json file>[/] -s [yellow]<optional static routes file>[/]')
+    console.print('\nOptions:')
+    console.print('  --any              translate \'any\' sources (skips the question, compile mode never asks it)')
+    console.print('  --verify-parser    cross-check every ACL line against the original regex patterns (slow)')
+    console.print('  --jobs N           parse the access-list file with N worker processes')
+    console.print('  --batch            create policy objects and groups through action batches')
+    console.print('  --async N          create objects, vlans and routes concurrently (N requests in flight)')
+    console.print('  --refresh-cache    re-list the org\'s Policy Objects and Groups instead of using the cache')
+    console.print('  --no-cache         don\'t read or write the org state cache')
+    console.print('  --no-dedupe        keep duplicate L3 rules (removed by default)')
+    console.print('  --merge            merge neighbouring L3 rules differing in one field into multi-value rules')
+    console.print(f'  --rule-budget N    warn if the ACL rules would expand to more than N Outbound Rules (default '
+                  f'{MX_L3_RULE_LIMIT}, 0 turns the check off)')
+    console.print('  --budget-abort     abort instead of warning when the rule budget is exceeded')
+    console.print('  --force-push       push every rule set, even if it matches the network\'s current rules')
+    console.print('  --resume           resume an interrupted run from its journal (completed steps are skipped)')
+    console.print('  --networks LIST    push to several networks: comma separated names, tag:<tag> or id:<network id>')
+    console.print('  --network-workers N  networks updated at a time with --networks (default 8)')
+    console.print('  --object-workers N  Policy Objects / Groups of one dependency level created at a time (default 8, '
+                  'live Dashboard only: compile mode creates them one at a time)')
+    console.print('  --verbose          print every processed object and ACL line (collapsed into counters by default)')
+    console.print('  --metrics FILE     write phase timings and Dashboard call metrics as JSON to FILE')
+    console.print('  --metrics-textfile FILE  write the same metrics as a Prometheus textfile (node exporter)')
+    console.print('  --profile DIR      profile each major step (cProfile + tracemalloc), reports written to DIR')
+    console.print('  --api-rate N       Dashboard requests per second shared by every call (default 10, 0 to disable)')
+    console.print('  --api-burst N      requests sent at once before --api-rate applies (default 10)')
+    console.print('  --rate-limit-file FILE  share the request budget with other runs using the same FILE')
+    console.print('  -a -               read the show access-list capture (plain, gzip or xz) from stdin')
+    console.print('\nOffline compile / apply:')
+    console.print(
+        '  python3 asa_to_mx.py compile -r [yellow]<ASA Show Run file>[/] -a [yellow]<ASA Show ACL>[/] -o [yellow]<artifact dir>[/]'
+        '    convert without Dashboard access')
+    console.print('  python3 asa_to_mx.py apply -i [yellow]<artifact dir>[/]    push compiled artifacts to the Dashboard')
 
 
 def main():
-    global ANY_FLAG
+    global ANY_FLAG, VERIFY_PARSER, BATCH_MODE, ASYNC_CONCURRENCY, DEDUPE_RULES, MERGE_RULES, RULE_BUDGET
+    global RULE_BUDGET_ABORT, FORCE_PUSH, NETWORK_WORKERS, OBJECT_WORKERS, VERBOSE, METRICS, PROFILE_DIR
+    global API_SCHEDULER, API_RATE, API_BURST, dashboard
     console.print(Panel.fit("ASA ACL Config to MX Config"))
 
+    load_config()
+
     # Get Inputs args
     show_access_list_file = ''
     show_run_file = ''
     vlan_file_name = ''
     static_file_name = ''
+    jobs = 1
+    use_cache = True
+    refresh_cache = False
+    resume = False
+    targets = []
+    metrics_file = ''
+    metrics_textfile = ''
+    rate_limit_file = ''
+    output_dir = ''
+    input_dir = ''
 
     try:
-        opts, args = getopt.getopt(sys.argv[1:], 'r:a:v:s:')
+        opts, args = getopt.gnu_getopt(sys.argv[1:], 'r:a:v:s:o:i:',
+                                       ['any', 'verify-parser', 'jobs=', 'batch', 'async=', 'no-cache', 'refresh-cache',
+                                        'no-dedupe', 'merge', 'rule-budget=', 'budget-abort', 'force-push', 'resume',
+                                        'networks=', 'network-workers=', 'object-workers=', 'verbose', 'metrics=',
+                                        'metrics-textfile=', 'profile=', 'api-rate=', 'api-burst=',
+                                        'rate-limit-file='])
     except getopt.GetoptError:
         print_help()
         sys.exit(-2)
@@ -1218,32 +4079,124 @@ def main():
             show_access_list_file = arg
         elif opt == '-v':
             vlan_file_name = arg
+        elif opt == '--any':
+            ANY_FLAG = True
         elif opt == '-s':
             static_file_name = arg
+        elif opt == '--verify-parser':
+            VERIFY_PARSER = True
+        elif opt == '--jobs':
+            jobs = int(arg)
+        elif opt == '--batch':
+            BATCH_MODE = True
+        elif opt == '--async':
+            ASYNC_CONCURRENCY = int(arg)
+        elif opt == '--no-cache':
+            use_cache = False
+        elif opt == '--refresh-cache':
+            refresh_cache = True
+        elif opt == '--no-dedupe':
+            DEDUPE_RULES = False
+        elif opt == '--merge':
+            MERGE_RULES = True
+        elif opt == '--rule-budget':
+            RULE_BUDGET = int(arg)
+        elif opt == '--budget-abort':
+            RULE_BUDGET_ABORT = True
+        elif opt == '--force-push':
+            FORCE_PUSH = True
+        elif opt == '--resume':
+            resume = True
+        elif opt == '--networks':
+            targets = [target.strip() for target in arg.split(',') if target.strip()]
+        elif opt == '--network-workers':
+            NETWORK_WORKERS = int(arg)
+        elif opt == '--object-workers':
+            OBJECT_WORKERS = int(arg)
+        elif opt == '--verbose':
+            VERBOSE = True
+        elif opt == '--metrics':
+            metrics_file = arg
+        elif opt == '--metrics-textfile':
+            metrics_textfile = arg
+        elif opt == '--profile':
+            PROFILE_DIR = arg
+        elif opt == '--api-rate':
+            API_RATE = float(arg)
+        elif opt == '--api-burst':
+            API_BURST = int(arg)
+        elif opt == '--rate-limit-file':
+            rate_limit_file = arg
+        elif opt == '-o':
+            output_dir = arg
+        elif opt == '-i':
+            input_dir = arg
 
     if len(sys.argv) <= 1:
         print_help()
         sys.exit(-1)
 
+    # Phase timings and Dashboard call metrics, written when the run ends (even if it fails)
+    if metrics_file or metrics_textfile:
+        METRICS = Metrics()
+        atexit.register(write_metrics, metrics_file, metrics_textfile)
+
+    # Every Dashboard call waits for the org request budget (--api-rate 0 leaves it to the SDK's 429 retries)
+    if API_RATE > 0:
+        if rate_limit_file and fcntl is None:
+            console.print('[red]Error:[/] --rate-limit-file is not supported on this platform!')
+            sys.exit(-1)
+
+        API_SCHEDULER = ApiScheduler(API_RATE, API_BURST, rate_limit_file)
+
+    # Optional mode: 'compile' converts offline into an artifact directory, 'apply' pushes one to the Dashboard
+    mode = args[0] if args else ''
+    if mode not in ('', 'compile', 'apply'):
+        print_help()
+        sys.exit(-2)
+
+    if mode == 'apply':
+        if not os.path.isdir(input_dir):
+            console.print('[red]Error:[/] artifact directory not found!')
+            sys.exit(-1)
+
+        apply_artifacts(input_dir, use_cache, refresh_cache, targets)
+        console.print('[green]Success![/] Compiled artifacts applied.')
+        return
+
+    if mode == 'compile':
+        if output_dir == '':
+            console.print('[red]Error:[/] compile mode requires an artifact directory (-o)!')
+            sys.exit(-1)
+
+        # Nothing is sent to the Dashboard, objects are created serially against the offline stand-in (target
+        # networks are given to apply mode instead)
+        dashboard = InstrumentedDashboard(OfflineDashboard())
+        use_cache = False
+        targets = []
+        BATCH_MODE = False
+        ASYNC_CONCURRENCY = 0
+
     # Check current directory for show run file
     if not os.path.exists(show_run_file):
         console.print('[red]Error:[/] show run file not found!')
         sys.exit(-1)
 
-    # Check current directory for show acl file
-    if not os.path.exists(show_access_list_file):
+    # Check current directory for show acl file ('-' reads the capture from stdin)
+    stdin_capture = show_access_list_file == '-'
+    if not stdin_capture and not os.path.exists(show_access_list_file):
         console.print('[red]Error:[/] show access-list file not found!')
         sys.exit(-1)
 
-    # Check current directory for vlan file
+    # Check current directory for vlan file (compile mode runs unattended, it doesn't ask)
     if vlan_file_name != '':
         if not os.path.exists(vlan_file_name):
             console.print('[red]Error:[/] vlan file not found!')
             sys.exit(-1)
-    else:
-        answer = Confirm.ask(
+    elif mode != 'compile':
+        answer = confirm(
             "No vlan file detected. Please ensure necessary source vlans/static routes are created on the target "
-            "MX, otherwise the script will fail. Continue?", default=True)
+            "MX, otherwise the script will fail. Continue?", True, stdin_capture)
         if not answer:
             sys.exit(1)
 
@@ -1252,75 +4205,111 @@ def main():
         if not os.path.exists(static_file_name):
             console.print('[red]Error:[/] vlan file not found!')
             sys.exit(-1)
-    else:
-        answer = Confirm.ask(
+    elif mode != 'compile':
+        answer = confirm(
             "No static file detected. Please ensure necessary source vlans/static routes are created on the target "
-            "MX, otherwise the script will fail. Continue?", default=True)
+            "MX, otherwise the script will fail. Continue?", True, stdin_capture)
         if not answer:
             sys.exit(1)
 
-    # Determine if 'any' translation must be done
-    answer = Confirm.ask(
-        "Does your ACL require 'any' source translation? (Example use case: static routes exposing internal VLANs on "
-        "a single interface)", default=False)
-    if answer:
-        ANY_FLAG = True
+    # Determine if 'any' translation must be done (--any answers it, compile mode doesn't ask)
+    if not ANY_FLAG and mode != 'compile':
+        answer = confirm(
+            "Does your ACL require 'any' source translation? (Example use case: static routes exposing internal VLANs "
+            "on a single interface)", False, stdin_capture)
+        if answer:
+            ANY_FLAG = True
 
-    # Get Meraki Org Id
-    orgs = dashboard.organizations.getOrganizations()
+    # Checkpoint journal, --resume replays the completed steps of an interrupted run
+    completed = {}
+    if mode != 'compile':
+        completed = open_journal(journal_signature([show_run_file, show_access_list_file, vlan_file_name,
+                                                    static_file_name], targets), resume)
 
-    org_id = None
-    for org in orgs:
-        if org['name'] == ORG_NAME:
-            org_id = org['id']
-            break
+    # Org/network ids and Policy Object state from previous runs
+    cache = load_cache() if use_cache else {}
 
-    # Get the list of Meraki MX networks
-    networks = dashboard.organizations.getOrganizationNetworks(org_id)
+    # Get Meraki Org Id
+    org_id = find_org_id(cache)
 
-    # Find the network ID of the network you want to add the firewall rules to
-    network_id = None
-    for network in networks:
-        if network['name'] == NETWORK_NAME:
-            network_id = network['id']
-            break
+    # Find the network ID of the network(s) you want to add the firewall rules to
+    networks = resolve_target_networks(cache, org_id, targets)
+    network_id = networks[0][0] if networks else None
+
+    # Existing Policy Objects and Groups are only listed if the cache is missing or stale
+    cached = use_cache and not refresh_cache and load_cached_objects(cache, org_id)
 
     # Parse config, create various object dictionaries
     console.print(Panel.fit("Creating Network Objects, Network Group Objects, Protocol Objects, Port Groups, etc.",
                             title="Step 1"))
-    parse = CiscoConfParse(show_run_file, syntax='asa')
-    create_objects(org_id, parse)
+    # Resumed runs rebuild the constructs locally, objects restored from the journal aren't created again
+    with timed_phase('show_run_index'):
+        parse = ShowRunIndex(show_run_file)
+    with timed_phase('create_objects'):
+        create_objects(org_id, parse, list_existing=not cached)
+
+    if use_cache and org_id:
+        save_cache(cache, org_id, listed=not cached)
 
     # Create VLAN's necessary for ACL Rules
     console.print(Panel.fit("Creating VLAN's", title="Step 2"))
-    if vlan_file_name != '':
-        create_vlans(vlan_file_name, network_id)
+    if vlan_file_name != '' and not completed.get('vlans'):
+        for target_id, target_name in networks:
+            with timed_phase('vlans', network=target_name):
+                create_vlans(vlan_file_name, target_id)
+        journal('vlans')
 
     # Create Static Rules (necessary) for ACL Rules
     console.print(Panel.fit("Creating Static Rules", title="Step 2.5"))
-    if static_file_name != '':
-        create_static_rules(static_file_name, network_id)
+    if static_file_name != '' and not completed.get('routes'):
+        for target_id, target_name in networks:
+            with timed_phase('static_routes', network=target_name):
+                create_static_rules(static_file_name, target_id)
+        journal('routes')
 
     # Iterate through ACL, parse rules
     console.print(Panel.fit("Parsing ASA ACL Rules", title="Step 3"))
 
-    # Parse normal outbound rules and nat outbound rules
-    acl_list, nat_acl_list = parse_rules(show_access_list_file)
+    # Parse normal outbound rules and nat outbound rules (parsed again on resume, the journal signature pins the file).
+    # Parsed ACL rules are kept as its own phase, only their expansion into MX rules is streamed
+    with timed_phase('parse_rules'):
+        acl_list, nat_acl_list = parse_rules(show_access_list_file, jobs)
+
+    # Expansion pre-flight, before any rule is built
+    with timed_phase('rule_budget'):
+        check_rule_budget(acl_list)
 
     # Creating MX Rules
     console.print(Panel.fit("Creating MX Rules", title="Step 4"))
 
-    # Create outbound rules
-    response = create_mx_rules(org_id, network_id, acl_list)
-    if not response:
-        console.print(
-            f'[red]Error:[/] there was a problem adding the outbound rules to the Meraki MX network. {response}')
-
-    # Create nat rules
-    response = create_nat_rules(org_id, network_id, nat_acl_list)
-    if not response:
-        console.print(f'[red]Error:[/] there was a problem adding the nat rules to the Meraki MX network. {response}')
-
+    if targets:
+        # Rule sets are built once, then applied to every target network concurrently
+        if networks:
+            deploy_rule_sets(compile_rule_sets(acl_list, nat_acl_list), networks)
+        else:
+            console.print('[red]Error:[/] no target network found, rules not pushed!')
+    else:
+        # Current rule sets, unchanged rule sets aren't pushed again
+        current_rules = None
+        if not FORCE_PUSH and mode != 'compile' and network_id is not None:
+            current_rules = fetch_rule_sets(network_id)
+
+        # Create outbound rules
+        response = create_mx_rules(org_id, network_id, acl_list, current_rules)
+        if not response:
+            console.print(
+                f'[red]Error:[/] there was a problem adding the outbound rules to the Meraki MX network. {response}')
+
+        # Create nat rules
+        response = create_nat_rules(org_id, network_id, nat_acl_list, current_rules)
+        if not response:
+            console.print(
+                f'[red]Error:[/] there was a problem adding the nat rules to the Meraki MX network. {response}')
+
+    if mode == 'compile':
+        write_artifacts(output_dir, dashboard)
+
+    close_journal()
     console.print(f'[green]Success![/] ACL Rules Converted.')
 
 
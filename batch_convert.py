@@ -0,0 +1,307 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2022 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Trevor Maco <tmaco@cisco.com>"
+__copyright__ = "Copyright (c) 2022 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import contextlib
+import getopt
+import glob
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from rich.console import Console
+from rich.panel import Panel
+from rich.table import Table
+
+import asa_to_mx
+
+# Rich Console Instance
+console = Console()
+
+# Device files looked up in each sub directory of a config directory (the access-list may be compressed)
+SHOW_RUN_PATTERN = 'show_run*'
+SHOW_ACL_PATTERN = 'show_access_list*'
+
+# Optional per device settings in a config directory (same keys as a manifest entry)
+DEVICE_FILE = 'device.json'
+
+# Per device conversion output and aggregate report
+LOG_FILE = 'convert.log'
+REPORT_FILE = 'batch_report.json'
+
+
+def load_manifest(manifest_file):
+    """
+    Read a manifest of devices, a JSON list of entries with 'name', 'show_run', 'access_list' and optional 'targets'
+    (network names, 'tag:<tag>' or 'id:<network id>'), 'acl_types', 'any', 'vlans' and 'routes'. Relative paths are
+    relative to the manifest.
+    :param manifest_file: manifest file name
+    :return: list of device dictionaries (absolute paths)
+    """
+    with open(manifest_file, 'r') as fp:
+        devices = json.load(fp)
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_file))
+    for device in devices:
+        for key in ['show_run', 'access_list', 'vlans', 'routes']:
+            if device.get(key):
+                device[key] = os.path.join(base_dir, device[key])
+
+    return devices
+
+
+def scan_directory(config_dir):
+    """
+    Find the devices of a config directory: one sub directory per device (named after it) holding a show_run* and a
+    show_access_list* file, and an optional device.json with the other manifest keys.
+    :param config_dir: config directory
+    :return: list of device dictionaries (absolute paths)
+    """
+    devices = []
+    for device_dir in sorted(glob.glob(os.path.join(os.path.abspath(config_dir), '*', ''))):
+        show_run = sorted(glob.glob(os.path.join(device_dir, SHOW_RUN_PATTERN)))
+        access_list = sorted(glob.glob(os.path.join(device_dir, SHOW_ACL_PATTERN)))
+
+        if not show_run or not access_list:
+            console.print(f'[yellow]Warning:[/] no show run / show access-list pair in [blue]{device_dir}[/], skipping')
+            continue
+
+        device = {}
+        if os.path.exists(os.path.join(device_dir, DEVICE_FILE)):
+            with open(os.path.join(device_dir, DEVICE_FILE), 'r') as fp:
+                device = json.load(fp)
+            for key in ['vlans', 'routes']:
+                if device.get(key):
+                    device[key] = os.path.join(device_dir, device[key])
+
+        device.update(name=os.path.basename(os.path.dirname(device_dir)), show_run=show_run[0],
+                      access_list=access_list[0])
+        devices.append(device)
+
+    return devices
+
+
+def convert_device(device, output_dir):
+    """
+    Compile one device into output_dir/<name> (same artifacts as compile mode, plus convert.log and
+    unprocessed_rules.txt). Runs in its own worker process, so converter state is never shared between devices.
+    :param device: device dictionary (manifest entry)
+    :param output_dir: batch output directory
+    :return: device report dictionary
+    """
+    device_dir = os.path.abspath(os.path.join(output_dir, device['name']))
+    os.makedirs(device_dir, exist_ok=True)
+
+    report = {'name': device['name'], 'targets': device.get('targets'), 'status': 'ok', 'error': None, 'timings': {},
+              'objects': 0, 'groups': 0, 'l3_rules': 0, 'nat_rules': 0, 'l7_rules': 0, 'unprocessed': 0}
+    start = time.perf_counter()
+
+    # unprocessed_rules.txt is written to the current directory
+    with open(os.path.join(device_dir, LOG_FILE), 'w') as log_fp, contextlib.redirect_stdout(log_fp):
+        os.chdir(device_dir)
+        try:
+            for key in ['show_run', 'access_list', 'vlans', 'routes']:
+                if device.get(key) and not os.path.exists(device[key]):
+                    raise FileNotFoundError(f"{key} file not found: {device[key]}")
+
+            # Workers may be spawned (fresh interpreter), config.py is loaded in the worker
+            asa_to_mx.load_config()
+            if device.get('acl_types'):
+                asa_to_mx.ACL_TYPES = device['acl_types']
+            asa_to_mx.ANY_FLAG = bool(device.get('any', False))
+
+            asa_to_mx.dashboard = offline = asa_to_mx.OfflineDashboard()
+            if device.get('targets'):
+                offline.plan['targets'] = device['targets']
+
+            stage = time.perf_counter()
+            parse = asa_to_mx.ShowRunIndex(device['show_run'])
+            asa_to_mx.create_objects(asa_to_mx.OFFLINE_ORG_ID, parse)
+            if device.get('vlans'):
+                asa_to_mx.create_vlans(device['vlans'], asa_to_mx.OFFLINE_NETWORK_ID)
+            if device.get('routes'):
+                asa_to_mx.create_static_rules(device['routes'], asa_to_mx.OFFLINE_NETWORK_ID)
+            report['timings']['objects'] = time.perf_counter() - stage
+
+            stage = time.perf_counter()
+            acl_list, nat_acl_list = asa_to_mx.parse_rules(device['access_list'])
+            report['timings']['parse'] = time.perf_counter() - stage
+
+            stage = time.perf_counter()
+            asa_to_mx.check_rule_budget(acl_list)
+            asa_to_mx.create_mx_rules(asa_to_mx.OFFLINE_ORG_ID, asa_to_mx.OFFLINE_NETWORK_ID, acl_list)
+            asa_to_mx.create_nat_rules(asa_to_mx.OFFLINE_ORG_ID, asa_to_mx.OFFLINE_NETWORK_ID, nat_acl_list)
+            report['timings']['rules'] = time.perf_counter() - stage
+
+            asa_to_mx.write_artifacts(device_dir, offline)
+
+            report.update(objects=len(offline.plan['policy_objects']), groups=len(offline.plan['policy_object_groups']),
+                          l3_rules=len(offline.rules['l3']), nat_rules=len(offline.rules['one_to_one_nat']),
+                          l7_rules=len(offline.rules['l7']))
+        except (Exception, SystemExit) as e:
+            # A budget abort exits, any failure is reported instead of stopping the batch (Ctrl+C still stops it)
+            traceback.print_exc(file=log_fp)
+            report.update(status='failed', error=repr(e))
+
+    if os.path.exists(os.path.join(device_dir, 'unprocessed_rules.txt')):
+        with open(os.path.join(device_dir, 'unprocessed_rules.txt'), 'r') as fp:
+            report['unprocessed'] = sum(1 for line in fp if line.strip())
+
+    report['seconds'] = time.perf_counter() - start
+    return report
+
+
+def convert_device_process(device, output_dir):
+    """
+    Convert one device in a fresh process (converter state is module level). A single worker pool per device works on
+    every Python 3 version (max_tasks_per_child needs 3.11), and a worker dying only fails its own device.
+    :param device: device dictionary (manifest entry)
+    :param output_dir: batch output directory
+    :return: device report dictionary
+    """
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(convert_device, device, output_dir).result()
+
+
+def run_batch(devices, output_dir, workers):
+    """
+    Convert every device, at most workers at a time, a fresh process per device.
+    :param devices: list of device dictionaries
+    :param output_dir: batch output directory
+    :param workers: number of worker processes
+    :return: list of device reports, in device order
+    """
+    reports = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(convert_device_process, device, output_dir): device['name'] for device in devices}
+
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                report = future.result()
+            except Exception as e:
+                # Worker process died (ex: out of memory)
+                report = {'name': name, 'status': 'failed', 'error': repr(e), 'timings': {}, 'seconds': 0.0}
+
+            reports[name] = report
+            status = '[green]ok[/]' if report['status'] == 'ok' else f"[red]failed[/] ({report['error']})"
+            console.print(f"[blue]{name}[/]: {status} in {report['seconds']:.1f}s")
+
+    return [reports[device['name']] for device in devices]
+
+
+def print_report(reports):
+    """
+    Print the aggregate batch report.
+    :param reports: list of device reports
+    :return:
+    """
+    table = Table(title='Batch Conversion')
+    for column in ['Device', 'Status', 'Seconds', 'Objects', 'Groups', 'L3 Rules', 'NAT Rules', 'L7 Rules',
+                   'Unprocessed']:
+        table.add_column(column, justify='left' if column in ('Device', 'Status') else 'right')
+
+    for report in reports:
+        status = 'ok' if report['status'] == 'ok' else '[red]failed[/]'
+        table.add_row(report['name'], status, f"{report['seconds']:.1f}",
+                      *[f"{report.get(key, 0):,}" for key in ['objects', 'groups', 'l3_rules', 'nat_rules', 'l7_rules',
+                                                               'unprocessed']])
+
+    console.print(table)
+
+
+def print_help():
+    """
+    Print's help line if incorrect input provided to script.
+    :return:
+    """
+    console.print('This script converts the ASA configs of many devices in parallel (offline, like compile mode)\n')
+    console.print('To run the script, enter: python3 batch_convert.py -d [yellow]<config directory>[/] -o '
+                  '[yellow]<output directory>[/]')
+    console.print('                     or: python3 batch_convert.py -m [yellow]<manifest.json>[/] -o '
+                  '[yellow]<output directory>[/]')
+    console.print('\nOptions:')
+    console.print('  --workers N        devices converted at a time (default: number of CPUs)')
+
+
+def main():
+    config_dir = ''
+    manifest_file = ''
+    output_dir = ''
+    workers = os.cpu_count() or 1
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'hd:m:o:', ['workers='])
+    except getopt.GetoptError:
+        print_help()
+        sys.exit(-2)
+
+    for opt, arg in opts:
+        if opt == '-h':
+            print_help()
+            sys.exit()
+        elif opt == '-d':
+            config_dir = arg
+        elif opt == '-m':
+            manifest_file = arg
+        elif opt == '-o':
+            output_dir = arg
+        elif opt == '--workers':
+            workers = int(arg)
+
+    if output_dir == '' or (config_dir == '') == (manifest_file == ''):
+        print_help()
+        sys.exit(-1)
+
+    console.print(Panel.fit("ASA to MX Batch Conversion"))
+
+    devices = load_manifest(manifest_file) if manifest_file else scan_directory(config_dir)
+    names = [device['name'] for device in devices]
+    if len(set(names)) != len(names):
+        console.print('[red]Error:[/] device names must be unique!')
+        sys.exit(-1)
+
+    if not devices:
+        console.print('[red]Error:[/] no devices found!')
+        sys.exit(-1)
+
+    console.print(f'Converting [green]{len(devices)}[/] devices with [green]{min(workers, len(devices))}[/] workers...')
+    output_dir = os.path.abspath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    reports = run_batch(devices, output_dir, workers)
+
+    with open(os.path.join(output_dir, REPORT_FILE), 'w') as fp:
+        json.dump({'seconds': time.perf_counter() - start, 'devices': reports}, fp, indent=2)
+
+    print_report(reports)
+    failed = sum(1 for report in reports if report['status'] != 'ok')
+    if failed:
+        console.print(f'[red]{failed}[/] devices failed, see convert.log in their output directory')
+        sys.exit(1)
+
+    console.print(f'[green]Success![/] Artifacts and [blue]{REPORT_FILE}[/] written to [blue]{output_dir}[/]')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2022 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Trevor Maco <tmaco@cisco.com>"
+__copyright__ = "Copyright (c) 2022 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import contextlib
+import getopt
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from rich.console import Console
+from rich.panel import Panel
+from rich.table import Table
+
+import asa_to_mx
+import generate_asa_config
+
+# Rich Console Instance (bound to the real stdout, converter output is discarded while stages run)
+console = Console(file=sys.stdout)
+
+# Default ACE counts
+SIZES = [1000, 100000, 1000000]
+
+# Converter state rebuilt by every run
+CONVERTER_STATE = ['objects', 'object_values', 'object_groups', 'port_groups', 'group_of_groups', 'protocol_objects',
+                   'any_translation', 'interfaces', 'routes', 'nat_table']
+
+# A stage slower than the baseline by more than this ratio is reported as a regression
+REGRESSION_THRESHOLD = 1.2
+
+# 'import asa_to_mx' budget (cumulative -X importtime, best of IMPORT_RUNS fresh interpreters)
+IMPORT_BUDGET = 0.15
+IMPORT_RUNS = 5
+
+# Modules that must only be imported once a command needs them (Dashboard client and its aiohttp, console)
+DEFERRED_MODULES = ['meraki', 'aiohttp', 'rich']
+
+
+def reset_converter():
+    """
+    Clear converter state left by a previous run and point it at a fresh (instrumented, as in compile mode) offline
+    dashboard.
+    :return:
+    """
+    for name in CONVERTER_STATE:
+        getattr(asa_to_mx, name).clear()
+
+    asa_to_mx.dashboard = asa_to_mx.InstrumentedDashboard(asa_to_mx.OfflineDashboard())
+    reset_parse_state()
+
+
+def reset_parse_state():
+    """
+    Clear the remark and child line state the ACL parser carries from line to line, as at the start of a run.
+    :return:
+    """
+    asa_to_mx.CURRENT_REMARK = ''
+    asa_to_mx.CHILD_FLAG = False
+
+
+def run_stage(name, function, units, trace_memory):
+    """
+    Time a benchmark stage (converter output discarded), optionally tracking its peak traced memory.
+    :param name: stage name
+    :param function: stage body, returns the number of units (lines, rules) processed
+    :param units: unit name
+    :param trace_memory: track peak memory with tracemalloc (slows the stage down)
+    :return: stage result dictionary
+    """
+    if trace_memory:
+        tracemalloc.start()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        count = function()
+        seconds = time.perf_counter() - start
+
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {'stage': name, 'units': units, 'count': count, 'seconds': seconds,
+            'rate': count / seconds if seconds else 0.0, 'peak_bytes': peak}
+
+
+def benchmark_size(ace_count, work_dir, jobs, trace_memory):
+    """
+    Generate a config pair with ace_count ACEs and time each conversion stage against it.
+    :param ace_count: number of top level ACEs
+    :param work_dir: directory for the generated files (and unprocessed rules), one sub directory per size
+    :param jobs: worker processes used by the parse_rules stage
+    :param trace_memory: track peak memory per stage
+    :return: list of stage result dictionaries
+    """
+    object_count = min(max(100, ace_count // 20), 50000)
+    size_dir = os.path.join(work_dir, str(ace_count))
+    show_run_file, show_acl_file, acl_types = generate_asa_config.generate(size_dir, object_count=object_count,
+                                                                           ace_count=ace_count)
+
+    reset_converter()
+    asa_to_mx.ACL_TYPES = acl_types
+    results = []
+    state = {}
+    acl_lines = sum(1 for _ in asa_to_mx.read_acl_lines(show_acl_file))
+
+    def load_show_run():
+        state['parse'] = asa_to_mx.ShowRunIndex(show_run_file)
+        return state['parse'].lines
+
+    def create_objects():
+        asa_to_mx.create_objects(asa_to_mx.OFFLINE_ORG_ID, state['parse'])
+        return state['parse'].lines
+
+    def parse_lines():
+        reset_parse_state()
+        count = 0
+        for line, _ in asa_to_mx.read_acl_lines(show_acl_file):
+            asa_to_mx.parse_line(line)
+            count += 1
+        return count
+
+    def parse_rules():
+        # Starts from a clean parser, not from the last line of the parse_line stage
+        reset_parse_state()
+        state['acl_list'], state['nat_acl_list'] = asa_to_mx.parse_rules(show_acl_file, jobs)
+        return acl_lines
+
+    def build_rules():
+        rule_sets = asa_to_mx.compile_rule_sets(state['acl_list'], state['nat_acl_list'])
+        return sum(len(rules) for rules in rule_sets.values())
+
+    previous_dir = os.getcwd()
+    os.chdir(size_dir)
+    try:
+        results.append(run_stage('show run load', load_show_run, 'lines', trace_memory))
+        results.append(run_stage('create_objects', create_objects, 'lines', trace_memory))
+        results.append(run_stage('parse_line', parse_lines, 'lines', trace_memory))
+        results.append(run_stage('parse_rules', parse_rules, 'lines', trace_memory))
+        results.append(run_stage('rule payloads', build_rules, 'rules', trace_memory))
+    finally:
+        os.chdir(previous_dir)
+
+    for result in results:
+        result['aces'] = ace_count
+
+    return results
+
+
+def measure_import(runs=IMPORT_RUNS):
+    """
+    Measure 'import asa_to_mx' in fresh interpreters with -X importtime, and check the deferred modules aren't
+    imported with it.
+    :param runs: number of interpreters (the best run is kept, the first one may compile the bytecode)
+    :return: tuple of (seconds, list of deferred modules imported eagerly)
+    """
+    code = 'import sys, asa_to_mx; print(",".join(m for m in {} if m in sys.modules))'.format(DEFERRED_MODULES)
+    script_dir = os.path.dirname(os.path.abspath(asa_to_mx.__file__))
+
+    best = None
+    eager = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=script_dir,
+                                capture_output=True, text=True, check=True)
+
+        # 'import time: <self us> | <cumulative us> | <module>'
+        for line in result.stderr.splitlines():
+            fields = line.split('|')
+            if len(fields) == 3 and fields[2].strip() == 'asa_to_mx':
+                seconds = int(fields[1]) / 1e6
+                best = seconds if best is None else min(best, seconds)
+
+        eager = [module for module in result.stdout.strip().split(',') if module]
+
+    return best, eager
+
+
+def print_import(seconds, eager, budget):
+    """
+    Print the import time against its budget.
+    :param seconds: 'import asa_to_mx' time
+    :param eager: deferred modules imported eagerly
+    :param budget: import budget in seconds
+    :return: True if the import is within budget
+    """
+    ok = seconds <= budget and not eager
+    color = 'green' if seconds <= budget else 'red'
+    console.print(f'import asa_to_mx: [{color}]{seconds * 1000:.0f} ms[/] (budget {budget * 1000:.0f} ms)')
+
+    if eager:
+        console.print(f"[red]Imported at module import time:[/] {', '.join(eager)}")
+
+    return ok
+
+
+def print_results(results, baseline):
+    """
+    Print benchmark results, flagging stages that regressed against the baseline.
+    :param results: list of stage result dictionaries
+    :param baseline: baseline stage result dictionaries keyed by (aces, stage)
+    :return:
+    """
+    table = Table(title='Conversion Benchmark')
+    for column in ['ACEs', 'Stage', 'Processed', 'Seconds', 'Per Second', 'Peak Memory']:
+        table.add_column(column, justify='left' if column == 'Stage' else 'right')
+
+    for result in results:
+        rate = f"{result['rate']:,.0f}"
+
+        previous = baseline.get((result['aces'], result['stage']))
+        if previous and result['rate'] and previous['rate'] / result['rate'] > REGRESSION_THRESHOLD:
+            rate = f"[red]{rate} (was {previous['rate']:,.0f})[/]"
+
+        peak = '-' if result['peak_bytes'] is None else f"{result['peak_bytes'] / 2 ** 20:,.1f} MiB"
+        table.add_row(f"{result['aces']:,}", result['stage'], f"{result['count']:,} {result['units']}",
+                      f"{result['seconds']:.2f}", rate, peak)
+
+    console.print(table)
+
+
+def print_help():
+    """
+    Print's help line if incorrect input provided to script.
+    :return:
+    """
+    console.print('This script benchmarks the ASA to MX conversion against generated configs\n')
+    console.print('To run the script, enter: python3 benchmark.py')
+    console.print('\nOptions:')
+    console.print('  --sizes N,N,...    ACE counts to benchmark (default 1000,100000,1000000)')
+    console.print('  --jobs N           worker processes for the parse_rules stage')
+    console.print('  --no-memory        skip peak memory tracking (tracemalloc slows every stage down)')
+    console.print('  --keep DIR         generate the configs in DIR and keep them')
+    console.print('  --json FILE        write the results to FILE')
+    console.print('  --baseline FILE    flag stages more than 20% slower than a previous --json FILE')
+    console.print('  --import-budget MS fail if importing asa_to_mx takes longer (default 150)')
+    console.print('  --import-only      only measure the import time')
+
+
+def main():
+    sizes = SIZES
+    jobs = 1
+    trace_memory = True
+    keep_dir = ''
+    json_file = ''
+    baseline_file = ''
+    import_budget = IMPORT_BUDGET
+    import_only = False
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'h', ['sizes=', 'jobs=', 'no-memory', 'keep=', 'json=', 'baseline=',
+                                                        'import-budget=', 'import-only'])
+    except getopt.GetoptError:
+        print_help()
+        sys.exit(-2)
+
+    for opt, arg in opts:
+        if opt == '-h':
+            print_help()
+            sys.exit()
+        elif opt == '--sizes':
+            sizes = [int(size) for size in arg.split(',')]
+        elif opt == '--jobs':
+            jobs = int(arg)
+        elif opt == '--no-memory':
+            trace_memory = False
+        elif opt == '--keep':
+            keep_dir = arg
+        elif opt == '--json':
+            json_file = arg
+        elif opt == '--baseline':
+            baseline_file = arg
+        elif opt == '--import-budget':
+            import_budget = float(arg) / 1000
+        elif opt == '--import-only':
+            import_only = True
+
+    baseline = {}
+    if baseline_file != '':
+        with open(baseline_file, 'r') as fp:
+            baseline = {(result['aces'], result['stage']): result for result in json.load(fp)}
+
+    console.print(Panel.fit("ASA to MX Conversion Benchmark"))
+
+    # Parse-only and compile-only use must not pay for the Dashboard client
+    import_ok = print_import(*measure_import(), import_budget)
+    if import_only:
+        sys.exit(0 if import_ok else 1)
+
+    results = []
+    with (contextlib.nullcontext(keep_dir) if keep_dir else tempfile.TemporaryDirectory()) as work_dir:
+        work_dir = os.path.abspath(work_dir)
+        for size in sizes:
+            console.print(f'Benchmarking [green]{size:,}[/] ACEs...')
+            results.extend(benchmark_size(size, work_dir, jobs, trace_memory))
+
+    print_results(results, baseline)
+
+    if json_file != '':
+        with open(json_file, 'w') as fp:
+            json.dump(results, fp, indent=2)
+
+    if not import_ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
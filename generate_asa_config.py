@@ -0,0 +1,352 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2022 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Trevor Maco <tmaco@cisco.com>"
+__copyright__ = "Copyright (c) 2022 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import getopt
+import gzip
+import os
+import random
+import sys
+
+from rich.console import Console
+from rich.panel import Panel
+
+# Rich Console Instance
+console = Console()
+
+# Output file names
+SHOW_RUN_FILE = 'show_run.txt'
+SHOW_ACL_FILE = 'show_access_list.txt'
+
+# Named ports (resolvable by the converter) and protocols used in generated rules
+PORT_NAMES = ['www', 'https', 'ssh', 'domain', 'smtp', 'ftp', 'telnet', 'citrix-ica', 'sqlnet']
+PROTOCOLS = ['tcp', 'tcp', 'tcp', 'udp']
+
+# NAT ACL (outside interface), every other interface gets an outbound ACL
+OUTSIDE_INTERFACE = 'outside'
+NAT_ACL = 'outside_in'
+
+
+def interface_names(interface_count):
+    """
+    Names of the generated inside interfaces.
+    :param interface_count: number of inside interfaces
+    :return: list of interface names
+    """
+    return ['inside'] + ['vlan{}'.format(index) for index in range(2, interface_count + 1)]
+
+
+def acl_types(interface_count):
+    """
+    ACL_TYPES entry (config.py) matching the generated access-groups.
+    :param interface_count: number of inside interfaces
+    :return: ACL_TYPES dictionary
+    """
+    return {'nat_set': [NAT_ACL], 'outbound_set': [name + '_in' for name in interface_names(interface_count)]}
+
+
+def object_ip(index, interface_count):
+    """
+    Inside address of a generated network object, objects are spread across the inside interface subnets.
+    :param index: object index
+    :param interface_count: number of inside interfaces
+    :return: ip address
+    """
+    return '10.{}.{}.{}'.format(index % interface_count + 1, index // 250 % 250, index % 250 + 2)
+
+
+def write_show_run(fp, rng, object_count, group_count, service_count, interface_count, nat_count):
+    """
+    Write a 'show run' with interfaces, network objects, nested object groups, service/protocol groups, routes,
+    access-groups and static NATs.
+    :param fp: output file
+    :param rng: random number generator
+    :param object_count: number of network objects
+    :param group_count: number of network object groups
+    :param service_count: number of service groups (port groups and service-object groups each)
+    :param interface_count: number of inside interfaces
+    :param nat_count: number of static NATs
+    :return:
+    """
+    fp.write(': Saved\nASA Version 9.8(2)\nhostname asa-generated\n')
+
+    # Interfaces (outside plus inside interfaces, each with its own /16)
+    fp.write('interface GigabitEthernet0/0\n nameif {}\n security-level 0\n ip address 203.0.113.2 255.255.255.0\n!\n'
+             .format(OUTSIDE_INTERFACE))
+    for index, name in enumerate(interface_names(interface_count), start=1):
+        fp.write('interface GigabitEthernet0/{}\n nameif {}\n security-level 100\n ip address 10.{}.0.1 255.255.0.0\n!\n'
+                 .format(index, name, index))
+
+    # Network objects: mostly hosts, some subnets and fqdns (statically NAT'd objects are always hosts)
+    for index in range(object_count):
+        fp.write('object network obj{}\n'.format(index))
+        kind = rng.random()
+        if index < nat_count or kind < 0.75:
+            fp.write(' host {}\n'.format(object_ip(index, interface_count)))
+        elif kind < 0.95:
+            fp.write(' subnet 10.{}.{}.0 255.255.255.0\n'.format(index % interface_count + 1, index % 250))
+        else:
+            fp.write(' fqdn v4 host{}.example.com\n'.format(index))
+
+    # Public addresses of the statically NAT'd objects
+    for index in range(nat_count):
+        fp.write('object network obj{}_pub\n host 198.18.{}.{}\n'.format(index, index // 250 % 250, index % 250 + 1))
+
+    # Network object groups, every fifth group also nests earlier groups
+    for index in range(group_count):
+        fp.write('object-group network grp{}\n'.format(index))
+        for member in rng.sample(range(object_count), min(object_count, rng.randint(2, 6))):
+            fp.write(' network-object object obj{}\n'.format(member))
+        if index % 5 == 4:
+            for nested in rng.sample(range(index), min(index, rng.randint(1, 2))):
+                fp.write(' group-object grp{}\n'.format(nested))
+
+    # Port groups and service-object groups
+    for index in range(service_count):
+        fp.write('object-group service svc{} tcp\n'.format(index))
+        fp.write(' port-object eq {}\n'.format(rng.choice(PORT_NAMES)))
+        low = rng.randint(1024, 60000)
+        fp.write(' port-object range {} {}\n'.format(low, low + rng.randint(1, 100)))
+
+        fp.write('object-group service svcobj{}\n'.format(index))
+        fp.write(' service-object tcp destination eq {}\n'.format(rng.choice(PORT_NAMES)))
+        fp.write(' service-object udp destination eq {}\n'.format(rng.randint(1024, 65000)))
+
+    fp.write('object-group protocol proto0\n protocol-object tcp\n protocol-object udp\n')
+
+    # Routes: default route out, plus a few subnets behind each inside interface
+    fp.write('route {} 0.0.0.0 0.0.0.0 203.0.113.1 1\n'.format(OUTSIDE_INTERFACE))
+    for index, name in enumerate(interface_names(interface_count), start=1):
+        for route in range(2):
+            fp.write('route {} 172.{}.{}.0 255.255.255.0 10.{}.0.254 1\n'.format(name, 16 + index % 16, route, index))
+
+    # Access-groups
+    for name in interface_names(interface_count):
+        fp.write('access-group {}_in in interface {}\n'.format(name, name))
+    fp.write('access-group {} in interface {}\n'.format(NAT_ACL, OUTSIDE_INTERFACE))
+
+    # Static NATs
+    for index in range(nat_count):
+        fp.write('object network obj{}\n nat (inside,outside) static obj{}_pub\n'.format(index, index))
+
+
+def outbound_ace(rng, object_count, group_count, service_count, interface_count):
+    """
+    Build the body of a random outbound ACE.
+    :param rng: random number generator
+    :param object_count: number of network objects
+    :param group_count: number of network object groups
+    :param service_count: number of service groups
+    :param interface_count: number of inside interfaces
+    :return: tuple of (ACE body, expanded child bodies)
+    """
+    protocol = rng.choice(PROTOCOLS)
+    port = 'eq {}'.format(rng.choice(PORT_NAMES) if rng.random() < 0.5 else rng.randint(1, 65535))
+    host = object_ip(rng.randrange(object_count), interface_count)
+    kind = rng.random()
+
+    if kind < 0.3:
+        return '{} host {} host 10.{}.{}.{} {}'.format(protocol, host, rng.randint(1, 254), rng.randint(0, 255),
+                                                       rng.randint(1, 254), port), []
+    if kind < 0.45:
+        return '{} 10.{}.{}.0 255.255.255.0 object obj{} {}'.format(protocol, rng.randint(1, interface_count),
+                                                                   rng.randint(0, 255), rng.randrange(object_count),
+                                                                   port), []
+    if kind < 0.55:
+        low = rng.randint(1024, 60000)
+        return 'udp host {} any range {} {}'.format(host, low, low + rng.randint(1, 1000)), []
+    if kind < 0.65 and service_count:
+        return 'tcp host {} object obj{} object-group svc{}'.format(host, rng.randrange(object_count),
+                                                                    rng.randrange(service_count)), []
+    if kind < 0.7:
+        return 'object-group proto0 host {} any {}'.format(host, port), []
+    if kind < 0.95 and group_count:
+        # Group rule, expanded per member in the show access-list output
+        children = ['{} host {} any {}'.format(protocol, object_ip(rng.randrange(object_count), interface_count), port)
+                    for _ in range(rng.randint(2, 4))]
+        return '{} object-group grp{} any {}'.format(protocol, rng.randrange(group_count), port), children
+    if kind < 0.98:
+        return 'icmp host {} any echo'.format(host), []
+
+    return 'ip host {} any'.format(host), []
+
+
+def nat_ace(rng, nat_count, interface_count):
+    """
+    Build the body of a random NAT ACE (outside in to a statically NAT'd object).
+    :param rng: random number generator
+    :param nat_count: number of static NATs
+    :param interface_count: number of inside interfaces
+    :return: ACE body
+    """
+    index = rng.randrange(nat_count)
+    kind = rng.random()
+
+    if kind < 0.5:
+        return 'tcp any host {} eq {}'.format(object_ip(index, interface_count), rng.choice(PORT_NAMES))
+    if kind < 0.8:
+        return 'tcp 198.51.{}.0 255.255.255.0 object obj{} eq {}'.format(rng.randint(0, 255), index,
+                                                                       rng.choice(PORT_NAMES))
+
+    return 'ip 192.0.{}.0 255.255.255.0 any'.format(rng.randint(0, 255))
+
+
+def write_show_access_list(fp, rng, ace_count, object_count, group_count, service_count, interface_count, nat_count):
+    """
+    Write a 'show access-list' with ace_count top level ACEs (remarks and child expansions included), 10% of them in
+    the NAT ACL.
+    :param fp: output file
+    :param rng: random number generator
+    :param ace_count: number of top level ACEs
+    :param object_count: number of network objects
+    :param group_count: number of network object groups
+    :param service_count: number of service groups
+    :param interface_count: number of inside interfaces
+    :param nat_count: number of static NATs
+    :return:
+    """
+    names = interface_names(interface_count)
+    nat_aces = ace_count // 10 if nat_count else 0
+
+    # ACEs per ACL (NAT ACL first, remaining ACEs spread across the outbound ACLs)
+    counts = [(NAT_ACL, nat_aces)]
+    remaining = ace_count - nat_aces
+    for index, name in enumerate(names):
+        share = remaining // (len(names) - index)
+        counts.append((name + '_in', share))
+        remaining -= share
+
+    for acl_name, count in counts:
+        if count == 0:
+            continue
+
+        fp.write('access-list {}; {} elements; name hash: 0x{:08x}\n'.format(acl_name, count, rng.getrandbits(32)))
+        line_number = 1
+
+        for _ in range(count):
+            if rng.random() < 0.1:
+                fp.write('access-list {} line {} remark generated rule {}\n'.format(acl_name, line_number, line_number))
+                line_number += 1
+
+            if acl_name == NAT_ACL:
+                body, children = nat_ace(rng, nat_count, interface_count), []
+            else:
+                body, children = outbound_ace(rng, object_count, group_count, service_count, interface_count)
+
+            action = 'deny' if rng.random() < 0.05 else 'permit'
+            fp.write('access-list {} line {} extended {} {} (hitcnt={}) 0x{:08x}\n'.format(
+                acl_name, line_number, action, body, rng.randint(0, 100000), rng.getrandbits(32)))
+
+            for child in children:
+                fp.write('  access-list {} line {} extended {} {} (hitcnt=0) 0x{:08x}\n'.format(
+                    acl_name, line_number, action, child, rng.getrandbits(32)))
+
+            line_number += 1
+
+
+def generate(output_dir, object_count=1000, ace_count=10000, group_count=None, service_count=None,
+             interface_count=4, nat_count=None, seed=0, compress=False):
+    """
+    Generate a 'show run' / 'show access-list' pair.
+    :param output_dir: output directory
+    :param object_count: number of network objects
+    :param ace_count: number of top level ACEs
+    :param group_count: number of network object groups (default: 1 per 10 objects)
+    :param service_count: number of service groups (default: 1 per 50 objects)
+    :param interface_count: number of inside interfaces
+    :param nat_count: number of static NATs (default: 1 per 20 objects)
+    :param seed: random seed, the same arguments and seed give the same files
+    :param compress: gzip the 'show access-list' file
+    :return: tuple of ('show run' path, 'show access-list' path, matching ACL_TYPES)
+    """
+    group_count = object_count // 10 if group_count is None else group_count
+    service_count = max(1, object_count // 50) if service_count is None else service_count
+    nat_count = object_count // 20 if nat_count is None else min(nat_count, object_count)
+    rng = random.Random(seed)
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    show_run_file = os.path.join(output_dir, SHOW_RUN_FILE)
+    with open(show_run_file, 'w') as fp:
+        write_show_run(fp, rng, object_count, group_count, service_count, interface_count, nat_count)
+
+    show_acl_file = os.path.join(output_dir, SHOW_ACL_FILE + ('.gz' if compress else ''))
+    with (gzip.open(show_acl_file, 'wt') if compress else open(show_acl_file, 'w')) as fp:
+        write_show_access_list(fp, rng, ace_count, object_count, group_count, service_count, interface_count,
+                               nat_count)
+
+    return show_run_file, show_acl_file, acl_types(interface_count)
+
+
+def print_help():
+    """
+    Print's help line if incorrect input provided to script.
+    :return:
+    """
+    console.print('This script generates a synthetic ASA show run / show access-list pair\n')
+    console.print('To run the script, enter: python3 generate_asa_config.py -o [yellow]<output directory>[/]')
+    console.print('\nOptions:')
+    console.print('  --objects N        network objects (default 1000)')
+    console.print('  --aces N           top level ACEs (default 10000)')
+    console.print('  --groups N         network object groups (default 1 per 10 objects)')
+    console.print('  --services N       service groups (default 1 per 50 objects)')
+    console.print('  --interfaces N     inside interfaces (default 4)')
+    console.print('  --nat N            static NATs (default 1 per 20 objects)')
+    console.print('  --seed N           random seed (default 0)')
+    console.print('  --gzip             gzip the show access-list file')
+
+
+def main():
+    output_dir = ''
+    options = {}
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'ho:', ['objects=', 'aces=', 'groups=', 'services=', 'interfaces=',
+                                                         'nat=', 'seed=', 'gzip'])
+    except getopt.GetoptError:
+        print_help()
+        sys.exit(-2)
+
+    for opt, arg in opts:
+        if opt == '-h':
+            print_help()
+            sys.exit()
+        elif opt == '-o':
+            output_dir = arg
+        elif opt == '--gzip':
+            options['compress'] = True
+        else:
+            key = {'--objects': 'object_count', '--aces': 'ace_count', '--groups': 'group_count',
+                   '--services': 'service_count', '--interfaces': 'interface_count', '--nat': 'nat_count',
+                   '--seed': 'seed'}[opt]
+            options[key] = int(arg)
+
+    if output_dir == '':
+        print_help()
+        sys.exit(-1)
+
+    console.print(Panel.fit("Synthetic ASA Config Generator"))
+    show_run_file, show_acl_file, types = generate(output_dir, **options)
+
+    console.print(f'Wrote [blue]{show_run_file}[/] and [blue]{show_acl_file}[/]')
+    console.print(f'Matching ACL_TYPES for config.py: {types}')
+
+
+if __name__ == "__main__":
+    main()
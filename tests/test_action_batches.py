@@ -0,0 +1,63 @@
+import types
+
+import meraki
+from rich.console import Console
+
+import asa_to_mx
+
+
+class FakeOrganizations:
+    """
+    Action batches fail when they hold an object named 'bad', which single creates reject too.
+    """
+
+    def __init__(self):
+        self.batches = {}
+        self.created = []
+
+    def createOrganizationActionBatch(self, organizationId, actions, confirmed, synchronous):
+        batch_id = str(len(self.batches))
+        self.batches[batch_id] = actions
+        return {'id': batch_id}
+
+    def getOrganizationActionBatch(self, organizationId, actionBatchId):
+        actions = self.batches[actionBatchId]
+        if any(action['body']['name'] == 'bad' for action in actions):
+            return {'status': {'completed': False, 'failed': True, 'errors': ['invalid object'],
+                               'createdResources': []}}
+
+        return {'status': {'completed': True, 'failed': False, 'errors': [],
+                           'createdResources': [{'id': self.create(action['body'])} for action in actions]}}
+
+    def create(self, body):
+        if body['name'] == 'bad':
+            response = types.SimpleNamespace(status_code=400, reason='Bad Request', json=lambda: {'errors': ['bad']})
+            raise meraki.APIError({'tags': ['organizations'], 'operation': 'create'}, response)
+
+        self.created.append(body['name'])
+        return f"id-{body['name']}"
+
+    def createOrganizationPolicyObject(self, organizationId, **body):
+        return {'id': self.create(body)}
+
+    def createOrganizationPolicyObjectsGroup(self, organizationId, **body):
+        return {'id': self.create(body)}
+
+
+def action(name):
+    return asa_to_mx.policy_object_action('1', {'name': name, 'category': 'network', 'type': 'cidr',
+                                                'cidr': '10.0.0.1/32'})
+
+
+def test_failed_batch_falls_back_to_single_creates(monkeypatch):
+    organizations = FakeOrganizations()
+    monkeypatch.setattr(asa_to_mx, 'dashboard', types.SimpleNamespace(organizations=organizations))
+    monkeypatch.setattr(asa_to_mx, 'ACTION_BATCH_SIZE', 3)
+    monkeypatch.setattr(asa_to_mx, 'ACTION_BATCH_POLL_INTERVAL', 0)
+
+    names = ['a', 'b', 'bad', 'c', 'd', 'e', 'f']
+    created = asa_to_mx.run_action_batches('1', [action(name) for name in names], Console(quiet=True))
+
+    assert sorted(item['name'] for item in created) == ['a', 'b', 'c', 'd', 'e', 'f']
+    assert all(item['id'] == f"id-{item['name']}" for item in created)
+    assert sorted(organizations.created) == ['a', 'b', 'c', 'd', 'e', 'f']
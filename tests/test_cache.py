@@ -0,0 +1,76 @@
+import time
+import types
+
+import pytest
+
+import asa_to_mx
+
+
+class ListingOrganizations:
+
+    def __init__(self, policy_objects, groups):
+        self.policy_objects = policy_objects
+        self.groups = groups
+        self.listed = []
+
+    def getOrganizationPolicyObjects(self, organizationId, perPage=5000, **kwargs):
+        self.listed.append(('objects', perPage))
+        return self.policy_objects[:perPage]
+
+    def getOrganizationPolicyObjectsGroups(self, organizationId, perPage=5000, **kwargs):
+        self.listed.append(('groups', perPage))
+        return self.groups[:perPage]
+
+
+def org_cache():
+    return {'orgs': {'1': {'listed_at': time.time(),
+                           'objects': {'web1': {'id': '11', 'cidr': '10.0.0.1/32', 'fqdn': None},
+                                       'web2': {'id': '12', 'cidr': '10.0.0.2/32', 'fqdn': None}},
+                           'object_groups': {'web': '21'}}}}
+
+
+@pytest.fixture
+def local_maps(monkeypatch):
+    monkeypatch.setattr(asa_to_mx, 'objects', {})
+    monkeypatch.setattr(asa_to_mx, 'object_values', {})
+    monkeypatch.setattr(asa_to_mx, 'object_groups', {})
+
+
+def load(monkeypatch, policy_objects, groups):
+    organizations = ListingOrganizations(policy_objects, groups)
+    monkeypatch.setattr(asa_to_mx, 'dashboard', types.SimpleNamespace(organizations=organizations))
+    return asa_to_mx.load_cached_objects(org_cache(), '1'), organizations
+
+
+def test_matching_cache_is_loaded(monkeypatch, local_maps):
+    loaded, organizations = load(monkeypatch, [{'name': 'web1', 'id': '11'}, {'name': 'web2', 'id': '12'}],
+                                 [{'name': 'web', 'id': '21'}])
+
+    assert loaded
+    assert asa_to_mx.objects == {'web1': '11', 'web2': '12'}
+    assert asa_to_mx.object_groups == {'web': '21'}
+    assert organizations.listed == [('objects', asa_to_mx.CACHE_CHECK_PAGE_SIZE),
+                                    ('groups', asa_to_mx.CACHE_CHECK_PAGE_SIZE)]
+
+
+def test_recreated_object_invalidates_cache(monkeypatch, local_maps):
+    loaded, _ = load(monkeypatch, [{'name': 'web1', 'id': '11'}, {'name': 'web2', 'id': '99'}],
+                     [{'name': 'web', 'id': '21'}])
+
+    assert not loaded
+    assert asa_to_mx.objects == {}
+
+
+def test_deleted_group_invalidates_cache(monkeypatch, local_maps):
+    loaded, _ = load(monkeypatch, [{'name': 'web1', 'id': '11'}, {'name': 'web2', 'id': '12'}], [])
+
+    assert not loaded
+
+
+def test_partial_page_only_checks_listed_entries(monkeypatch, local_maps):
+    monkeypatch.setattr(asa_to_mx, 'CACHE_CHECK_PAGE_SIZE', 1)
+
+    loaded, _ = load(monkeypatch, [{'name': 'web1', 'id': '11'}, {'name': 'web2', 'id': '12'}],
+                     [{'name': 'web', 'id': '21'}])
+
+    assert loaded
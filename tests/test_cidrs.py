@@ -0,0 +1,55 @@
+import ipaddress
+import random
+
+import asa_to_mx
+
+
+def random_network(rng):
+    prefix = rng.choice([8, 16, 20, 23, 24, 25, 28, 30, 31, 32, rng.randint(0, 32)])
+    address = ipaddress.IPv4Address(rng.choice([rng.getrandbits(32), 0x0a000000 | rng.getrandbits(12)]))
+    return ipaddress.IPv4Network(f'{address}/{prefix}', strict=False), address
+
+
+def test_range_to_cidrs_matches_ipaddress():
+    rng = random.Random(13)
+    bounds = [(0, 0), (0, 2 ** 32 - 1), (2 ** 32 - 1, 2 ** 32 - 1), (1, 2 ** 32 - 2)]
+    for _ in range(2000):
+        start = rng.getrandbits(32)
+        bounds.append((start, min(start + rng.choice([0, 1, 255, 256, rng.getrandbits(20)]), 2 ** 32 - 1)))
+
+    for start, end in bounds:
+        expected = ipaddress.summarize_address_range(ipaddress.IPv4Address(start), ipaddress.IPv4Address(end))
+        assert asa_to_mx.range_to_cidrs(start, end) == [network.with_prefixlen for network in expected]
+
+
+def test_summarize_cidrs_matches_collapse_addresses():
+    rng = random.Random(42)
+    for _ in range(1000):
+        networks = []
+        values = []
+        for _ in range(rng.randint(1, 40)):
+            network, address = random_network(rng)
+            networks.append(network)
+
+            # Host bits may be set, a bare address is a /32
+            if network.prefixlen == 32 and rng.random() < 0.5:
+                values.append(str(address))
+            else:
+                values.append(f'{address}/{network.prefixlen}')
+
+        # Comma separated values are split
+        if len(values) > 1 and rng.random() < 0.3:
+            values[:2] = [','.join(values[:2])]
+
+        expected = [network.with_prefixlen for network in ipaddress.collapse_addresses(networks)]
+        assert asa_to_mx.summarize_cidrs(values) == expected
+
+
+def test_summarize_cidrs_keeps_other_values_last():
+    values = ['www.site.com', '10.0.0.0/25', 'OBJ[1]', '10.0.0.128/25', 'www.site.com', '10.0.0.300/32']
+
+    assert asa_to_mx.summarize_cidrs(values) == ['10.0.0.0/24', 'www.site.com', 'OBJ[1]', '10.0.0.300/32']
+
+
+def test_summarize_cidrs_any():
+    assert asa_to_mx.summarize_cidrs(['10.0.0.0/8', 'any4']) == ['any']
@@ -0,0 +1,32 @@
+from rich.console import Console
+
+import asa_to_mx
+
+
+def test_networks_sharing_a_name_are_reported_separately(monkeypatch):
+    pushed = []
+
+    def fetch_rule_sets(network_id):
+        if network_id == 'N_3':
+            raise ConnectionError('gave up retrying')
+        return None
+
+    def push_rule_set(kind, network_id, rules, current_rules, network_name, summary):
+        if network_id == 'N_2' and kind == 'l7':
+            raise KeyError('rules')
+        pushed.append((network_id, kind))
+        summary[kind] = 'updated'
+
+    monkeypatch.setattr(asa_to_mx, 'console', Console(quiet=True))
+    monkeypatch.setattr(asa_to_mx, 'fetch_rule_sets', fetch_rule_sets)
+    monkeypatch.setattr(asa_to_mx, 'push_rule_set', push_rule_set)
+    monkeypatch.setattr(asa_to_mx, 'FORCE_PUSH', False)
+
+    networks = [('N_1', 'Branch'), ('N_2', 'Branch'), ('N_3', 'Branch'), ('N_4', 'Other')]
+    results = asa_to_mx.deploy_rule_sets({'l3': [], 'one_to_one_nat': [], 'l7': []}, networks)
+
+    assert list(results) == ['N_1', 'N_2', 'N_3', 'N_4']
+    assert results['N_1'] == results['N_4'] == {'l3': 'updated', 'one_to_one_nat': 'updated', 'l7': 'updated'}
+    assert results['N_2']['error'] == "KeyError('rules')"
+    assert 'ConnectionError' in results['N_3']['error']
+    assert ('N_4', 'l7') in pushed
@@ -0,0 +1,53 @@
+import threading
+import time
+import types
+
+from rich.console import Console
+
+import asa_to_mx
+
+
+class RecordingOrganizations:
+
+    def __init__(self):
+        self.threads = set()
+
+    def createOrganizationPolicyObject(self, organizationId, **body):
+        self.threads.add(threading.get_ident())
+        time.sleep(0.01)
+        return {'id': body['name']}
+
+
+def mx_objects(count):
+    return [{'name': f'obj{index}', 'category': 'network', 'type': 'cidr', 'cidr': f'10.0.0.{index}/32'}
+            for index in range(count)]
+
+
+def create_level(monkeypatch, dashboard):
+    monkeypatch.setattr(asa_to_mx, 'dashboard', dashboard)
+    monkeypatch.setattr(asa_to_mx, 'OBJECT_WORKERS', 4)
+    monkeypatch.setattr(asa_to_mx, 'BATCH_MODE', False)
+    monkeypatch.setattr(asa_to_mx, 'ASYNC_CONCURRENCY', 0)
+
+    return list(asa_to_mx.create_object_level('1', mx_objects(8), Console(quiet=True)))
+
+
+def test_thread_safe_dashboard_uses_object_workers(monkeypatch):
+    organizations = RecordingOrganizations()
+    created = create_level(monkeypatch, types.SimpleNamespace(organizations=organizations, thread_safe=True))
+
+    assert [item['id'] for item in created] == [f'obj{index}' for index in range(8)]
+    assert len(organizations.threads) > 1
+
+
+def test_other_dashboards_create_one_at_a_time(monkeypatch):
+    organizations = RecordingOrganizations()
+    create_level(monkeypatch, types.SimpleNamespace(organizations=organizations))
+
+    assert len(organizations.threads) == 1
+
+
+def test_offline_dashboard_is_not_thread_safe():
+    dashboard = asa_to_mx.InstrumentedDashboard(asa_to_mx.OfflineDashboard())
+
+    assert not dashboard.thread_safe
@@ -0,0 +1,83 @@
+import pytest
+
+import asa_to_mx
+
+ACL = 'access-list inside_in line {} extended permit tcp {} any eq {}'
+
+# Remarks and child (expanded) lines on both sides of every possible chunk boundary, a failed parent whose child
+# lines are parsed instead, and lines that cannot be translated at all
+LINES = [
+    'access-list inside_in; 12 elements; name hash: 0x1',
+    'access-list inside_in line 1 remark first remark',
+    ACL.format(1, 'host 10.1.1.1', 'www'),
+    '  ' + ACL.format(1, 'host 10.1.1.1', '80'),
+    'access-list inside_in line 2 remark second remark',
+    'access-list inside_in line 3 remark third remark',
+    ACL.format(4, 'host 10.1.1.2', 'https'),
+    '  ' + ACL.format(4, 'host 10.1.1.2', '443'),
+    '  ' + ACL.format(4, 'host 10.1.1.2', '443'),
+    ACL.format(5, 'host 10.1.1.3', '22'),
+    ACL.format(6, 'interface inside', '23'),
+    '  ' + ACL.format(6, 'host 10.1.1.4', '23'),
+    '  ' + ACL.format(6, 'host 10.1.1.5', '23'),
+    'access-list inside_in line 7 remark fourth remark',
+    'access-list outside_in line 8 extended permit tcp any host 203.0.113.10 eq www',
+    '  access-list outside_in line 8 extended permit tcp any host 203.0.113.10 eq 80',
+    'access-list inside_in line 9 remark fifth remark',
+    'access-list inside_in line 10 extended permit ip any any',
+    ACL.format(11, 'host 10.1.1.6', 'ssh'),
+    'access-list inside_in line 12 remark last remark',
+    ACL.format(13, 'host 10.1.1.7', 'smtp'),
+    '  ' + ACL.format(13, 'host 10.1.1.7', '25'),
+    ACL.format(14, 'fqdn www.site.com', 'www'),
+]
+
+
+@pytest.fixture
+def acl_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(asa_to_mx, 'ACL_TYPES', {'nat_set': ['outside_in'], 'outbound_set': ['inside_in']})
+    monkeypatch.setattr(asa_to_mx, 'nat_table', {'203.0.113.10': '10.1.1.10'})
+
+    path = tmp_path / 'show_access_list.txt'
+    path.write_text('\n'.join(LINES) + '\n')
+    return str(path)
+
+
+def parse(acl_file, jobs):
+    asa_to_mx.CURRENT_REMARK = ''
+    asa_to_mx.CHILD_FLAG = False
+
+    rules = asa_to_mx.parse_rules(acl_file, jobs)
+    with open('unprocessed_rules.txt', 'r') as fp:
+        return rules, fp.read()
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5])
+def test_parallel_parse_matches_serial(acl_file, monkeypatch, chunk_size):
+    serial = parse(acl_file, 1)
+
+    monkeypatch.setattr(asa_to_mx, 'PARSE_CHUNK_SIZE', chunk_size)
+    parallel = parse(acl_file, 3)
+
+    assert parallel == serial
+
+
+def test_remarks_carried_across_chunks(acl_file, monkeypatch):
+    # With one line per chunk every remark sits in a different chunk than the rule it annotates
+    monkeypatch.setattr(asa_to_mx, 'PARSE_CHUNK_SIZE', 1)
+    (acl_list, nat_acl_list), _ = parse(acl_file, 2)
+
+    comments = [acl['comment'] for acl in acl_list + nat_acl_list]
+    assert comments[:2] == [' first remark', ' second remark +  third remark']
+    assert comments[-2:] == [' last remark', ' fourth remark']
+
+
+def test_unprocessed_lines_keep_reason(acl_file):
+    _, unprocessed = parse(acl_file, 1)
+
+    assert unprocessed.splitlines()[1:3] == [
+        'access-list inside_in line 6 extended permit tcp interface inside any eq 23 # Invalid line',
+        'access-list inside_in line 10 extended permit ip any any # Default any any rules ignored. Please recreate '
+        'manually in Meraki dashboard',
+    ]
@@ -0,0 +1,67 @@
+import pytest
+
+import asa_to_mx
+
+PREFIX = 'access-list outside_in line 7 extended'
+
+# One ACE per source / destination / port form of the regex patterns, plus lines they reject
+ACES = [
+    # Sources
+    f'{PREFIX} permit tcp 10.1.1.0 255.255.255.0 10.2.0.0 255.255.0.0 eq www',
+    f'{PREFIX} permit tcp host 10.1.1.5 any eq 443',
+    f'{PREFIX} permit tcp any4 host 10.2.2.2 range 1000 2000',
+    f'{PREFIX} permit udp object web1 object-group grp1 object-group svc1',
+    f'{PREFIX} deny ip object-group grp.1 fqdn www.site.com',
+    f'{PREFIX} permit object-group proto1 any object lan2 eq sql-net',
+    # Destinations
+    f'{PREFIX} permit tcp any 10.2.0.0 255.255.0.0',
+    f'{PREFIX} permit tcp any host 10.2.2.2 (hitcnt=0) 0x1a2b',
+    f'{PREFIX} permit tcp any any eq ssh log',
+    f'{PREFIX} permit icmp any any echo',
+    f'{PREFIX} permit icmp any any echo-reply eq www',
+    f'{PREFIX} permit icmp any4 any4 unreachable',
+    f'{PREFIX} permit tcp any object-group grp1 eq 8080-8081',
+    f'{PREFIX} permit tcp object web1 fqdn www.site.com eq https',
+    # Port specs
+    f'{PREFIX} permit tcp any any range www https',
+    f'{PREFIX} permit tcp any any range 1000 (',
+    f'{PREFIX} permit tcp any any eq',
+    f'{PREFIX} permit tcp any any lt 1024',
+    f'{PREFIX} permit tcp any any object-group',
+    # ACL names
+    'access-list in side line 3 extended permit tcp any any eq www',
+    'access-list a line 1 extended b line 2 extended permit tcp any any',
+    'access-list  line 2 extended permit tcp any any',
+    'access-list line 2 extended permit tcp any any',
+    # Unsupported forms
+    f'{PREFIX} permit tcp fqdn www.site.com any',
+    f'{PREFIX} permit tcp interface outside any',
+    f'{PREFIX} permit tcp host 10.1.1 any',
+    f'{PREFIX} permit tcp any any6',
+    f'{PREFIX} per-mit tcp any any',
+    f'{PREFIX} permit tcp object',
+    'access-list outside_in remark allow web',
+    'access-list outside_in; 4 elements; name hash: 0x1',
+    # Whitespace variants: the regex patterns need single spaces, and only accept a tab before a port keyword
+    f'{PREFIX} permit tcp any any range 1000\tx',
+    f'{PREFIX} permit tcp any any range 1000  2000',
+    f'{PREFIX} permit tcp  any any eq www',
+    f'{PREFIX} permit tcp any  host 10.2.2.2',
+    f'{PREFIX} permit tcp any object  eq www',
+    f'{PREFIX} permit tcp any object-group grp1  eq www',
+    f'{PREFIX} permit object-group  proto1 any any',
+    f'{PREFIX} permit tcp any any\teq www',
+    f'{PREFIX} permit tcp any host 10.2.2.2\teq\twww',
+    f'{PREFIX} permit\ttcp any any',
+    'access-list in\tside line 3 extended permit tcp any any eq www',
+]
+
+
+@pytest.mark.parametrize('line', ACES)
+def test_token_parser_matches_regex(line):
+    assert asa_to_mx.match_ace_tokens(line) == asa_to_mx.match_ace_regex(line)
+
+
+def test_double_spaces_rejected():
+    assert asa_to_mx.match_ace_tokens(f'{PREFIX} permit tcp  any any eq www') is None
+    assert asa_to_mx.match_ace_tokens(f'{PREFIX} permit tcp any any range 1000\tx')['dst_port_range'] is None
@@ -0,0 +1,63 @@
+import pytest
+
+import asa_to_mx
+
+
+def acl(srcs, dsts, port='443'):
+    return {'acl_name': 'inside_in', 'line_number': '1', 'action': 'permit', 'comment': '', 'protocol': 'tcp',
+            'src': srcs, 'dst': dsts, 'dst_port': port}
+
+
+def acl_list(total):
+    # One ACL rule expanding to `total` L3 rules
+    return [acl([f'10.1.{i}.0/24' for i in range(total // 10)], [f'10.2.{i}.0/24' for i in range(10)])]
+
+
+def test_default_budget_is_mx_limit():
+    assert asa_to_mx.RULE_BUDGET == asa_to_mx.MX_L3_RULE_LIMIT
+
+
+def test_within_budget(capsys):
+    asa_to_mx.check_rule_budget(acl_list(asa_to_mx.MX_L3_RULE_LIMIT))
+
+    assert 'exceed' not in capsys.readouterr().out
+
+
+def test_over_budget_warns(monkeypatch, capsys):
+    monkeypatch.setattr(asa_to_mx, 'RULE_BUDGET_ABORT', False)
+
+    asa_to_mx.check_rule_budget(acl_list(asa_to_mx.MX_L3_RULE_LIMIT + 10))
+
+    assert 'Warning' in capsys.readouterr().out
+
+
+def test_over_budget_aborts(monkeypatch, capsys):
+    monkeypatch.setattr(asa_to_mx, 'RULE_BUDGET_ABORT', True)
+
+    with pytest.raises(SystemExit):
+        asa_to_mx.check_rule_budget(acl_list(asa_to_mx.MX_L3_RULE_LIMIT + 10))
+
+    assert 'Error' in capsys.readouterr().out
+
+
+def test_zero_budget_disables_check(monkeypatch, capsys):
+    monkeypatch.setattr(asa_to_mx, 'RULE_BUDGET', 0)
+    monkeypatch.setattr(asa_to_mx, 'RULE_BUDGET_ABORT', True)
+
+    asa_to_mx.check_rule_budget(acl_list(asa_to_mx.MX_L3_RULE_LIMIT * 10))
+
+    assert 'exceed' not in capsys.readouterr().out
+
+
+
+def test_report_lists_largest_expansions(monkeypatch, capsys):
+    monkeypatch.setattr(asa_to_mx, 'RULE_BUDGET', 0)
+    acls = [acl(['10.1.1.0/24'], ['10.2.1.0/24']) for _ in range(6)]
+    acls[2] = dict(acl(['10.1.1.0/24', '10.1.2.0/24'], ['10.2.1.0/24']), line_number='3')
+    acls[4] = dict(acl(['10.1.1.0/24', '10.1.2.0/24'], ['10.2.1.0/24', '10.2.2.0/24']), line_number='5')
+
+    asa_to_mx.check_rule_budget(acls)
+
+    out = capsys.readouterr().out
+    assert 'Projected 10 Outbound Rules from 6 ACL rules' in out
+    assert out.index('x4 inside_in line 5') < out.index('x2 inside_in line 3')
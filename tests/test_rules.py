@@ -0,0 +1,75 @@
+import asa_to_mx
+
+
+def rule(policy='allow', protocol='tcp', src='10.1.1.0/24', dst='10.2.0.0/16', port='443', comment=''):
+    return {'comment': comment, 'policy': policy, 'protocol': protocol, 'srcPort': 'any', 'srcCidr': src,
+            'destCidr': dst, 'destPort': port}
+
+
+def test_dedupe_drops_only_later_duplicates():
+    rules = [rule(port='80'), rule(port='443', comment='first'), rule(port='80', comment='copy'),
+             rule(policy='deny', port='22'), rule(port='443', comment='second')]
+
+    unique, removed = asa_to_mx.dedupe_rules(rules)
+
+    assert removed == 2
+    assert unique == [rules[0], rules[1], rules[3]]
+
+
+def test_dedupe_matches_equivalent_rules():
+    rules = [rule(src='10.1.1.0/24,10.3.0.0/16', protocol='TCP'), rule(src='10.3.0.0/16, 10.1.1.0/24')]
+
+    unique, removed = asa_to_mx.dedupe_rules(rules)
+
+    assert removed == 1
+    assert unique == rules[:1]
+
+
+def test_dedupe_keeps_different_policies():
+    rules = [rule(policy='deny'), rule(policy='allow')]
+
+    assert asa_to_mx.dedupe_rules(rules) == (rules, 0)
+
+
+def test_merge_folds_neighbours_in_order():
+    rules = [rule(port='80'), rule(port='443'), rule(port='8443'), rule(dst='10.9.0.0/16', port='22')]
+
+    merged, folded = asa_to_mx.merge_rules(rules)
+
+    assert folded == 2
+    assert merged == [rule(port='80,443,8443'), rule(dst='10.9.0.0/16', port='22')]
+
+
+def test_merge_never_crosses_a_different_policy_or_comment():
+    rules = [rule(port='80'), rule(policy='deny', port='80'), rule(port='443'),
+             rule(port='8080', comment='other'), rule(port='8081', comment='other')]
+
+    merged, folded = asa_to_mx.merge_rules(rules)
+
+    assert folded == 1
+    assert merged == [rules[0], rules[1], rules[2], rule(port='8080,8081', comment='other')]
+
+
+def test_merge_skips_any_and_port_ranges():
+    rules = [rule(port='any'), rule(port='443'), rule(port='1000-2000'), rule(port='22'),
+             rule(dst='any'), rule(dst='10.9.0.0/16')]
+
+    assert asa_to_mx.merge_rules(rules) == (rules, 0)
+
+
+def test_merge_varies_a_single_field():
+    # The third rule differs from the merged rule in destCidr only, but the merge varies destPort
+    rules = [rule(port='80'), rule(port='443'), rule(dst='10.9.0.0/16', port='80,443')]
+
+    merged, folded = asa_to_mx.merge_rules(rules)
+
+    assert folded == 1
+    assert merged == [rule(port='80,443'), rules[2]]
+
+
+def test_merge_does_not_modify_input():
+    rules = [rule(port='80'), rule(port='443')]
+
+    asa_to_mx.merge_rules(rules)
+
+    assert rules == [rule(port='80'), rule(port='443')]